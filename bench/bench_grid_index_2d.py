@@ -1,22 +1,85 @@
-from timeit import timeit
+import random
+from math import ceil, sqrt
 
+from bench.harness import benchmark
 from little_doors.aabb import AABB2D
 from little_doors.grid import GridIndex2D
 
-context = {
-    'grid': GridIndex2D(),
-}
+CELL_SIZE = 32.0
 
+# Object counts, and average number of boxes per cell, the grid benchmarks run with.
+COUNTS = [100, 1000, 10000]
+DENSITIES = [0.25, 1.0, 4.0]
 
-def work():
-    global context
-    grid = context['grid']  # type: GridIndex2D
-    aabb1 = AABB2D(0.0, 0.0, 32.0, 32.0)
-    grid.insert(aabb1)
-    aabb1.pos = 40.0, 40.0
 
-    grid.recalculate()
+def _scatter(count, density, seed=0):
+    """
+    Picks a grid size so the boxes fill it at the given density, and scatters boxes over it.
 
+    :return: Tuple of the number of columns and rows, the boxes, and the extent of the area they are in.
+    """
+    side = int(ceil(sqrt(count / density)))
+    extent = side * CELL_SIZE - CELL_SIZE
+    rng = random.Random(seed)
+    boxes = [AABB2D(rng.uniform(0.0, extent), rng.uniform(0.0, extent), CELL_SIZE, CELL_SIZE) for _ in range(count)]
+    return side, boxes, extent
 
-if __name__ == '__main__':
-    print(timeit(lambda: work(), number=60))
+
+def _grid(side, boxes):
+    grid = GridIndex2D(dimensions=(side, side), cell_size=(CELL_SIZE, CELL_SIZE))
+    for box in boxes:
+        grid.insert(box)
+    return grid
+
+
+@benchmark(count=COUNTS, density=DENSITIES)
+def grid_insert(count, density):
+    side, boxes, _extent = _scatter(count, density)
+    return lambda: _grid(side, boxes)
+
+
+@benchmark(count=COUNTS, density=DENSITIES)
+def grid_find(count, density):
+    side, boxes, extent = _scatter(count, density)
+    grid = _grid(side, boxes)
+    rng = random.Random(1)
+    queries = [AABB2D(rng.uniform(0.0, extent), rng.uniform(0.0, extent), 64.0, 64.0) for _ in range(100)]
+
+    def work():
+        for query in queries:
+            for _ in grid.find(query):
+                pass
+    return work
+
+
+@benchmark(count=COUNTS, density=DENSITIES)
+def grid_recalculate(count, density):
+    """
+    A tenth of the boxes move by half a cell, back and forth, like actors walking every frame.
+    """
+    side, boxes, _extent = _scatter(count, density)
+    grid = _grid(side, boxes)
+    moving = boxes[::10]
+    direction = [CELL_SIZE * 0.5]
+
+    def work():
+        for box in moving:
+            box.x += direction[0]
+        direction[0] = -direction[0]
+        grid.recalculate()
+    return work
+
+
+@benchmark()
+def grid_insert_recalculate_empty():
+    """
+    One box inserted into an empty default grid and moved, 60 times.
+    """
+    def work():
+        grid = GridIndex2D()
+        for _ in range(60):
+            box = AABB2D(0.0, 0.0, 32.0, 32.0)
+            grid.insert(box)
+            box.pos = 40.0, 40.0
+            grid.recalculate()
+    return work
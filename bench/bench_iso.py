@@ -0,0 +1,28 @@
+import random
+
+from bench.harness import benchmark
+from bench.bench_tilemap import create_tilemap
+from little_doors.aabb import AABB3D
+from little_doors.iso import hex_bounds, topological_sort
+
+# Width and depth in cells of the square maps the sort benchmarks run with.
+MAP_SIZES = [16, 32, 64]
+
+
+@benchmark(count=[100, 1000, 10000])
+def iso_hex_bounds(count):
+    rng = random.Random(0)
+    boxes = [AABB3D(rng.uniform(0.0, 64.0), rng.uniform(0.0, 64.0), rng.uniform(0.0, 4.0), 1.0, 1.0, 1.0)
+             for _ in range(count)]
+
+    def work():
+        for box in boxes:
+            hex_bounds(box)
+    return work
+
+
+@benchmark(size=MAP_SIZES)
+def iso_topological_sort(size):
+    tilemap, grid = create_tilemap(size)
+    tiles = list(tilemap.visible_tiles())
+    return lambda: topological_sort(tiles, grid)
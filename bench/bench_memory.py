@@ -0,0 +1,141 @@
+"""
+Memory taken by the core data structures, and allocated per frame.
+
+Limits are set a little above what CPython 3.11 measures, so growth fails the run while small differences
+between patch releases don't.
+"""
+from bench.bench_grid_index_2d import COUNTS, DENSITIES, CELL_SIZE, _scatter, _grid
+from bench.bench_tilemap import MAP_SIZES, create_tilemap, create_tile_set
+from bench.harness import size_benchmark, frame_benchmark
+from little_doors import headless
+from little_doors.aabb import AABB2D, AABB3D
+from little_doors.headless import NullTexture
+from little_doors.tile import Tile, TileInstance
+
+# Most memory a frame may allocate at once, per tile or object it draws. Depth sorting keeps an entry per
+# object in a few sets and dictionaries, and the renderer a slot, which comes to about 200 bytes with the
+# slack of growing tables.
+FRAME_PEAK_BYTES_PER_DRAWN = 256
+
+# Memory a frame may leave as garbage in reference cycles, per tile or object it draws. The sort's recursive
+# closure refers to itself, so its tables are only freed by the collector, unless a young collection during
+# the frame already freed them. Measured between 30 and 90 bytes.
+FRAME_GARBAGE_BYTES_PER_DRAWN = 128
+
+# Young generation collections per frame: at most one every 20 frames, or 3 a second at 60 frames a second.
+FRAME_GC_COLLECTIONS = 0.05
+
+# The view of the frame benchmark, in world space. Smaller maps fit inside it, larger ones are cut off by it.
+FRAME_VIEW_SIZE = (640.0, 480.0)
+
+# Number of objects built by the per-object benchmarks. Large enough that per-container overhead averages out.
+OBJECT_COUNT = 10000
+
+
+@size_benchmark(limits={'bytes_per_unit': 112})
+def memory_aabb2d():
+    return lambda: ([AABB2D(float(n), 0.0, CELL_SIZE, CELL_SIZE) for n in range(OBJECT_COUNT)], OBJECT_COUNT)
+
+
+@size_benchmark(limits={'bytes_per_unit': 340})
+def memory_tile():
+    def build():
+        return [Tile(n, 'tile', anchor=(16.0, 8.0), dimension=(1.0, 1.0, 1.0), tile_size=(32.0, 32.0))
+                for n in range(OBJECT_COUNT)], OBJECT_COUNT
+    return build
+
+
+@size_benchmark(limits={'bytes_per_unit': 280})
+def memory_tile_instance():
+    tile = create_tile_set()[1]
+    return lambda: ([TileInstance(tile, (float(n), 0.0, 0.0), (0.0, 0.0)) for n in range(OBJECT_COUNT)],
+                    OBJECT_COUNT)
+
+
+@size_benchmark(limits={'bytes_per_unit': 680}, count=COUNTS, density=DENSITIES)
+def memory_grid_box(count, density):
+    """
+    Memory the grid takes per indexed box, not counting the boxes themselves.
+    """
+    side, boxes, _extent = _scatter(count, density)
+    return lambda: (_grid(side, boxes), count)
+
+
+@size_benchmark(limits={'bytes_per_unit': 128}, size=MAP_SIZES)
+def memory_tilemap_cell(size):
+    """
+    Memory a tile map takes per cell, after every visible tile was drawn once. Tile instances are only kept while
+    they are used, so what remains is 2 bytes of terrain and a byte of occlusion state per cell, the slack of the
+    weak instance cache, which keeps room for the most tiles used at once, and the map's fixed cost, which is
+    largest per cell on the smallest map.
+    """
+    def build():
+        tilemap, _grid = create_tilemap(size)
+        list(tilemap.visible_tiles())
+        return tilemap, size * size
+    return build
+
+
+def _frame_limits(size):
+    """
+    Limits of a frame, scaled by how many tiles and objects it draws, which grows with the map until the map is
+    larger than the view.
+    """
+    tilemap, grid, _actor, view = _frame_scene(size)
+    drawn = len(tilemap.draw_order(grid, view))
+    return {
+        'peak_bytes_per_frame': FRAME_PEAK_BYTES_PER_DRAWN * drawn,
+        'garbage_bytes_per_frame': FRAME_GARBAGE_BYTES_PER_DRAWN * drawn,
+        # Anything retained after collecting grows without bound over a session.
+        'retained_bytes_per_frame': 64,
+        'gc_collections_per_frame': FRAME_GC_COLLECTIONS,
+    }
+
+
+def _frame_scene(size):
+    """
+    :return: Tuple of a map filled with tiles, its object grid, an actor on the map, and the view.
+    """
+    tile_set = create_tile_set()
+    for tile in tile_set.values():
+        tile.image = NullTexture(int(tile.aabb2d.width), int(tile.aabb2d.height))
+    tilemap, grid = create_tilemap(size, tile_set)
+    actor = _Actor()
+    tilemap.add_object(actor)
+    grid.insert(actor.aabb2d)
+    width, height = FRAME_VIEW_SIZE
+    view = AABB2D(-width / 2.0, size * 8.0 - height / 2.0, width, height)
+    return tilemap, grid, actor, view
+
+
+@frame_benchmark(limits=_frame_limits, size=MAP_SIZES)
+def memory_frame(size):
+    """
+    A frame of the dimetric scene: an actor moves, the index is recalculated, and the view is depth sorted and
+    drawn. Drawing runs headless, so the renderer splits the draw order into texture runs, but no vertex lists
+    are created. Headless mode is only on while a frame runs, and the mode from before is restored after it,
+    without allocating anything that would count towards the frame.
+    """
+    tilemap, grid, actor, view = _frame_scene(size)
+    direction = [1.0]
+
+    def frame():
+        was_headless = headless.is_enabled()
+        headless.enable()
+        try:
+            actor.aabb2d.x += direction[0]
+            direction[0] = -direction[0]
+            grid.recalculate()
+            tilemap.draw(grid, view)
+        finally:
+            if not was_headless:
+                headless.disable()
+    return frame
+
+
+class _Actor(object):
+
+    def __init__(self):
+        self.image = NullTexture(32, 64)
+        self.aabb3d = AABB3D(0.0, 0.0, 1.0, 0.7, 0.7, 1.0)
+        self.aabb2d = AABB2D(0.0, 0.0, 32.0, 64.0)
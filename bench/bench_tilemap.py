@@ -0,0 +1,81 @@
+import random
+from array import array
+
+from bench.harness import benchmark
+from little_doors.aabb import AABB2D
+from little_doors.grid import GridIndex2D
+from little_doors.tile import Tile
+from little_doors.tilemap import TileMap
+
+# Width and depth in cells of the square maps the benchmarks run with.
+MAP_SIZES = [16, 32, 64]
+
+# Width and depth in cells of the map that bulk loading is timed with.
+LARGE_MAP_SIZE = 1024
+
+# Loading a large map has to take well under a second. A quarter of a second leaves room for slow machines,
+# while a loop over every cell in Python still takes several times as long.
+LARGE_LOAD_LIMITS = {'best': 0.25}
+
+
+def create_tile_set():
+    # Tiles without images, so nothing needs a GL context.
+    return {
+        1: Tile(1, 'block', anchor=(16.0, 8.0), dimension=(1.0, 1.0, 1.0), tile_size=(32.0, 32.0)),
+        2: Tile(2, 'wide', anchor=(16.0, 8.0), dimension=(2.0, 1.0, 1.0), tile_size=(48.0, 40.0)),
+    }
+
+
+def create_tile_data(size, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice((0, 1, 1, 1, 2)) for _ in range(size * size)]
+
+
+def create_tilemap(size, tile_set=None):
+    """
+    Creates a square map filled with tiles, and a grid covering it for the objects placed on the map.
+
+    :param tile_set: Tile prototypes for indexes 1 and 2. Defaults to ``create_tile_set()``.
+    :return: Tuple of the tile map and the grid.
+    """
+    # Maps spread from the origin to the left and right, and up to their full width and depth.
+    cells = size * 2 + 4
+    grid = GridIndex2D(position=(-size * 32.0 - 64.0, -64.0), dimensions=(cells, cells), cell_size=(32.0, 32.0))
+    tilemap = TileMap((size, size))
+    tilemap.load_tile_set(tile_set or create_tile_set())
+    tilemap.load_tile_data(create_tile_data(size))
+    return tilemap, grid
+
+
+@benchmark(size=MAP_SIZES)
+def tilemap_load_tile_data(size):
+    tilemap, _grid = create_tilemap(size)
+    data = create_tile_data(size, seed=1)
+    return lambda: tilemap.load_tile_data(data)
+
+
+@benchmark(limits=LARGE_LOAD_LIMITS)
+def tilemap_load_large():
+    """
+    Bulk load of a large layer from a buffer, without a spatial index, like a map read from a file.
+    """
+    tilemap = TileMap((LARGE_MAP_SIZE, LARGE_MAP_SIZE))
+    tilemap.load_tile_set(create_tile_set())
+    data = array('H', create_tile_data(LARGE_MAP_SIZE))
+    return lambda: tilemap.load_tile_data(data)
+
+
+@benchmark(size=MAP_SIZES)
+def tilemap_draw_order(size):
+    tilemap, grid = create_tilemap(size)
+    return lambda: tilemap.draw_order(grid)
+
+
+@benchmark(size=MAP_SIZES)
+def tilemap_draw_order_view(size):
+    """
+    Draw order for a 640 by 480 view over the middle of the map, like a camera with a size factor of 1.
+    """
+    tilemap, grid = create_tilemap(size)
+    view = AABB2D(-320.0, size * 8.0 - 240.0, 640.0, 480.0)
+    return lambda: tilemap.draw_order(grid, view)
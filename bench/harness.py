@@ -0,0 +1,343 @@
+"""
+Parameterized benchmarks with JSON results, and comparison against a stored baseline.
+
+Benchmarks are functions registered with ``@benchmark``. Each is called once per combination of its parameters
+to set up, and returns the function that is timed. Benchmarks of work with a fixed time budget can also have
+limits, which fail the run on their own, without a baseline.
+
+Memory benchmarks are registered with ``@size_benchmark`` or ``@frame_benchmark``, and measured with
+``tracemalloc``. They have fixed limits instead of a baseline, because memory use doesn't vary between runs.
+"""
+import gc
+import importlib
+import itertools
+import json
+import pkgutil
+import platform
+import statistics
+import time
+import tracemalloc
+from array import array
+from collections import namedtuple
+
+RESULTS_VERSION = 1
+
+# Times each benchmark runs when no repeat count is specified. The best run is compared, because noise from
+# the rest of the system only ever makes runs slower.
+DEFAULT_REPEAT = 5
+
+# Each run calls the benchmark as many times as it takes to last at least this many seconds.
+DEFAULT_MIN_TIME = 0.02
+
+# Slowdown, as a fraction of the baseline, from which a benchmark counts as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+# Frames run before measuring a frame benchmark, so caches and lazily created state are in place.
+DEFAULT_WARMUP_FRAMES = 10
+
+# Frames a frame benchmark is measured over when no count is specified.
+DEFAULT_FRAMES = 100
+
+Benchmark = namedtuple('Benchmark', ('name', 'setup', 'params', 'limits'), defaults=(None,))
+MemoryBenchmark = namedtuple('MemoryBenchmark', ('name', 'setup', 'params', 'measure', 'limits'))
+Comparison = namedtuple('Comparison', ('name', 'baseline', 'current', 'ratio', 'regression'))
+Violation = namedtuple('Violation', ('name', 'metric', 'value', 'limit'))
+
+_registry = []
+_memory_registry = []
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def benchmark(limits=None, **params):
+    """
+    Registers a benchmark, run once for every combination of the given parameter values.
+
+    :param limits: Optional maximum value of each reported time in seconds, like ``best``, keyed by metric
+        name. Can also be a function that takes the parameters as keyword arguments, and returns the limits
+        for them.
+    :param params: Lists of values, keyed by the name of the parameter they are passed as.
+    """
+    def decorate(setup):
+        _registry.append(Benchmark(setup.__name__, setup, params, limits))
+        return setup
+    return decorate
+
+
+def size_benchmark(limits, **params):
+    """
+    Registers a benchmark of the memory a data structure takes. The decorated function returns a function
+    that builds the structure, and returns it along with the number of units, like tiles or cells, it holds.
+
+    :param limits: Maximum value of each reported metric, keyed by metric name. Can also be a function that
+        takes the parameters as keyword arguments, and returns the limits for them.
+    :param params: Lists of values, keyed by the name of the parameter they are passed as.
+    """
+    def decorate(setup):
+        _memory_registry.append(MemoryBenchmark(setup.__name__, setup, params, measure_size, limits))
+        return setup
+    return decorate
+
+
+def frame_benchmark(limits, **params):
+    """
+    Registers a benchmark of the memory allocated while running frames. The decorated function returns a
+    function that runs one frame.
+
+    :param limits: Maximum value of each reported metric, keyed by metric name, or a function returning them,
+        like for ``size_benchmark()``.
+    :param params: Lists of values, keyed by the name of the parameter they are passed as.
+    """
+    def decorate(setup):
+        _memory_registry.append(MemoryBenchmark(setup.__name__, setup, params, measure_frames, limits))
+        return setup
+    return decorate
+
+
+def _import_all(package):
+    module = importlib.import_module(package)
+    for info in pkgutil.iter_modules(module.__path__):
+        if info.name.startswith('bench_'):
+            importlib.import_module('%s.%s' % (package, info.name))
+
+
+def discover(package='bench'):
+    """
+    Imports every ``bench_*`` module in a package, registering their benchmarks.
+
+    :return: Registered timing benchmarks.
+    """
+    _import_all(package)
+    return list(_registry)
+
+
+def discover_memory(package='bench'):
+    """
+    Like ``discover()``, for memory benchmarks.
+
+    :return: Registered memory benchmarks.
+    """
+    _import_all(package)
+    return list(_memory_registry)
+
+
+def cases(benchmarks, name_filter=None):
+    """
+    Expands benchmarks into one case for each combination of their parameters.
+
+    :param name_filter: Only include cases whose name contains this text.
+    :return: List of tuples of case name, benchmark and parameters.
+    """
+    result = []
+    for bench in benchmarks:
+        keys = sorted(bench.params)
+        for values in itertools.product(*(bench.params[key] for key in keys)):
+            params = dict(zip(keys, values))
+            name = bench.name
+            if params:
+                name += '[%s]' % ','.join('%s=%s' % (key, params[key]) for key in keys)
+            if name_filter is None or name_filter in name:
+                result.append((name, bench, params))
+    return result
+
+
+def measure(work, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """
+    Times a function.
+
+    :return: Dictionary with the best and median time per call in seconds, and the calls per run.
+    """
+    loops = 1
+    while True:
+        elapsed = _time(work, loops)
+        if elapsed >= min_time:
+            break
+        # Aim a little past the minimum, so the next attempt usually makes it.
+        loops = max(loops * 2, int(loops * min_time * 1.2 / elapsed) if elapsed > 0.0 else loops * 10)
+
+    times = [elapsed / loops] + [_time(work, loops) / loops for _ in range(repeat - 1)]
+    return {'best': min(times), 'median': statistics.median(times), 'loops': loops}
+
+
+def _time(work, loops):
+    started = time.perf_counter()
+    for _ in range(loops):
+        work()
+    return time.perf_counter() - started
+
+
+def run(benchmarks, name_filter=None, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, log=None):
+    """
+    Runs benchmarks.
+
+    :param log: Optional function called with each case's name and result as it finishes.
+    :return: Results, ready to be saved as JSON.
+    """
+    results = {}
+    for name, bench, params in cases(benchmarks, name_filter):
+        result = measure(bench.setup(**params), repeat, min_time)
+        result['params'] = params
+        results[name] = result
+        if log is not None:
+            log(name, result)
+
+    return {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def check_limits(benchmarks, results):
+    """
+    Checks timing results against the limits of the benchmarks that have them.
+
+    :param results: Results from ``run()``.
+    :return: List of ``Violation``.
+    """
+    violations = []
+    for name, bench, params in cases(benchmarks):
+        if name in results['results']:
+            violations.extend(_exceeded(name, bench.limits, params, results['results'][name]))
+    return violations
+
+
+def _exceeded(name, limits, params, result):
+    if limits is None:
+        return []
+    if callable(limits):
+        limits = limits(**params)
+    return [Violation(name, metric, result[metric], limit) for metric, limit in sorted(limits.items())
+            if result[metric] > limit]
+
+
+def measure_size(build):
+    """
+    Measures the memory taken by what a function builds.
+
+    :param build: Function returning a tuple of what it built, and the number of units in it.
+    :return: Dictionary with the bytes in total and per unit, and the number of units.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built, units = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del built
+    return {'bytes': size, 'units': units, 'bytes_per_unit': size / units}
+
+
+def measure_frames(frame, frames=DEFAULT_FRAMES, warmup=DEFAULT_WARMUP_FRAMES):
+    """
+    Measures the memory allocated while running frames.
+
+    ``tracemalloc`` only sees memory that is still allocated, so churn is measured as the peak of memory in
+    use during a frame above what was in use before it, and as the number of collections of the youngest
+    garbage collector generation, which is what object churn costs in pauses.
+
+    Memory left allocated after the frames is split into garbage in reference cycles, which only the garbage
+    collector frees, and memory retained even after collecting.
+
+    :param frame: Function that runs one frame.
+    :return: Dictionary with the median and highest peak bytes per frame, the garbage and retained bytes per
+        frame, and the youngest generation collections per frame.
+    """
+    for _ in range(warmup):
+        frame()
+
+    gc.collect()
+    collections = gc.get_stats()[0]['collections']
+    tracemalloc.start()
+    try:
+        # Preallocated, so recording the peaks isn't counted as retained memory.
+        peaks = array('q', [0] * frames)
+        start = tracemalloc.get_traced_memory()[0]
+        for n in range(frames):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            frame()
+            peaks[n] = tracemalloc.get_traced_memory()[1] - current
+        collections = gc.get_stats()[0]['collections'] - collections
+        uncollected = tracemalloc.get_traced_memory()[0] - start
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_bytes_per_frame': statistics.median(peaks),
+        'max_peak_bytes_per_frame': max(peaks),
+        'garbage_bytes_per_frame': (uncollected - retained) / frames,
+        'retained_bytes_per_frame': retained / frames,
+        'gc_collections_per_frame': collections / frames,
+    }
+
+
+def run_memory(benchmarks, name_filter=None, log=None):
+    """
+    Runs memory benchmarks, and checks their results against their limits.
+
+    :param log: Optional function called with each case's name and result as it finishes.
+    :return: Tuple of the results, ready to be saved as JSON, and a list of ``Violation``.
+    """
+    results = {}
+    violations = []
+    for name, bench, params in cases(benchmarks, name_filter):
+        result = bench.measure(bench.setup(**params))
+        result['params'] = params
+        results[name] = result
+        violations.extend(_exceeded(name, bench.limits, params, result))
+        if log is not None:
+            log(name, result)
+
+    return {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }, violations
+
+
+def save(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(filename):
+    with open(filename, 'r') as f:
+        results = json.load(f)
+    if results.get('version', None) != RESULTS_VERSION:
+        raise BenchmarkError("%s has results version %s, expected %d"
+                             % (filename, results.get('version', None), RESULTS_VERSION))
+    return results
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the best times of the cases that both results have.
+
+    :param baseline: Results to compare against.
+    :param current: New results.
+    :param threshold: Slowdown, as a fraction of the baseline time, from which a case counts as a regression.
+    :return: List of ``Comparison``, by case name.
+    """
+    comparisons = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before = baseline['results'][name]['best']
+        after = current['results'][name]['best']
+        ratio = after / before if before > 0.0 else float('inf')
+        comparisons.append(Comparison(name, before, after, ratio, ratio > 1.0 + threshold))
+    return comparisons
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.2f %s' % (seconds / scale, unit)
+    return '%.0f ns' % (seconds / 1e-9)
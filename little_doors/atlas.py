@@ -0,0 +1,209 @@
+"""
+Shared texture atlas for tile, actor and UI images.
+"""
+import json
+import os
+from typing import Dict, List
+
+import pyglet
+
+from little_doors import headless
+from little_doors.headless import NullTexture, load_null_image
+from little_doors.resource import default_cache
+
+# Size of each atlas texture. Large enough to hold every image the game currently ships in one texture.
+DEFAULT_TEXTURE_SIZE = (1024, 1024)
+
+
+class AtlasError(Exception):
+    """
+    Error while adding to or looking up images in an atlas.
+    """
+
+
+class Atlas(object):
+    """
+    Packs images into a few large textures, and looks up the packed regions by name.
+
+    Drawing images that share a texture needs no texture binds in between, which lets batched rendering
+    collapse into very few draw calls. Images are added once; adding a name that is already in the atlas
+    returns the existing region. Image files are read through a resource cache, so files with identical
+    content share one region even when they are stored under different paths.
+
+    In headless mode regions are null textures, and image files are not decoded.
+    """
+
+    def __init__(self, texture_size=DEFAULT_TEXTURE_SIZE, cache=None):
+        """
+        :param texture_size: Width and height of each atlas texture.
+        :type cache: ResourceCache
+        :param cache: Cache image files are read through. Defaults to the shared cache.
+        """
+        self._texture_size = texture_size
+        self._cache = cache or default_cache()
+
+        # Created on first use, because textures need a GL context.
+        self._bin = None  # type: pyglet.image.atlas.TextureBin
+        self._regions = {}  # type: Dict[str, pyglet.image.TextureRegion]
+
+        # Pages of pre-packed atlases.
+        self._packed = []  # type: List[pyglet.image.Texture]
+
+        # Regions of images loaded from files, keyed by content hash.
+        self._by_digest = {}  # type: Dict[str, pyglet.image.TextureRegion]
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def textures(self):
+        """
+        The atlas textures that images have been packed into so far.
+        """
+        if self._bin is None:
+            return list(self._packed)
+        return self._packed + [atlas.texture for atlas in self._bin.atlases]
+
+    def add(self, name, image):
+        """
+        Packs an image into the atlas.
+
+        :param name: Name to look the image up by.
+        :type image: pyglet.image.AbstractImage
+        :param image: Image data to copy into the atlas.
+        :return: Region of the atlas containing the image.
+        """
+        region = self._regions.get(name, None)
+        if region is not None:
+            return region
+
+        if headless.is_enabled():
+            region = self._regions[name] = NullTexture(image.width, image.height)
+            return region
+
+        if self._bin is None:
+            width, height = self._texture_size
+            self._bin = pyglet.image.atlas.TextureBin(width, height, border=True)
+
+        count = len(self._bin.atlases)
+        try:
+            region = self._bin.add(image)
+        except pyglet.image.atlas.AllocatorException:
+            raise AtlasError("image %s does not fit in an atlas texture" % name)
+
+        if len(self._bin.atlases) != count:
+            _pixelate(self._bin.atlases[-1].texture)
+
+        self._regions[name] = region
+        return region
+
+    def load(self, filename, name=None):
+        """
+        Loads an image file into the atlas, unless it has already been loaded.
+
+        :param filename: Path to the image file.
+        :param name: Name to look the image up by. Defaults to the normalized file path.
+        :return: Region of the atlas containing the image.
+        """
+        name = name or os.path.normpath(filename)
+        region = self._regions.get(name, None)
+        if region is not None:
+            return region
+
+        if headless.is_enabled():
+            region = self._regions[name] = load_null_image(filename)
+            return region
+
+        resource = self._cache.acquire(filename)
+        try:
+            return self.add_resource(name, resource)
+        finally:
+            self._cache.release(resource)
+
+    def add_resource(self, name, resource):
+        """
+        Packs a cached image into the atlas, unless an image with the same content is already packed.
+
+        The atlas keeps its own copy of the pixels, so the caller may release the resource afterwards.
+
+        :param name: Name to look the image up by.
+        :type resource: ImageResource
+        :return: Region of the atlas containing the image.
+        """
+        region = self._regions.get(name, None)
+        if region is not None:
+            return region
+
+        region = self._by_digest.get(resource.digest, None)
+        if region is None:
+            region = self.add(name, resource.image)
+            self._by_digest[resource.digest] = region
+        else:
+            self._regions[name] = region
+        return region
+
+    def load_packed(self, index_filename):
+        """
+        Loads an atlas pre-packed by ``manage.py assets build --atlas``. Its pages are uploaded as they are, so
+        none of the images it contains have to be decoded or packed at runtime.
+
+        :param index_filename: Path to the atlas index JSON file.
+        """
+        with open(index_filename, 'r') as f:
+            index = json.load(f)
+
+        directory = os.path.dirname(index_filename)
+        textures = []
+        for page in index['pages']:
+            if headless.is_enabled():
+                textures.append(load_null_image(os.path.join(directory, page)))
+                continue
+            texture = pyglet.image.load(os.path.join(directory, page)).get_texture()
+            _pixelate(texture)
+            textures.append(texture)
+        self._packed.extend(textures)
+
+        for name, region in index['regions'].items():
+            if name not in self._regions:
+                texture = textures[region['page']]
+                self._regions[name] = texture.get_region(region['x'], region['y'], region['width'], region['height'])
+
+    def get(self, name):
+        """
+        :return: Region of the atlas with the given name, or None if there is no such image.
+        """
+        return self._regions.get(name, None)
+
+    def __getitem__(self, name):
+        region = self._regions.get(name, None)
+        if region is None:
+            raise AtlasError("atlas does not contain image %s" % name)
+        return region
+
+    def __contains__(self, name):
+        return name in self._regions
+
+
+def _pixelate(texture):
+    """
+    Sets nearest neighbour filtering on a texture, so pixel art stays crisp when scaled.
+    """
+    gl = pyglet.gl
+    gl.glBindTexture(texture.target, texture.id)
+    gl.glTexParameteri(texture.target, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+    gl.glTexParameteri(texture.target, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+    gl.glBindTexture(texture.target, 0)
+
+
+_default_atlas = None
+
+
+def default_atlas():
+    """
+    The process-wide atlas shared by tile sets, actors and menus.
+    """
+    global _default_atlas
+    if _default_atlas is None:
+        _default_atlas = Atlas()
+    return _default_atlas
@@ -1,17 +1,47 @@
-from pyglet.gl import *
+import pyglet
 
+from little_doors.aabb import AABB2D
+from little_doors import headless
 from little_doors.context import Context
 
+# Window size assumed when a camera is created without a window.
+DEFAULT_WINDOW_SIZE = (640, 480)
+
 
 # noinspection PyMethodMayBeStatic
 class PixelCamera(object):
+    """
+    Orthographic camera that maps world pixels to window pixels by a size factor.
+
+    The visible bounds and the projection matrix are cached, and only recomputed after the position, size
+    factor or window size change, so reading them is cheap enough to do for every culling query.
+    """
+
+    def __init__(self, window_size=None, size_factor=0.5):
+        """
+        :param window_size: Width and height of the window in pixels. Defaults to the size of the current
+            context's window.
+        :param size_factor: World pixels per window pixel.
+        """
+        if window_size is None:
+            ctx = Context.current()
+            window_size = (ctx.window.width, ctx.window.height) if ctx and ctx.window else DEFAULT_WINDOW_SIZE
 
-    def __init__(self):
         self._x = 0.0
         self._y = 0.0
-        self._width = 640 * 0.5
-        self._height = 480 * 0.5
-        self._size_factor = 0.5
+        self._window_size = window_size
+        self._size_factor = size_factor
+
+        # Derived state, recomputed by _update().
+        self._width = 0.0
+        self._height = 0.0
+        self._projection = None  # type: tuple
+        self._update()
+
+    def _update(self):
+        self._width = self._window_size[0] * self._size_factor
+        self._height = self._window_size[1] * self._size_factor
+        self._projection = ortho_matrix(self._x, self._x + self._width, self._y, self._y + self._height)
 
     @property
     def left(self):
@@ -23,27 +53,79 @@ class PixelCamera(object):
 
     @property
     def right(self):
-        ctx = Context.current()
-        width = ctx.window.width * self._size_factor
-        return self._x + width
+        return self._x + self._width
 
     @property
     def top(self):
-        ctx = Context.current()
-        height = ctx.window.height * self._size_factor
-        return self._y + height
+        return self._y + self._height
+
+    @property
+    def size_factor(self):
+        """
+        World pixels per window pixel. Larger factors zoom out.
+        """
+        return self._size_factor
 
     @property
     def width(self):
+        """
+        Width of the visible world in pixels.
+        """
         return self._width
 
     @property
     def height(self):
+        """
+        Height of the visible world in pixels.
+        """
         return self._height
 
+    @property
+    def window_size(self):
+        return self._window_size
+
+    @property
+    def bounds(self):
+        """
+        Visible world space as a tuple of left, bottom, right and top.
+        """
+        return self._x, self._y, self._x + self._width, self._y + self._height
+
+    @property
+    def projection(self):
+        """
+        Matrix that projects the visible world space to clip space, as 16 floats in column-major order.
+        """
+        return self._projection
+
+    def view_aabb2d(self, margin=0.0):
+        """
+        The rectangle of 2D world space visible through the camera.
+
+        :param margin: Distance in pixels to grow the rectangle by on every side, so objects
+            just outside the view are included.
+        :return: New bounding box.
+        """
+        return AABB2D(self._x - margin, self._y - margin, self._width + margin * 2.0, self._height + margin * 2.0)
+
     def set_position(self, x, y):
-        self._x = x
-        self._y = y
+        if (x, y) != (self._x, self._y):
+            self._x = x
+            self._y = y
+            self._update()
+
+    def set_size_factor(self, size_factor):
+        if size_factor != self._size_factor:
+            self._size_factor = size_factor
+            self._update()
+
+    def resize(self, width, height):
+        """
+        Updates the camera to a new window size.
+        """
+        if (width, height) != self._window_size:
+            self._window_size = (width, height)
+            self._update()
 
     def window_to_world(self, x, y):
         """
@@ -53,27 +135,56 @@ class PixelCamera(object):
         """
         return self._x + x * self._size_factor, self._y + y * self._size_factor
 
-    def clear(self):
-        glClear(gl.GL_COLOR_BUFFER_BIT)
-
-    def push_state(self):
-        # Save the current matrix
-        glPushMatrix()
+    def world_to_window(self, x, y):
+        """
+        Takes a point in the world's space and transforms it to coordinates on the window.
 
-        # Initialize projection matrix
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
+        :returns: A tuple with the new x and y values
+        """
+        return (x - self._x) / self._size_factor, (y - self._y) / self._size_factor
 
-        # Initialize model view matrix
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
+    def clear(self):
+        if headless.is_enabled():
+            return
+        gl = pyglet.gl
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
-        # Set orthographic projection matrix
-        glOrtho(self.left, self.right, self.bottom, self.top, 1, -1)
+    def push_state(self):
+        """
+        Loads the camera's projection, saving the previous matrices until ``pop_state()``.
+        """
+        if headless.is_enabled():
+            return
+        gl = pyglet.gl
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadMatrixf((gl.GLfloat * 16)(*self._projection))
 
-        # Pixelate
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
 
     def pop_state(self):
-        glPopMatrix()
+        if headless.is_enabled():
+            return
+        gl = pyglet.gl
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPopMatrix()
+
+
+def ortho_matrix(left, right, bottom, top, near=-1.0, far=1.0):
+    """
+    Builds an orthographic projection matrix, like ``glOrtho``.
+
+    >>> ortho_matrix(0.0, 2.0, 0.0, 2.0)[12:14]
+    (-1.0, -1.0)
+
+    :return: Tuple of 16 floats in column-major order.
+    """
+    width, height, depth = right - left, top - bottom, far - near
+    return (2.0 / width, 0.0, 0.0, 0.0,
+            0.0, 2.0 / height, 0.0, 0.0,
+            0.0, 0.0, -2.0 / depth, 0.0,
+            -(right + left) / width, -(top + bottom) / height, -(far + near) / depth, 1.0)
@@ -0,0 +1,470 @@
+"""
+Chunked tile map that only keeps the chunks near the camera in memory.
+"""
+import itertools
+from collections import OrderedDict
+from math import floor
+from typing import Sequence, Dict, List, Tuple, Set
+
+from typing_extensions import Protocol
+
+from little_doors.iso import iso_to_cart, topological_sort
+from little_doors import profiler
+from little_doors.layer import StaticLayer, overlay_order
+from little_doors.render import OrderedBatchRenderer
+from little_doors.tile import TileInstance
+from little_doors.tilemap import TileMap, TerrainError
+
+DEFAULT_CHUNK_SIZE = (32, 32)
+
+# Number of chunks kept loaded when no capacity is specified.
+DEFAULT_CAPACITY = 64
+
+# Camera size factor, in world pixels per window pixel, from which chunks are drawn as impostors.
+DEFAULT_LOD_THRESHOLD = 2.0
+
+# Texels per world pixel of chunk impostors.
+DEFAULT_LOD_RESOLUTION = 0.125
+
+# Number of chunk impostors kept, including those of chunks that are no longer loaded.
+DEFAULT_IMPOSTOR_CAPACITY = 1024
+
+
+class ChunkSource(Protocol):
+    """
+    Provides the tile data of a single chunk on request.
+    """
+
+    def read_chunk(self, cx, cy) -> Sequence[int]:
+        """
+        :param cx: Chunk coordinate along the x-axis.
+        :param cy: Chunk coordinate along the y-axis.
+        :return: Tile indexes of the chunk in row-major order, sized ``chunk_width * chunk_height``.
+        """
+        raise NotImplementedError()
+
+
+class ArrayChunkSource(object):
+    """
+    Chunk source that slices chunks out of a flat tile data sequence covering the whole map.
+
+    Cells that fall outside the map, at the far edges of the last chunks, are empty.
+    """
+
+    def __init__(self, size, data, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param size: Tuple that contains the width and height of the map.
+        :param data: Tile indexes of the whole map in row-major order.
+        :param chunk_size: Number of cells along each axis of a chunk.
+        """
+        if len(data) != size[0] * size[1]:
+            raise TerrainError("data length does not fit in terrain")
+
+        self._size = size
+        self._data = data
+        self._chunk_size = chunk_size
+
+    def read_chunk(self, cx, cy):
+        width, height = self._size
+        chunk_w, chunk_h = self._chunk_size
+        x0, y0 = cx * chunk_w, cy * chunk_h
+        row_w = max(0, min(chunk_w, width - x0))
+
+        chunk = [0] * (chunk_w * chunk_h)
+        for row in range(min(chunk_h, height - y0)):
+            start = x0 + (y0 + row) * width
+            chunk[row * chunk_w:row * chunk_w + row_w] = self._data[start:start + row_w]
+
+        return chunk
+
+
+class ChunkedTileMap(object):
+    """
+    Tile map split into fixed size chunks, each stored as its own ``TileMap``.
+
+    Chunks are loaded from a chunk source when they come near the camera, and released in least recently
+    used order once more than ``capacity`` chunks are loaded. Loaded tiles are inserted into the given
+    spatial index, and removed again when their chunk is evicted.
+    """
+
+    def __init__(self, size, source, chunk_size=DEFAULT_CHUNK_SIZE, capacity=DEFAULT_CAPACITY, spatial_index=None,
+                 loader=None, prerender=False, lod_threshold=DEFAULT_LOD_THRESHOLD,
+                 lod_resolution=DEFAULT_LOD_RESOLUTION, impostor_capacity=DEFAULT_IMPOSTOR_CAPACITY):
+        """
+        :param size: Tuple that contains the width and height of the map, in cells.
+        :type source: ChunkSource
+        :param source: Provides tile data for chunks as they are loaded.
+        :param chunk_size: Number of cells along each axis of a chunk.
+        :param capacity: Maximum number of chunks kept loaded. Chunks in view are never evicted, even
+            when they exceed the capacity.
+        :type spatial_index: GridIndex2D
+        :param spatial_index: Optional index that loaded tiles are inserted into.
+        :type loader: StreamingLoader
+        :param loader: Optional streaming loader. When given, chunk data is read on a worker thread and
+            the chunk's tiles are indexed one row at a time as the loader is drained, so loading never
+            blocks a frame. Chunks that fail to load are requested again the next time the view is updated.
+        :param prerender: Render each chunk's tiles once into its own offscreen texture, and draw those
+            instead of sorting and drawing every tile each frame. A chunk is rendered again after it is edited.
+        :param lod_threshold: Camera size factor from which each chunk is drawn as a single low resolution
+            impostor texture, baked from its tiles. Impostors outlive their chunk, so zoomed out views of
+            large maps don't need the chunks loaded.
+        :param lod_resolution: Texels per world pixel of impostors.
+        :param impostor_capacity: Maximum number of impostors kept, in least recently drawn order.
+        """
+        self._size = size
+        self._source = source
+        self._chunk_size = chunk_size
+        self._capacity = capacity
+        self._spatial_index = spatial_index
+        self._tile_size_2d = (32.0, 32.0)
+        self._tile_set = dict()
+        self._objects = []
+        self._visible = set()  # type: Set[Tuple[int, int]]
+        self._loader = loader
+        self._prerender = prerender
+        self._lod_threshold = lod_threshold
+        self._lod_resolution = lod_resolution
+        self._impostor_capacity = impostor_capacity
+
+        # Low detail textures of chunks, ordered from least to most recently drawn.
+        self._impostors = OrderedDict()  # type: Dict[Tuple[int, int], StaticLayer]
+
+        # Every chunk near the view, including those only drawn as impostors.
+        self._in_view = set()  # type: Set[Tuple[int, int]]
+
+        # Chunks submitted to the loader that have not arrived yet, with the tiles their build has indexed so far.
+        self._pending = {}  # type: Dict[Tuple[int, int], List[TileInstance]]
+
+        self._renderer = OrderedBatchRenderer()
+
+        # Tiles of loaded chunks and objects keyed by their 2D bounding box.
+        self._by_aabb2d = {}
+
+        # Loaded chunks, ordered from least to most recently used.
+        self._chunks = OrderedDict()  # type: Dict[Tuple[int, int], TileMap]
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @property
+    def chunk_count(self):
+        """
+        Number of chunks along each axis.
+        """
+        return -(-self._size[0] // self._chunk_size[0]), -(-self._size[1] // self._chunk_size[1])
+
+    @property
+    def loaded_chunks(self):
+        """
+        Coordinates of the chunks currently in memory, from least to most recently used.
+        """
+        return list(self._chunks.keys())
+
+    def load_tile_set(self, tile_set):
+        self._tile_set.update(tile_set)
+        for chunk in self._chunks.values():
+            chunk.load_tile_set(tile_set)
+
+    def get_chunk(self, cx, cy):
+        """
+        :return: The chunk at the given chunk coordinates, or None when it is not loaded.
+        """
+        return self._chunks.get((cx, cy), None)
+
+    def get_tile(self, x, y):
+        """
+        :return: The tile at the given cell, or None when the cell is empty or its chunk is not loaded.
+        """
+        chunk_w, chunk_h = self._chunk_size
+        chunk = self._chunks.get((x // chunk_w, y // chunk_h), None)
+        if chunk is None:
+            return None
+        return chunk.get_tile(x % chunk_w, y % chunk_h)
+
+    def chunks_in_view(self, left, bottom, right, top, margin=1):
+        """
+        Determines which chunks are needed to draw the given rectangle of 2D world space.
+
+        :param margin: Number of extra chunks around the view to include, so chunks are loaded before
+            they scroll into view.
+        :return: Set of chunk coordinates.
+        """
+        tile_w, tile_h = self._tile_size_2d
+        chunk_w, chunk_h = self._chunk_size
+        columns, rows = self.chunk_count
+
+        # The view rectangle is a diamond in cartesian space, so take its bounds.
+        corners = [iso_to_cart(x / tile_w, y / tile_h) for x in (left, right) for y in (bottom, top)]
+        x_min = floor(min(c[0] for c in corners) / chunk_w) - margin
+        x_max = floor(max(c[0] for c in corners) / chunk_w) + margin
+        y_min = floor(min(c[1] for c in corners) / chunk_h) - margin
+        y_max = floor(max(c[1] for c in corners) / chunk_h) + margin
+
+        return {(cx, cy)
+                for cy in range(max(0, y_min), min(rows - 1, y_max) + 1)
+                for cx in range(max(0, x_min), min(columns - 1, x_max) + 1)}
+
+    def update_view(self, left, bottom, right, top, margin=1, size_factor=1.0):
+        """
+        Loads the chunks near the given rectangle of 2D world space, and evicts the least recently used
+        chunks that are no longer needed.
+
+        :param size_factor: The camera's size factor. When zoomed out beyond the LOD threshold, chunks that
+            already have an up to date impostor are not loaded.
+        """
+        self._in_view = self.chunks_in_view(left, bottom, right, top, margin)
+        if size_factor >= self._lod_threshold:
+            self._visible = {coord for coord in self._in_view
+                             if coord not in self._impostors or not self._impostors[coord].valid}
+        else:
+            self._visible = set(self._in_view)
+
+        for coord in sorted(self._visible):
+            if coord in self._chunks:
+                self._chunks.move_to_end(coord)
+            elif self._loader is not None:
+                if coord not in self._pending:
+                    registered = self._pending[coord] = []
+                    self._loader.submit(self._source.read_chunk, self._stream_chunk(coord, registered), *coord,
+                                        on_error=lambda _error, coord=coord: self._pending.pop(coord, None))
+            else:
+                self._chunks[coord] = self._load_chunk(*coord)
+
+        self._evict()
+
+    def _load_chunk(self, cx, cy):
+        chunk_w, chunk_h = self._chunk_size
+        chunk = TileMap(self._chunk_size, origin=(cx * chunk_w, cy * chunk_h), prerender=self._prerender)
+        chunk.load_tile_set(self._tile_set)
+        chunk.load_tile_data(self._source.read_chunk(cx, cy))
+        self._register_chunk(chunk)
+        self._watch_chunk((cx, cy), chunk)
+
+        return chunk
+
+    def _register_chunk(self, chunk):
+        for tile in chunk.tiles():
+            self._register_tile(tile)
+
+    def _register_tile(self, tile):
+        self._by_aabb2d[tile.aabb2d] = tile
+        if self._spatial_index is not None:
+            self._spatial_index.insert(tile.aabb2d)
+
+    def _unregister_tile(self, tile):
+        self._by_aabb2d.pop(tile.aabb2d, None)
+        if self._spatial_index is not None:
+            self._spatial_index.remove(tile.aabb2d)
+
+    def _stream_chunk(self, coord, registered):
+        """
+        Creates the main thread half of a streamed chunk load.
+
+        The build stops as soon as its load is cancelled, which happens when the map is deleted.
+
+        :param registered: List that the build appends the tiles it indexes to. Identifies the load in
+            ``_pending``.
+        """
+        def _cancelled():
+            return self._pending.get(coord, None) is not registered
+
+        def _build(data):
+            if _cancelled():
+                return
+            cx, cy = coord
+            chunk_w, chunk_h = self._chunk_size
+            chunk = TileMap(self._chunk_size, origin=(cx * chunk_w, cy * chunk_h), prerender=self._prerender)
+            chunk.load_tile_set(self._tile_set)
+            chunk.load_tile_data(data)
+
+            # Creating tile instances and indexing them is the expensive part, so do it a row at a time.
+            for y in range(chunk_h):
+                for x in range(chunk_w):
+                    tile = chunk.get_tile(x, y)
+                    if tile is not None:
+                        self._register_tile(tile)
+                        registered.append(tile)
+                yield
+                if _cancelled():
+                    chunk.delete()
+                    return
+
+            del self._pending[coord]
+            self._chunks[coord] = chunk
+            self._watch_chunk(coord, chunk)
+            self._evict()
+
+        return _build
+
+    def _watch_chunk(self, coord, chunk):
+        """
+        Keeps the index up to date with the chunk's tiles, and invalidates the chunk's impostor whenever the
+        chunk is edited.
+        """
+        def _invalidate():
+            impostor = self._impostors.get(coord, None)
+            if impostor is not None:
+                impostor.invalidate()
+
+        def _tiles_released(tiles):
+            for tile in tiles:
+                self._unregister_tile(tile)
+
+        def _cells_changed(cells):
+            for x, y, z in cells:
+                tile = chunk.get_tile(x, y, z)
+                if tile is not None:
+                    self._register_tile(tile)
+            _invalidate()
+
+        def _terrain_loaded():
+            for tile in chunk.layer(0):
+                self._register_tile(tile)
+            _invalidate()
+
+        chunk.handle('tiles_released', _tiles_released)
+        chunk.handle('cells_changed', _cells_changed)
+        chunk.handle('terrain_loaded', _terrain_loaded)
+
+    def _unload_chunk(self, chunk):
+        for tile in chunk.tiles():
+            self._unregister_tile(tile)
+
+        chunk.delete()
+
+    def _evict(self):
+        # Oldest chunks are at the front.
+        for coord in list(self._chunks.keys()):
+            if len(self._chunks) <= self._capacity:
+                break
+            if coord in self._visible:
+                continue
+            self._unload_chunk(self._chunks.pop(coord))
+
+    def add_object(self, obj):
+        """
+        Adds an object, to be managed and drawn by the tile map.
+
+        :type obj: MapObject
+        """
+        self._objects.append(obj)
+        self._by_aabb2d[obj.aabb2d] = obj
+
+    def tiles(self):
+        """
+        Iterates the tiles of all loaded chunks.
+        """
+        return itertools.chain.from_iterable(chunk.tiles() for chunk in self._chunks.values())
+
+    def visible_tiles(self):
+        """
+        Iterates the tiles of all loaded chunks that are not completely covered by other tiles.
+        """
+        return itertools.chain.from_iterable(chunk.visible_tiles() for chunk in self._chunks.values())
+
+    def find(self, spatial_index, query):
+        """
+        Queries the spatial index, and resolves the found bounding boxes to the tiles of loaded chunks and
+        the objects.
+
+        :type spatial_index: SpatialIndex2D
+        :param query: Bounding box to query with.
+        :return: Set of tiles and objects.
+        """
+        lookup = self._by_aabb2d
+        return {lookup[k] for _i, _j, k in spatial_index.find(query) if k in lookup}
+
+    def _is_drawn(self, obj):
+        if not isinstance(obj, TileInstance):
+            return True
+        chunk_w, chunk_h = self._chunk_size
+        x, y, z = (int(n) for n in obj.aabb3d.pos)
+        chunk = self._chunks.get((x // chunk_w, y // chunk_h), None)
+        return chunk is not None and not chunk.is_hidden(x % chunk_w, y % chunk_h, z)
+
+    def draw(self, spatial_index, view=None, size_factor=1.0):
+        """
+        Draws the loaded tiles and the objects in depth order. Tiles that are completely covered by other tiles
+        within their chunk are skipped.
+
+        :type view: AABB2D
+        :param view: Optional visible rectangle of world space. When given, only tiles and objects the
+            spatial index finds near the view are sorted and drawn. When chunks are pre-rendered, only the
+            chunks near the view are drawn.
+        :param size_factor: The camera's size factor. From the LOD threshold on, chunks near the view are
+            drawn as impostors, and the view is ignored.
+        """
+        if size_factor >= self._lod_threshold:
+            self._draw_impostors(spatial_index)
+            return
+
+        if self._prerender:
+            self._draw_layers(spatial_index, view)
+            return
+
+        with profiler.phase('sort'):
+            if view is not None:
+                visible = self.find(spatial_index, view)
+                ordered_objects = topological_sort((obj for obj in visible if self._is_drawn(obj)), spatial_index)
+            else:
+                ordered_objects = topological_sort(itertools.chain(self.visible_tiles(), self._objects),
+                                                   spatial_index)
+        self._renderer.update(ordered_objects, self._objects)
+        self._renderer.draw()
+
+    def _draw_layers(self, spatial_index, view):
+        coords = self._chunks.keys() if view is None else self._visible.intersection(self._chunks.keys())
+
+        # Chunks further along x and y are further back, and their tiles never cover the chunks in front.
+        for coord in sorted(coords, key=lambda c: (-(c[0] + c[1]), c)):
+            self._chunks[coord].draw_layer(spatial_index)
+
+        with profiler.phase('sort'):
+            ordered_objects = overlay_order(self._objects, spatial_index, self._by_aabb2d)
+        self._renderer.update(ordered_objects, self._objects)
+        self._renderer.draw()
+
+    def _draw_impostors(self, spatial_index):
+        for coord in sorted(self._in_view, key=lambda c: (-(c[0] + c[1]), c)):
+            impostor = self._impostors.get(coord, None)
+            if impostor is None or not impostor.valid:
+                chunk = self._chunks.get(coord, None)
+                if chunk is None:
+                    # Still loading, and there is no older impostor to stand in.
+                    continue
+                if impostor is None:
+                    impostor = self._impostors[coord] = StaticLayer(resolution=self._lod_resolution)
+                impostor.render(topological_sort(chunk.visible_tiles(), spatial_index))
+
+            self._impostors.move_to_end(coord)
+            impostor.draw()
+
+        while len(self._impostors) > self._impostor_capacity:
+            self._impostors.popitem(last=False)[1].delete()
+
+        # Objects are few, so they are drawn at full detail on top.
+        with profiler.phase('sort'):
+            ordered_objects = topological_sort(self._objects, spatial_index)
+        self._renderer.update(ordered_objects, self._objects)
+        self._renderer.draw()
+
+    def delete(self):
+        """
+        Unloads every chunk, and cancels the chunks that are still loading.
+        """
+        self._renderer.delete()
+        for registered in self._pending.values():
+            for tile in registered:
+                self._unregister_tile(tile)
+        self._pending.clear()
+        for chunk in self._chunks.values():
+            self._unload_chunk(chunk)
+        self._chunks.clear()
+        for impostor in self._impostors.values():
+            impostor.delete()
+        self._impostors.clear()
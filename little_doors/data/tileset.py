@@ -1,9 +1,20 @@
-import pyglet
-
+from little_doors.atlas import default_atlas
+from little_doors.streaming import load_image
 from little_doors.tile import Tile
 
 
-def create_tile_set():
+def create_tile_set(loader=None, atlas=None):
+    """
+    Creates the tile set prototypes, keyed by tile index.
+
+    :type loader: StreamingLoader
+    :param loader: Optional streaming loader. When given, images are loaded in the background and
+        the tiles' ``image`` stays None until the loader has been drained.
+    :type atlas: Atlas
+    :param atlas: Atlas the tile images are packed into. Defaults to the shared atlas.
+    """
+    atlas = atlas or default_atlas()
+
     tiles = [
         Tile(1, "template-1-1-1", resource_filename='./resources/art/tile-template.png', anchor=(16.0, 8.0), depth=1.0,
              dimension=(1.0, 1.0, 1.0), tile_size=(32.0, 32.0)),
@@ -17,16 +28,28 @@ def create_tile_set():
              dimension=(2.0, 2.0, 1.0), tile_size=(64.0, 48.0)),
     ]
 
-    images = dict()
+    if loader is not None:
+        _load_images_async(loader, tiles, atlas)
+        return {tile.index: tile for tile in tiles}
 
-    # Load resources
+    # Load resources. The atlas won't load the same image multiple times.
     for tile in tiles:
-        # Don't load the same images multiple times
-        if tile.resource_filename in images:
-            image = images[tile.resource_filename]
-        else:
-            image = pyglet.image.load(tile.resource_filename)
-
-        tile.image = image
+        tile.image = atlas.load(tile.resource_filename)
 
     return {tile.index: tile for tile in tiles}
+
+
+def _load_images_async(loader, tiles, atlas):
+    # Group tiles by file, so each image is only decoded once.
+    by_filename = dict()
+    for tile in tiles:
+        by_filename.setdefault(tile.resource_filename, []).append(tile)
+
+    def _assign(shared_tiles):
+        def _on_loaded(texture):
+            for tile in shared_tiles:
+                tile.image = texture
+        return _on_loaded
+
+    for filename, shared in by_filename.items():
+        load_image(loader, filename, _assign(shared), atlas=atlas)
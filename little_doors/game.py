@@ -1,50 +1,148 @@
+import time
+
+from little_doors.profiler import FrameProfiler
+from little_doors.replay import TICK, KEY_PRESS, KEY_RELEASE, MOUSE_PRESS, MOUSE_RELEASE, MOUSE_MOTION, RESIZE
 from little_doors.scene import SceneStack
 from little_doors.scenes.start import StartScene
+from little_doors.streaming import StreamingLoader
+from little_doors.timestep import FixedTimestep, DEFAULT_STEP, DEFAULT_MAX_STEPS
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, partial_redraw=False, step=DEFAULT_STEP, max_steps=DEFAULT_MAX_STEPS, clock=time.perf_counter,
+                 profiler=None):
+        """
+        :param partial_redraw: Ask scenes to redraw only the regions of the screen that changed, instead of
+            everything every frame.
+        :param step: Duration in seconds of one simulation step. Scenes are always updated with this delta
+            time, independent of the frame rate.
+        :param max_steps: Maximum number of simulation steps run per frame, which bounds the cost of
+            catching up after a slow frame.
+        :param clock: Function returning the current time in seconds, for scenes that measure time.
+        :type profiler: FrameProfiler
+        :param profiler: Profiler recording the time spent in each phase of a frame. A new one is created and
+            made active when not given.
+        """
         self._window = None
         self._scenes = SceneStack()
+        self._loader = StreamingLoader()
+        self._partial_redraw = partial_redraw
+        self._timestep = FixedTimestep(step, max_steps)
+        self._clock = clock
+        self._profiler = profiler or FrameProfiler()
+        self._profiler.activate()
+        self._recorder = None
 
     @property
     def scenes(self):
         return self._scenes
 
+    @property
+    def partial_redraw(self):
+        return self._partial_redraw
+
+    @property
+    def timestep(self):
+        return self._timestep
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @property
+    def loader(self):
+        """
+        Background loader shared by scenes. Drained at the start of every update.
+        """
+        return self._loader
+
+    @property
+    def recorder(self):
+        return self._recorder
+
+    def record(self, recorder):
+        """
+        Starts passing every input event and frame tick to a recorder, or stops when given None.
+
+        :type recorder: InputRecorder
+        """
+        self._recorder = recorder
+
     def start(self):
         self._scenes.push(StartScene())
 
     def on_mouse_press(self, x, y, button, modifiers):
+        if self._recorder is not None:
+            self._recorder.record(MOUSE_PRESS, x, y, button, modifiers)
         scene = self._scenes.top
         if scene:
-            scene.on_mouse_press(x, y, button, modifiers)
+            with self._profiler.phase('input'):
+                scene.on_mouse_press(x, y, button, modifiers)
 
     def on_mouse_release(self, x, y, button, modifiers):
+        if self._recorder is not None:
+            self._recorder.record(MOUSE_RELEASE, x, y, button, modifiers)
         scene = self._scenes.top
         if scene:
-            scene.on_mouse_release(x, y, button, modifiers)
+            with self._profiler.phase('input'):
+                scene.on_mouse_release(x, y, button, modifiers)
 
     def on_mouse_motion(self, x, y, dx, dy):
+        if self._recorder is not None:
+            self._recorder.record(MOUSE_MOTION, x, y, dx, dy)
         scene = self._scenes.top
         if scene:
-            scene.on_mouse_motion(x, y, dx, dy)
+            with self._profiler.phase('input'):
+                scene.on_mouse_motion(x, y, dx, dy)
 
     def on_key_press(self, symbol, modifiers):
+        if self._recorder is not None:
+            self._recorder.record(KEY_PRESS, symbol, modifiers)
         scene = self._scenes.top
         if scene:
-            scene.on_key_press(symbol, modifiers)
+            with self._profiler.phase('input'):
+                scene.on_key_press(symbol, modifiers)
 
     def on_key_release(self, symbol, modifiers):
+        if self._recorder is not None:
+            self._recorder.record(KEY_RELEASE, symbol, modifiers)
         scene = self._scenes.top
         if scene:
-            scene.on_key_release(symbol, modifiers)
+            with self._profiler.phase('input'):
+                scene.on_key_release(symbol, modifiers)
 
-    def on_update(self, dt):
+    def on_resize(self, width, height):
+        if self._recorder is not None:
+            self._recorder.record(RESIZE, width, height)
         scene = self._scenes.top
         if scene:
-            scene.on_update(dt)
+            scene.on_resize(width, height)
+
+    def on_update(self, dt):
+        """
+        Called once per frame with the frame's delta time. Runs as many fixed simulation steps as fit.
+        """
+        if self._recorder is not None:
+            self._recorder.record(TICK, dt)
+
+        with self._profiler.phase('update'):
+            self._loader.drain()
+
+            for _ in range(self._timestep.advance(dt)):
+                scene = self._scenes.top
+                if scene:
+                    scene.on_update(self._timestep.step)
 
     def on_draw(self):
+        """
+        Draws the top scene, which ends the frame.
+        """
         scene = self._scenes.top
         if scene:
-            scene.on_draw(None)
+            with self._profiler.phase('draw'):
+                scene.on_draw(None, self._timestep.alpha)
+        self._profiler.end_frame()
@@ -1,4 +1,3 @@
-import itertools
 from abc import ABC
 from math import floor, ceil
 from typing import Tuple, List, Optional, Set, Generator
@@ -62,6 +61,17 @@ class GridIndex2D(SpatialIndex2D):
         width, height = dimensions
         self._data = [None] * (width * height)  # type: List[Optional[Set[AABB2D]]]
 
+    @property
+    def position(self) -> Tuple[float, float]:
+        """
+        Position of the grid's first cell, in pixel space.
+        """
+        return self._pos
+
+    @property
+    def cell_size(self) -> Tuple[float, float]:
+        return self._cell_size
+
     def cells_overlapped(self, aabb2d) -> Generator[Tuple[int, int], None, None]:
         """
         Helper to determine which cells the given bounding box overlaps.
@@ -306,5 +316,5 @@ class IndexGroup2D(SpatialIndex2D):
         self._indexes = (first_index,) + indexes
 
     def find(self, query) -> Generator[object, None, None]:
-        for n in itertools.chain(*(idx.find(query) for idx in self._indexes)):
-            yield n
+        for idx in self._indexes:
+            yield from idx.find(query)
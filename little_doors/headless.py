@@ -0,0 +1,164 @@
+"""
+Running the game without a window or GL context.
+
+In headless mode sprites, labels and textures are replaced by null objects that keep their position and size
+but draw nothing, and renderers skip their GL calls. Scenes still run their update and draw order logic, so
+simulations and benchmarks exercise the same code paths as the game, without a display.
+
+Headless mode has to be enabled before ``pyglet.window``, ``pyglet.graphics`` or ``pyglet.text`` are
+imported, because pyglet otherwise opens a hidden window to share GL objects with.
+"""
+import struct
+
+import pyglet
+
+# Size given to images that can't be read as PNG files, like art that hasn't been checked out of LFS.
+PLACEHOLDER_SIZE = (32, 32)
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_enabled = False
+
+
+def enable():
+    """
+    Switches to headless mode.
+    """
+    global _enabled
+    pyglet.options['shadow_window'] = False
+    _enabled = True
+
+
+def disable():
+    """
+    Switches back to drawing through GL. Doesn't bring back pyglet's hidden window if modules were imported
+    while headless.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class NullTexture(object):
+    """
+    Stands in for a texture or texture region. Has a size, but no pixels.
+    """
+    id = 0
+    target = 0
+    tex_coords = (0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.0)
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.anchor_x = 0
+        self.anchor_y = 0
+
+    def get_texture(self):
+        return self
+
+    def get_region(self, x, y, width, height):
+        return NullTexture(width, height)
+
+    def blit(self, x, y, z=0, width=None, height=None):
+        pass
+
+    def delete(self):
+        pass
+
+
+class NullSprite(object):
+    """
+    Stands in for ``pyglet.sprite.Sprite``. Keeps its image and position.
+    """
+
+    def __init__(self, img, x=0, y=0, **kwargs):
+        self.image = img
+        self.x = x
+        self.y = y
+
+    @property
+    def position(self):
+        return self.x, self.y
+
+    @position.setter
+    def position(self, val):
+        self.x, self.y = val
+
+    @property
+    def width(self):
+        return self.image.width
+
+    @property
+    def height(self):
+        return self.image.height
+
+    def draw(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+class NullLabel(object):
+    """
+    Stands in for ``pyglet.text.Label``. Keeps its text and position.
+    """
+
+    def __init__(self, text='', x=0, y=0, **kwargs):
+        self.text = text
+        self.x = x
+        self.y = y
+
+    def draw(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+class NullWindow(object):
+    """
+    Stands in for the game window in a headless ``Context``.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def clear(self):
+        pass
+
+
+def create_sprite(img, x=0, y=0, **kwargs):
+    """
+    :return: A ``pyglet.sprite.Sprite``, or a null sprite in headless mode.
+    """
+    if _enabled:
+        return NullSprite(img, x, y, **kwargs)
+    return pyglet.sprite.Sprite(img, x, y, **kwargs)
+
+
+def create_label(text='', x=0, y=0, **kwargs):
+    """
+    :return: A ``pyglet.text.Label``, or a null label in headless mode.
+    """
+    if _enabled:
+        return NullLabel(text, x, y, **kwargs)
+    return pyglet.text.Label(text, x=x, y=y, **kwargs)
+
+
+def load_null_image(filename):
+    """
+    Creates a null texture the size of an image file, reading only the PNG header.
+
+    :param filename: Path to the image file.
+    :return: New null texture.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != _PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return NullTexture(*PLACEHOLDER_SIZE)
+    return NullTexture(*struct.unpack('>II', header[16:24]))
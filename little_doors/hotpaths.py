@@ -0,0 +1,242 @@
+"""
+Reproducible profiling of a scene's hot paths, for comparing builds.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+
+from little_doors.simulation import Simulation
+
+# Modules whose functions the summary lists.
+HOT_MODULES = ('grid.py', 'iso.py', 'tilemap.py')
+
+# Seconds between stack samples when no interval is specified.
+DEFAULT_INTERVAL = 0.001
+
+# Frames each movement key is held for by the scripted input.
+DEFAULT_WALK_FRAMES = 60
+
+# Functions listed per module in the summary when no limit is specified.
+DEFAULT_SUMMARY_LIMIT = 10
+
+# Time of one function in a profile. Calls is None for sampled profiles, which can't count them.
+FunctionTime = namedtuple('FunctionTime', ('module', 'name', 'line', 'calls', 'self_time', 'total_time'))
+
+
+class StackSampler(object):
+    """
+    Samples the call stack of a thread at a fixed interval, from a background thread.
+
+    Sampling costs the profiled thread little, and doesn't slow down small functions more than big ones, like
+    deterministic profiling does. Stacks are counted in collapsed form, ready for flame graph tools.
+    """
+
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        """
+        :param thread_id: Identifier of the thread to sample. Defaults to the thread creating the sampler.
+        :param interval: Seconds between samples.
+        """
+        self._thread_id = thread_id or threading.get_ident()
+        self._interval = interval
+        self._stacks = Counter()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._elapsed = 0.0
+        self._switch_interval = None
+
+    @property
+    def samples(self):
+        return sum(self._stacks.values())
+
+    @property
+    def elapsed(self):
+        """
+        Seconds spent sampling.
+        """
+        return self._elapsed
+
+    @property
+    def stacks(self):
+        """
+        Counter of samples per stack. Stacks are tuples of function names, outermost first.
+        """
+        return self._stacks
+
+    def start(self):
+        # Let the sampler thread take the interpreter lock as often as it wants to sample.
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self._interval))
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        sys.setswitchinterval(self._switch_interval)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        started = time.perf_counter()
+        while not self._stopping.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id, None)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self._stacks[tuple(reversed(stack))] += 1
+        self._elapsed = time.perf_counter() - started
+
+    def write_collapsed(self, filename):
+        """
+        Writes the sampled stacks in the collapsed format read by ``flamegraph.pl``, speedscope and others:
+        one line per stack, with the functions separated by semicolons, followed by the sample count.
+        """
+        with open(filename, 'w') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write('%s %d\n' % (';'.join(stack), count))
+
+    def function_times(self):
+        """
+        :return: List of ``FunctionTime``, estimated from the share of samples each function appears in.
+        """
+        period = self._elapsed / self.samples if self.samples else 0.0
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self._stacks.items():
+            self_counts[stack[-1]] += count
+            # Recursive functions count once per sample.
+            for name in set(stack):
+                total_counts[name] += count
+
+        times = []
+        for name, count in total_counts.items():
+            function, module, line = _parse_frame_name(name)
+            times.append(FunctionTime(module, function, line, None, self_counts[name] * period, count * period))
+        return times
+
+
+def _frame_name(code):
+    return '%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+def _parse_frame_name(name):
+    function, _, location = name.rpartition(' (')
+    module, _, line = location[:-1].rpartition(':')
+    return function, module, int(line)
+
+
+def stats_function_times(stats):
+    """
+    :type stats: pstats.Stats
+    :return: List of ``FunctionTime`` from a deterministic profile.
+    """
+    return [FunctionTime(os.path.basename(filename), name, line, calls, self_time, total_time)
+            for (filename, line, name), (_primitive, calls, self_time, total_time, _callers) in stats.stats.items()]
+
+
+def hot_functions(function_times, modules=HOT_MODULES, limit=DEFAULT_SUMMARY_LIMIT):
+    """
+    Picks the functions that take the most time in each of the given modules.
+
+    :param function_times: Iterable of ``FunctionTime``.
+    :param modules: File names of the modules.
+    :param limit: Number of functions per module.
+    :return: Dictionary of module file name to lists of ``FunctionTime``, by descending self time.
+    """
+    by_module = {module: [] for module in modules}
+    for function_time in function_times:
+        if function_time.module in by_module:
+            by_module[function_time.module].append(function_time)
+    return {module: sorted(times, key=lambda t: (-t.self_time, t.line))[:limit] for module, times in by_module.items()}
+
+
+def format_summary(hot):
+    """
+    :param hot: Functions per module, from ``hot_functions()``.
+    :return: Text table of the functions, with times in milliseconds.
+    """
+    lines = []
+    for module, times in hot.items():
+        lines.append(module)
+        if not times:
+            lines.append('    (not sampled)')
+        for t in times:
+            calls = '-' if t.calls is None else str(t.calls)
+            lines.append('    %-32s %5d %10s %10.2f %10.2f' % (t.name, t.line, calls, t.self_time * 1000.0,
+                                                               t.total_time * 1000.0))
+    header = '    %-32s %5s %10s %10s %10s' % ('function', 'line', 'calls', 'self ms', 'total ms')
+    return '\n'.join([header] + lines)
+
+
+class WalkScript(object):
+    """
+    Scripted input that holds the movement keys in turn, walking the player around in a square.
+    """
+
+    def __init__(self, game, frames_per_key=DEFAULT_WALK_FRAMES):
+        """
+        :type game: Game
+        :param frames_per_key: Number of frames each key is held for.
+        """
+        from pyglet.window import key
+
+        self._game = game
+        self._frames_per_key = frames_per_key
+        self._keys = (key.D, key.W, key.A, key.S)
+        self._held = None
+
+    def __call__(self, frame):
+        if frame % self._frames_per_key != 0:
+            return
+        if self._held is not None:
+            self._game.on_key_release(self._held, 0)
+        self._held = self._keys[(frame // self._frames_per_key) % len(self._keys)]
+        self._game.on_key_press(self._held, 0)
+
+
+def profile_scene(scene, frames, output, deterministic=False, interval=DEFAULT_INTERVAL):
+    """
+    Runs a scene headless with scripted input under a profiler, and writes the profile.
+
+    Sampled profiles are written as collapsed stacks to ``<output>.folded``, deterministic profiles as
+    ``pstats`` data to ``<output>.pstats``.
+
+    :param scene: Name of the scene in ``simulation.SCENES``.
+    :param frames: Number of frames to run.
+    :param output: Path of the output files, without extension.
+    :param deterministic: Profile with cProfile instead of sampling, to count calls.
+    :param interval: Seconds between samples.
+    :return: Tuple of the path written and a list of ``FunctionTime``.
+    """
+    sim = Simulation()
+    try:
+        sim.start(scene)
+        script = WalkScript(sim.game)
+
+        if deterministic:
+            profiler = cProfile.Profile()
+            profiler.runcall(sim.run, frames, before_frame=script)
+            filename = output + '.pstats'
+            profiler.dump_stats(filename)
+            return filename, stats_function_times(pstats.Stats(profiler))
+
+        with StackSampler(interval=interval) as sampler:
+            sim.run(frames, before_frame=script)
+        filename = output + '.folded'
+        sampler.write_collapsed(filename)
+        return filename, sampler.function_times()
+    finally:
+        sim.shutdown()
@@ -2,9 +2,16 @@
 Isometric projection.
 """
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from math import ceil, floor
 
-from little_doors.aabb import AABB3D
+from little_doors.aabb import AABB3D, AABB2D
+from little_doors.grid import GridIndex2D
+
+# Components smaller than this are sorted in the calling process, because
+# the cost of pickling them to a worker outweighs the sort itself.
+MIN_PARALLEL_COMPONENT = 256
 
 
 def cart_to_iso(x, y, z):
@@ -26,8 +33,19 @@ def cart_to_iso(x, y, z):
     return i, j, k
 
 
-def iso_to_cart():
-    pass
+def iso_to_cart(i, j, k=0.0):
+    """
+    Unprojects a 2D isometric (i, j) coordinate back to 3D cartesian space, on the plane at height ``k``.
+
+    >>> iso_to_cart(0.0, 0.5, 1.0)
+    (1.0, 1.0, 1.0)
+
+    >>> iso_to_cart(-1.0, 1.0)
+    (1.0, 3.0, 0.0)
+    """
+    x = float(i) + 2.0 * float(j)
+    y = 2.0 * float(j) - float(i)
+    return x, y, float(k)
 
 
 def coord_to_hex(x, y, z):
@@ -196,6 +214,9 @@ def topological_sort(objects, spatial_index):
 
         for _i, _j, k in spatial_index.find(node.aabb2d):
             nk = lookup.get(k, None)
+            if nk is None:
+                # Indexed box that is not being sorted.
+                continue
             sk = state.get(nk, None)
 
             if not is_behind(nk.aabb3d, node.aabb3d):
@@ -217,3 +238,139 @@ def topological_sort(objects, spatial_index):
         _sort(enter.pop())
 
     return result
+
+
+def connected_components(objects, spatial_index):
+    """
+    Splits objects into groups that have no draw order constraints between each other.
+
+    Two objects end up in the same component when the spatial index reports them as neighbours, which
+    are exactly the pairs ``topological_sort`` compares. Objects in different components can therefore
+    be sorted independently and concatenated in any order.
+
+    :type objects: Iterator[object]
+    :type spatial_index: SpatialIndex2D
+    :return: List of components, each a list of objects.
+    """
+    objects = list(objects)
+    lookup = {obj.aabb2d: n for n, obj in enumerate(objects)}
+
+    # Union-find over object positions.
+    parents = list(range(len(objects)))
+
+    def _root(n):
+        while parents[n] != n:
+            parents[n] = parents[parents[n]]
+            n = parents[n]
+        return n
+
+    for n, obj in enumerate(objects):
+        for _i, _j, k in spatial_index.find(obj.aabb2d):
+            m = lookup.get(k, None)
+            if m is None:
+                continue
+            a, b = _root(n), _root(m)
+            if a != b:
+                parents[b] = a
+
+    components = {}
+    for n, obj in enumerate(objects):
+        components.setdefault(_root(n), []).append(obj)
+
+    return list(components.values())
+
+
+class _BoxNode(object):
+    """
+    Lightweight stand-in for a map object inside a worker process.
+    """
+    __slots__ = ('index', 'aabb3d', 'aabb2d')
+
+    def __init__(self, index, aabb3d, aabb2d):
+        self.index = index
+        self.aabb3d = aabb3d
+        self.aabb2d = aabb2d
+
+
+def _sort_component(boxes, cell_size, origin):
+    """
+    Worker entry point. Sorts one component given as plain tuples.
+
+    :param boxes: List of ``((x, y, z, width, height, depth), (x, y, width, height))`` tuples.
+    :param cell_size: Cell size of the temporary grid index built for the component.
+    :param origin: Position of a cell corner of the caller's grid. The temporary grid's cells line up with it,
+        so boxes are neighbours in the worker exactly when they are in the caller.
+    :return: List of box positions in draw order.
+    """
+    nodes = [_BoxNode(n, AABB3D(*box3d), AABB2D(*box2d)) for n, (box3d, box2d) in enumerate(boxes)]
+
+    cell_w, cell_h = cell_size
+    origin_x, origin_y = origin
+    x_min = origin_x + floor((min(node.aabb2d.x for node in nodes) - origin_x) / cell_w) * cell_w
+    y_min = origin_y + floor((min(node.aabb2d.y for node in nodes) - origin_y) / cell_h) * cell_h
+    x_max = max(node.aabb2d.x + node.aabb2d.width for node in nodes)
+    y_max = max(node.aabb2d.y + node.aabb2d.height for node in nodes)
+
+    grid = GridIndex2D(position=(x_min, y_min),
+                       dimensions=(ceil((x_max - x_min) / cell_w) + 1, ceil((y_max - y_min) / cell_h) + 1),
+                       cell_size=cell_size)
+    for node in nodes:
+        grid.insert(node.aabb2d)
+
+    return [node.index for node in topological_sort(nodes, grid)]
+
+
+def parallel_topological_sort(objects, spatial_index, executor=None, cell_size=None, origin=None,
+                              min_component_size=MIN_PARALLEL_COMPONENT):
+    """
+    Sorts objects in the same order as ``topological_sort``, but sorts independent components
+    concurrently in a process pool.
+
+    Only the bounding boxes are sent to the workers, so objects don't need to be picklable.
+
+    :type objects: Iterator[object]
+    :type spatial_index: SpatialIndex2D
+    :param executor: Optional ``concurrent.futures`` executor. When omitted a process pool is created
+        for the duration of the call.
+    :param cell_size: Cell size of the grid index workers build for their component. Defaults to the cell size
+        of the spatial index when it is a ``GridIndex2D``, and 32 pixels otherwise.
+    :param origin: Position of a cell corner of the spatial index, which the workers' grids line up with.
+        Defaults to the position of the spatial index when it is a ``GridIndex2D``, and ``(0.0, 0.0)`` otherwise.
+    :param min_component_size: Components smaller than this are sorted in the calling process.
+    :return: Deque of objects in draw order.
+    """
+    if cell_size is None:
+        cell_size = spatial_index.cell_size if isinstance(spatial_index, GridIndex2D) else (32.0, 32.0)
+    if origin is None:
+        origin = spatial_index.position if isinstance(spatial_index, GridIndex2D) else (0.0, 0.0)
+
+    components = connected_components(objects, spatial_index)
+    large = [c for c in components if len(c) >= min_component_size]
+    result = deque()
+
+    if large:
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor()
+
+        try:
+            futures = []
+            for component in large:
+                boxes = [(tuple(obj.aabb3d.pos + obj.aabb3d.dimensions), tuple(obj.aabb2d)) for obj in component]
+                futures.append((component, executor.submit(_sort_component, boxes, cell_size, origin)))
+
+            # Sort the small components while the workers are busy.
+            for component in components:
+                if len(component) < min_component_size:
+                    result.extend(topological_sort(component, spatial_index))
+
+            for component, future in futures:
+                result.extend(component[n] for n in future.result())
+        finally:
+            if own_executor:
+                executor.shutdown()
+    else:
+        for component in components:
+            result.extend(topological_sort(component, spatial_index))
+
+    return result
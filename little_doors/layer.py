@@ -0,0 +1,126 @@
+"""
+Pre-rendered layers of static tiles.
+"""
+from math import floor, ceil
+from typing import Sequence
+
+from little_doors.aabb import AABB2D
+from little_doors.iso import is_behind, topological_sort
+from little_doors.render import OrderedBatchRenderer, RenderTexture, quad
+
+
+class StaticLayer(object):
+    """
+    Static tiles rendered once, in depth order, into an offscreen texture.
+
+    Drawing the layer is a single textured quad no matter how many tiles it holds. The layer is only
+    rendered again after it has been invalidated, which the owning map does whenever its tiles are edited.
+
+    Tiles drawn into the layer are flattened, so objects moving between them have to be drawn on top, along
+    with the tiles that cover them. See ``overlay_order()``.
+
+    A layer with a resolution below 1 is a low detail impostor of its tiles, for drawing large parts of the
+    map when zoomed out.
+    """
+
+    def __init__(self, resolution=1.0):
+        """
+        :param resolution: Texels per world space pixel.
+        """
+        self._resolution = resolution
+        self._target = None  # type: RenderTexture
+        self._bounds = None  # type: AABB2D
+        self._valid = False
+
+    @property
+    def valid(self):
+        """
+        Whether the texture is up to date with the tiles.
+        """
+        return self._valid
+
+    @property
+    def bounds(self):
+        """
+        Rectangle of world space covered by the layer, or None when it is empty.
+        """
+        return self._bounds
+
+    def invalidate(self):
+        self._valid = False
+
+    def render(self, ordered_tiles):
+        """
+        Renders tiles into the layer's texture, replacing what was there.
+
+        :param ordered_tiles: Tiles in the order they are to be drawn.
+        """
+        ordered_tiles = list(ordered_tiles)
+        tiles = [tile for tile in ordered_tiles if tile.image is not None]
+
+        # Images still being streamed in need another render once they arrive.
+        valid = len(tiles) == len(ordered_tiles)
+
+        if not tiles:
+            self._bounds = None
+            self._valid = valid
+            return
+
+        # Pixel aligned bounds of the quads the renderer draws, so texels map one to one to world pixels.
+        quads = [quad(tile.image, int(tile.aabb2d.x), int(tile.aabb2d.y)) for tile in tiles]
+        left = floor(min(q[0] for q in quads))
+        bottom = floor(min(q[1] for q in quads))
+        right = ceil(max(q[2] for q in quads))
+        top = ceil(max(q[5] for q in quads))
+        bounds = AABB2D(left, bottom, right - left, top - bottom)
+
+        if self._target is None or self._bounds is None or \
+                (bounds.width, bounds.height) != (self._bounds.width, self._bounds.height):
+            self.delete()
+            self._target = RenderTexture(ceil(bounds.width * self._resolution),
+                                         ceil(bounds.height * self._resolution))
+        self._bounds = bounds
+
+        # Tile art is pixel art, with alpha either fully on or off, so plain alpha blending into the
+        # transparent texture leaves the colours intact.
+        renderer = OrderedBatchRenderer()
+        try:
+            renderer.update(tiles)
+            with self._target.target(left, bottom, scale=1.0 / self._resolution):
+                renderer.draw()
+        finally:
+            renderer.delete()
+        self._valid = valid
+
+    def draw(self):
+        if self._bounds is not None:
+            texture = self._target.texture
+            texture.blit(self._bounds.x, self._bounds.y, width=texture.width / self._resolution,
+                         height=texture.height / self._resolution)
+
+    def delete(self):
+        if self._target is not None:
+            self._target.delete()
+            self._target = None
+        self._valid = False
+
+
+def overlay_order(objects, spatial_index, lookup) -> Sequence[object]:
+    """
+    Finds what has to be drawn over pre-rendered layers for dynamic objects to appear correctly between
+    static tiles: the objects themselves, and the static tiles overlapping them that are drawn after them.
+
+    :param objects: Dynamic objects.
+    :type spatial_index: SpatialIndex2D
+    :param spatial_index: Index containing the bounding boxes of the static tiles and dynamic objects.
+    :param lookup: Static tiles keyed by their 2D bounding box. May contain the objects too.
+    :return: Objects and covering tiles in the order they are to be drawn.
+    """
+    overlay = set(objects)
+    for obj in objects:
+        for _i, _j, k in spatial_index.find(obj.aabb2d):
+            tile = lookup.get(k, None)
+            if tile is not None and tile not in overlay and is_behind(tile.aabb3d, obj.aabb3d):
+                overlay.add(tile)
+
+    return topological_sort(overlay, spatial_index)
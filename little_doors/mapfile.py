@@ -0,0 +1,250 @@
+"""
+Binary map file format.
+
+All values are little-endian. A file is laid out as:
+
+- Header: magic ``LDMP``, format version, map width and height in cells, chunk width and height in cells, and
+  the number of entries in the tile set table.
+- Tile set table: for each tile its index, anchor, depth, dimension, tile size and flags, followed by its name
+  and resource filename as length prefixed UTF-8 strings. The only flag is bit 0, set for opaque tiles.
+- Chunk index: for each chunk, in row-major order, the offset and size in bytes of its compressed layer. Empty
+  chunks have a size of zero and no data.
+- Chunk layers: zlib compressed unsigned 16-bit tile indexes, in row-major order within the chunk.
+
+The index allows any single chunk to be read without decompressing the rest of the file.
+"""
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from little_doors.tile import Tile
+
+MAGIC = b'LDMP'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sHIIHHH')
+_TILE = struct.Struct('<H8fB')
+_STRING_LENGTH = struct.Struct('<H')
+_CHUNK_ENTRY = struct.Struct('<QI')
+
+# Bits of a tile's flags.
+_TILE_OPAQUE = 0x01
+
+
+class MapFileError(Exception):
+    """
+    Error while reading or writing a map file.
+    """
+
+
+def write_map(path, size, data, tile_set, chunk_size=(32, 32), level=6):
+    """
+    Writes a map to a file.
+
+    :param path: Destination file path.
+    :param size: Tuple that contains the width and height of the map.
+    :param data: Tile indexes of the whole map in row-major order.
+    :param tile_set: Tile prototypes keyed by tile index.
+    :param chunk_size: Number of cells along each axis of a chunk.
+    :param level: zlib compression level.
+    """
+    width, height = size
+    chunk_w, chunk_h = chunk_size
+    if len(data) != width * height:
+        raise MapFileError("data length does not fit in map")
+
+    columns, rows = -(-width // chunk_w), -(-height // chunk_h)
+    cells = array('H', data)
+
+    table = bytearray()
+    for index, tile in sorted(tile_set.items()):
+        flags = _TILE_OPAQUE if tile.opaque else 0
+        table += _TILE.pack(index, tile.anchor[0], tile.anchor[1], tile.depth,
+                            *(tile.size + (tile.aabb2d.width, tile.aabb2d.height, flags)))
+        for text in (tile.name, tile.resource_filename):
+            encoded = text.encode('utf-8')
+            table += _STRING_LENGTH.pack(len(encoded)) + encoded
+
+    layers = []
+    for cy in range(rows):
+        for cx in range(columns):
+            chunk = _slice_chunk(cells, size, chunk_size, cx, cy)
+            layers.append(zlib.compress(_to_little_endian(chunk), level) if any(chunk) else b'')
+
+    offset = _HEADER.size + len(table) + _CHUNK_ENTRY.size * len(layers)
+    index = bytearray()
+    for layer in layers:
+        index += _CHUNK_ENTRY.pack(offset if layer else 0, len(layer))
+        offset += len(layer)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, width, height, chunk_w, chunk_h, len(tile_set)))
+        f.write(table)
+        f.write(index)
+        for layer in layers:
+            f.write(layer)
+
+
+class MapReader(object):
+    """
+    Reads a map file with random access to its chunks.
+
+    The file is memory-mapped, so chunks can be read from multiple threads at once. The reader is a
+    ``ChunkSource``, and can be passed directly to a ``ChunkedTileMap``.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the map file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise MapFileError("map file is empty")
+
+        try:
+            self._read_header()
+        except (struct.error, UnicodeDecodeError) as err:
+            self.close()
+            raise MapFileError("map file is truncated or corrupt: %s" % err)
+        except MapFileError:
+            self.close()
+            raise
+
+    def _read_header(self):
+        magic, version, width, height, chunk_w, chunk_h, tile_count = _HEADER.unpack_from(self._mapped, 0)
+        if magic != MAGIC:
+            raise MapFileError("not a map file")
+        if version != VERSION:
+            raise MapFileError("unsupported map file version %s" % version)
+
+        self._size = (width, height)
+        self._chunk_size = (chunk_w, chunk_h)
+
+        offset = _HEADER.size
+        self._tiles = []
+        for _ in range(tile_count):
+            fields = _TILE.unpack_from(self._mapped, offset)
+            offset += _TILE.size
+            strings = []
+            for _ in range(2):
+                (length,) = _STRING_LENGTH.unpack_from(self._mapped, offset)
+                offset += _STRING_LENGTH.size
+                strings.append(bytes(self._mapped[offset:offset + length]).decode('utf-8'))
+                offset += length
+            self._tiles.append((fields, strings))
+
+        columns, rows = self.chunk_count
+        self._index = [_CHUNK_ENTRY.unpack_from(self._mapped, offset + n * _CHUNK_ENTRY.size)
+                       for n in range(columns * rows)]
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @property
+    def chunk_count(self):
+        """
+        Number of chunks along each axis.
+        """
+        return -(-self._size[0] // self._chunk_size[0]), -(-self._size[1] // self._chunk_size[1])
+
+    def create_tile_set(self):
+        """
+        Creates tile prototypes from the file's tile set table. Images are not loaded.
+
+        :return: Tile prototypes keyed by tile index.
+        """
+        tile_set = dict()
+        for (index, ax, ay, depth, dx, dy, dz, tw, th, flags), (name, resource_filename) in self._tiles:
+            tile_set[index] = Tile(index, name, resource_filename=resource_filename, anchor=(ax, ay), depth=depth,
+                                   dimension=(dx, dy, dz), tile_size=(tw, th), opaque=bool(flags & _TILE_OPAQUE))
+        return tile_set
+
+    def read_chunk(self, cx, cy):
+        """
+        Decompresses a single chunk.
+
+        :return: Array of tile indexes in row-major order within the chunk.
+        """
+        columns, rows = self.chunk_count
+        if not (0 <= cx < columns and 0 <= cy < rows):
+            raise MapFileError("chunk (%s, %s) is outside the map" % (cx, cy))
+
+        offset, length = self._index[cx + cy * columns]
+        chunk_w, chunk_h = self._chunk_size
+        if not length:
+            return array('H', bytes(chunk_w * chunk_h * 2))
+
+        try:
+            raw = zlib.decompress(self._mapped[offset:offset + length])
+        except zlib.error as err:
+            raise MapFileError("chunk (%s, %s) is corrupt: %s" % (cx, cy, err))
+
+        chunk = array('H')
+        chunk.frombytes(raw)
+        if sys.byteorder == 'big':
+            chunk.byteswap()
+        return chunk
+
+    def read_layer(self):
+        """
+        Decompresses every chunk into a single layer covering the whole map.
+
+        :return: Array of tile indexes in row-major order.
+        """
+        width, height = self._size
+        chunk_w, chunk_h = self._chunk_size
+        columns, rows = self.chunk_count
+        layer = array('H', bytes(width * height * 2))
+
+        for cy in range(rows):
+            for cx in range(columns):
+                if not self._index[cx + cy * columns][1]:
+                    continue
+                chunk = self.read_chunk(cx, cy)
+                x0, y0 = cx * chunk_w, cy * chunk_h
+                row_w = min(chunk_w, width - x0)
+                for row in range(min(chunk_h, height - y0)):
+                    start = x0 + (y0 + row) * width
+                    layer[start:start + row_w] = chunk[row * chunk_w:row * chunk_w + row_w]
+
+        return layer
+
+    def close(self):
+        self._mapped.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _slice_chunk(cells, size, chunk_size, cx, cy):
+    width, height = size
+    chunk_w, chunk_h = chunk_size
+    x0, y0 = cx * chunk_w, cy * chunk_h
+    row_w = min(chunk_w, width - x0)
+
+    chunk = array('H', bytes(chunk_w * chunk_h * 2))
+    for row in range(min(chunk_h, height - y0)):
+        start = x0 + (y0 + row) * width
+        chunk[row * chunk_w:row * chunk_w + row_w] = cells[start:start + row_w]
+    return chunk
+
+
+def _to_little_endian(cells):
+    if sys.byteorder == 'big':
+        cells = array('H', cells)
+        cells.byteswap()
+    return cells.tobytes()
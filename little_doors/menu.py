@@ -1,7 +1,6 @@
-import pyglet
-from pyglet.image.atlas import TextureBin
-
+from little_doors.atlas import default_atlas
 from little_doors.event import EventMixin
+from little_doors.headless import create_sprite, create_label
 
 
 class MenuError(Exception):
@@ -13,19 +12,18 @@ class MenuButton(EventMixin, object):
         super().__init__()
         self.register_event_types('press', 'release')
 
-        self.label = pyglet.text.Label(text=label, x=x + 64, y=y + 8, anchor_x='center', align='center')
+        self.label = create_label(text=label, x=x + 64, y=y + 8, anchor_x='center', align='center')
         self.hovering = False
         self.enabled = True
         self.pressed = False
 
-        tex_bin = TextureBin()
-        self.up_tex = tex_bin.add(pyglet.image.load('./resources/art/btn-default-up-1.png'))
-        self.down_tex = tex_bin.add(pyglet.image.load('./resources/art/btn-default-down-1.png'))
-        self.hover_tex = tex_bin.add(pyglet.image.load('./resources/art/btn-default-hover-1.png'))
-        self.disable_tex = tex_bin.add(pyglet.image.load('./resources/art/btn-default-disable-1.png'))
-        self.tex_bin = tex_bin
+        atlas = default_atlas()
+        self.up_tex = atlas.load('./resources/art/btn-default-up-1.png')
+        self.down_tex = atlas.load('./resources/art/btn-default-down-1.png')
+        self.hover_tex = atlas.load('./resources/art/btn-default-hover-1.png')
+        self.disable_tex = atlas.load('./resources/art/btn-default-disable-1.png')
 
-        self.background = pyglet.sprite.Sprite(self.up_tex)
+        self.background = create_sprite(self.up_tex)
 
         if on_release:
             self.handle('release', on_release)
@@ -0,0 +1,354 @@
+"""
+Incremental asset build.
+
+Sources in the art directory are compared against a manifest left by the previous build, and only the ones
+that changed are exported or copied. Work runs on a thread pool, since it is dominated by file IO and
+external processes.
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+MANIFEST_FILENAME = 'asset-manifest.json'
+MANIFEST_VERSION = 1
+
+# Size of each pre-packed atlas page.
+ATLAS_PAGE_SIZE = (1024, 1024)
+
+# Empty pixels around each packed image, so filtering doesn't bleed between neighbours.
+ATLAS_BORDER = 1
+
+
+class PipelineError(Exception):
+    """
+    Error while building assets.
+    """
+
+
+class Manifest(object):
+    """
+    Record of the sources built so far, with their content hashes and the outputs they produced.
+
+    A source whose size and modification time are unchanged is assumed unchanged without hashing it, so an
+    up to date build only has to stat its files.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the manifest file. The file does not have to exist yet.
+        """
+        self._path = path
+        self._entries = {}  # type: Dict[str, dict]
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version', None) == MANIFEST_VERSION:
+                self._entries = data.get('entries', {})
+
+    @property
+    def path(self):
+        return self._path
+
+    def get(self, key):
+        return self._entries.get(key, None)
+
+    def hash_source(self, key, path):
+        """
+        Finds the content hash of a source, reusing the recorded hash when the file looks untouched.
+
+        :return: Tuple of the hash and the file's stat result.
+        """
+        stat = os.stat(path)
+        entry = self._entries.get(key, None)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['hash'], stat
+        return hash_file(path), stat
+
+    def is_fresh(self, key, digest):
+        """
+        :return: True when the source was last built with the given content, and its outputs still exist.
+        """
+        entry = self._entries.get(key, None)
+        if entry is None or entry['hash'] != digest:
+            return False
+        return all(os.path.exists(output) for output in entry['outputs'])
+
+    def record(self, key, digest, stat, outputs):
+        self._entries[key] = {
+            'hash': digest,
+            'size': stat.st_size if stat else 0,
+            'mtime': stat.st_mtime_ns if stat else 0,
+            'outputs': sorted(outputs),
+        }
+
+    def save(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'entries': self._entries}, f, indent=2, sort_keys=True)
+
+
+class BuildResult(object):
+    """
+    Outcome of an asset build.
+    """
+
+    def __init__(self):
+        self.built = []  # type: List[str]
+        self.skipped = []  # type: List[str]
+        self.failed = []  # type: List[Tuple[str, str]]
+
+
+def hash_file(path):
+    """
+    :return: Hex encoded SHA-1 of the file's content.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_assets(art_dir, resource_dir, workers=None, aseprite=None, atlas=None, force=False, log=print):
+    """
+    Exports and copies changed art assets into the resources directory.
+
+    Aseprite files are exported to PNG in the art directory, next to their source, and every PNG in the art
+    directory is copied to the same relative location under ``resource_dir``. Exporting is skipped when no
+    Aseprite executable is found.
+
+    :param art_dir: Directory of source art.
+    :param resource_dir: Directory the game loads resources from.
+    :param workers: Number of worker threads. Defaults to the executor's default.
+    :param aseprite: Path to the Aseprite executable. Defaults to ``aseprite`` on the ``PATH``.
+    :param atlas: Optional name of a pre-packed atlas to write to ``resource_dir``, containing every copied
+        image. Pages are written as ``<atlas>-<n>.png`` and the regions to ``<atlas>.json``.
+    :param force: Rebuild everything, ignoring the manifest.
+    :param log: Called with a line of progress text.
+    :rtype: BuildResult
+    """
+    if not os.path.isdir(art_dir):
+        raise PipelineError("art directory %s does not exist" % art_dir)
+
+    manifest = Manifest(os.path.join(resource_dir, MANIFEST_FILENAME))
+    result = BuildResult()
+    aseprite = aseprite or shutil.which('aseprite')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sources = _find_sources(art_dir, ('.aseprite',))
+        if sources and aseprite is None:
+            log("Aseprite not found, skipping export of %s files" % len(sources))
+        elif sources:
+            _run_stage(executor, manifest, result, force, log, 'Exporting',
+                       [(src, _export, (aseprite, src)) for src in sources])
+
+        # Copies run after exports, so freshly exported images are picked up.
+        copies = []
+        for src in _find_sources(art_dir, ('.png',)):
+            dst = _resource_path(art_dir, resource_dir, src)
+            copies.append((src, _copy, (src, dst)))
+        _run_stage(executor, manifest, result, force, log, 'Copying', copies)
+
+    if atlas is not None:
+        images = [(os.path.normpath(src), dst) for src, _, (_, dst) in copies
+                  if manifest.get(os.path.normpath(src)) is not None]
+        _build_atlas(manifest, result, force, log, images, os.path.join(resource_dir, atlas))
+
+    manifest.save()
+    log("Built %s, skipped %s unchanged, %s failed" % (len(result.built), len(result.skipped), len(result.failed)))
+    return result
+
+
+def _run_stage(executor, manifest, result, force, log, verb, jobs):
+    """
+    Hashes sources, then runs the jobs whose sources changed, all on the executor.
+
+    :param jobs: List of tuples containing the source path, a function that builds it and returns its output
+        paths, and the arguments to that function.
+    """
+    hashes = [executor.submit(manifest.hash_source, os.path.normpath(src), src) for src, _, _ in jobs]
+
+    pending = []
+    for (src, build, args), future in zip(jobs, hashes):
+        key = os.path.normpath(src)
+        digest, stat = future.result()
+        if not force and manifest.is_fresh(key, digest):
+            # Refresh the stat, so the next build doesn't have to hash it again.
+            manifest.record(key, digest, stat, manifest.get(key)['outputs'])
+            result.skipped.append(key)
+            continue
+        log("%s %s" % (verb, key))
+        pending.append((key, digest, stat, executor.submit(build, *args)))
+
+    for key, digest, stat, future in pending:
+        try:
+            outputs = future.result()
+        except (OSError, subprocess.CalledProcessError, PipelineError) as err:
+            log("Failed %s: %s" % (key, err))
+            result.failed.append((key, str(err)))
+            continue
+        manifest.record(key, digest, stat, outputs)
+        result.built.append(key)
+
+
+def _find_sources(art_dir, extensions):
+    sources = []
+    for root, directories, files in os.walk(art_dir):
+        directories.sort()
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() in extensions:
+                sources.append(os.path.join(root, filename))
+    return sources
+
+
+def _resource_path(art_dir, resource_dir, src):
+    """
+    Maps a source to its location under the resources directory, keeping the art directory's name, so
+    ``./art/player.png`` becomes ``./resources/art/player.png``.
+    """
+    art_name = os.path.basename(os.path.normpath(art_dir))
+    return os.path.normpath(os.path.join(resource_dir, art_name, os.path.relpath(src, art_dir)))
+
+
+def _copy(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copyfile(src, dst)
+    return [dst]
+
+
+def _export(aseprite, src):
+    """
+    Exports every tag of an Aseprite file to its own PNG next to the source.
+    """
+    stem = os.path.splitext(src)[0]
+    before = _exported_files(stem)
+    subprocess.run([aseprite, '-b', src, '--save-as', stem + '-{tag}-1.png'],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    outputs = _exported_files(stem)
+    if not outputs:
+        raise PipelineError("Aseprite produced no files for %s" % src)
+    return sorted(set(outputs) | set(before))
+
+
+def _exported_files(stem):
+    directory, name = os.path.split(stem)
+    return [os.path.join(directory, filename) for filename in os.listdir(directory or '.')
+            if filename.startswith(name + '-') and filename.endswith('.png')]
+
+
+def _build_atlas(manifest, result, force, log, images, path):
+    """
+    Packs images into atlas pages, unless none of them changed since the atlas was last written.
+
+    :param images: List of tuples containing the manifest key of each image's source, and the image path.
+    """
+    key = 'atlas:' + os.path.normpath(path)
+    digest = hashlib.sha1()
+    for source, image in sorted(images):
+        digest.update(image.encode('utf-8'))
+        digest.update(manifest.get(source)['hash'].encode('ascii'))
+    digest = digest.hexdigest()
+
+    if not force and manifest.is_fresh(key, digest):
+        result.skipped.append(key)
+        return
+
+    log("Packing %s images into %s" % (len(images), path))
+    try:
+        outputs = pack_atlas([image for _, image in images], path)
+    except PipelineError as err:
+        log("Failed %s: %s" % (key, err))
+        result.failed.append((key, str(err)))
+        return
+    manifest.record(key, digest, None, outputs)
+    result.built.append(key)
+
+
+def pack_atlas(images, path, page_size=ATLAS_PAGE_SIZE):
+    """
+    Packs PNG images into atlas pages.
+
+    Images are placed on shelves, tallest first. Region coordinates in the index have their origin in the
+    bottom left corner of the page, like pyglet textures, and images are keyed by their normalized path.
+
+    :param images: Paths to PNG images.
+    :param path: Path of the atlas, without extension.
+    :param page_size: Width and height of each page.
+    :return: Paths of the written files.
+    """
+    from pyglet.extlibs import png
+
+    decoded = []
+    for image in images:
+        try:
+            width, height, rows, _ = png.Reader(filename=image).asRGBA8()
+        except png.Error as err:
+            raise PipelineError("cannot decode %s: %s" % (image, err))
+        decoded.append((os.path.normpath(image), width, height, [bytes(row) for row in rows]))
+
+    page_w, page_h = page_size
+    pages = []  # type: List[bytearray]
+    regions = {}
+    x = y = shelf_h = 0
+
+    for name, width, height, rows in sorted(decoded, key=lambda d: (-d[2], d[0])):
+        w, h = width + ATLAS_BORDER * 2, height + ATLAS_BORDER * 2
+        if w > page_w or h > page_h:
+            raise PipelineError("image %s does not fit in an atlas page" % name)
+
+        if not pages or x + w > page_w:
+            x, y, shelf_h = 0, y + shelf_h, 0
+        if not pages or y + h > page_h:
+            pages.append(bytearray(page_w * page_h * 4))
+            x = y = shelf_h = 0
+
+        page = pages[-1]
+        left, top = x + ATLAS_BORDER, y + ATLAS_BORDER
+        for row, pixels in enumerate(rows):
+            start = ((top + row) * page_w + left) * 4
+            page[start:start + width * 4] = pixels
+
+        regions[name] = {'page': len(pages) - 1, 'x': left, 'y': page_h - top - height,
+                         'width': width, 'height': height}
+        x += w
+        shelf_h = max(shelf_h, h)
+
+    outputs = []
+    page_files = []
+    for n, page in enumerate(pages):
+        filename = '%s-%s.png' % (path, n)
+        _write_png(filename, page_w, page_h, page)
+        outputs.append(filename)
+        page_files.append(os.path.basename(filename))
+
+    index = path + '.json'
+    with open(index, 'w') as f:
+        json.dump({'pages': page_files, 'regions': regions}, f, indent=2, sort_keys=True)
+    outputs.append(index)
+    return outputs
+
+
+def _write_png(path, width, height, pixels):
+    """
+    Writes 8-bit RGBA pixels, in rows from top to bottom, to a PNG file.
+    """
+    stride = width * 4
+    raw = b''.join(b'\x00' + bytes(pixels[row * stride:(row + 1) * stride]) for row in range(height))
+
+    def _chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(_chunk(b'IDAT', zlib.compress(raw, 6)))
+        f.write(_chunk(b'IEND', b''))
@@ -1,16 +1,22 @@
-import pyglet
-
 from little_doors.aabb import AABB3D, AABB2D
+from little_doors.atlas import default_atlas
+from little_doors.headless import create_sprite
 from little_doors.iso import cart_to_iso
+from little_doors.streaming import load_image
+
+PLAYER_IMAGE = 'resources/art/player.png'
 
 
 class Player(object):
 
-    def __init__(self, pos3d=(0.0, 0.0, 0.0), tile_size=(32.0, 32.0, 16.0)):
+    def __init__(self, pos3d=(0.0, 0.0, 0.0), tile_size=(32.0, 32.0, 16.0), loader=None):
         """
         :param pos3d: 3D cartesian coordinates.
         :param tile_size: Tuple of the tile 2D size. Width and height; the third coordinate
                           is the virtual "depth" of the isometric tile on the 2D screen.
+        :type loader: StreamingLoader
+        :param loader: Optional streaming loader. When given the player image is loaded in the
+                       background, and the player is not drawn until it has arrived.
         """
 
         self._pos3d = (0.0, 0.0, 0.0)
@@ -25,12 +31,22 @@ class Player(object):
         # The direction in 3D space the player will move in during the next update step.
         self.dir = (0.0, 0.0, 0.0)
 
-        tex = pyglet.image.atlas.TextureAtlas()
-        base_tex = tex.add(pyglet.image.load('resources/art/player.png'))
-
-        self.sprite = pyglet.sprite.Sprite(base_tex)
+        self.image = None
+        self.sprite = None
         self.pos3d = pos3d
 
+        # Position before the last update, for interpolating between simulation steps when drawing.
+        self._previous_pos3d = self._pos3d
+
+        if loader is not None:
+            load_image(loader, PLAYER_IMAGE, self._create_sprite, atlas=default_atlas())
+        else:
+            self._create_sprite(default_atlas().load(PLAYER_IMAGE))
+
+    def _create_sprite(self, image):
+        self.image = image
+        self.sprite = create_sprite(image, self._aabb2d.x, self._aabb2d.y)
+
     @property
     def pos3d(self):
         return self._pos3d
@@ -40,16 +56,28 @@ class Player(object):
         """
         Sets the player's position in 3D space, and its sprite in 2D space.
         """
-        (i, j, k) = cart_to_iso(*val)
-        (ti, tj, tk) = self._tile_size
-        (ax, ay) = self._anchor
-        self.sprite.x = (i * ti) - ax
-        self.sprite.y = (j * tj + k * tk) - ay
-        self._aabb2d.x = self.sprite.x
-        self._aabb2d.y = self.sprite.y
+        self._place_2d(val)
         self._pos3d = val
         self._aabb3d.pos = self._pos3d
 
+    def _place_2d(self, pos3d):
+        (i, j, k) = cart_to_iso(*pos3d)
+        (ti, tj, tk) = self._tile_size
+        (ax, ay) = self._anchor
+        self._aabb2d.x = (i * ti) - ax
+        self._aabb2d.y = (j * tj + k * tk) - ay
+        if self.sprite:
+            self.sprite.position = self._aabb2d.pos
+
+    def interpolate(self, alpha):
+        """
+        Places the player in 2D space between its positions before and after the last update, so movement
+        looks smooth when frames don't line up with simulation steps.
+
+        :param alpha: Fraction of the way from the previous position to the current one.
+        """
+        self._place_2d(tuple(a + (b - a) * alpha for a, b in zip(self._previous_pos3d, self._pos3d)))
+
     @property
     def aabb2d(self) -> AABB2D:
         return self._aabb2d
@@ -60,6 +88,7 @@ class Player(object):
 
     def update(self, dt):
         p = self._pos3d
+        self._previous_pos3d = p
         speed = self.walk_speed * dt
 
         dx, dy, dz = self.dir
@@ -85,4 +114,5 @@ class Player(object):
         #         self.mode = 0
 
     def draw(self):
-        self.sprite.draw()
+        if self.sprite:
+            self.sprite.draw()
@@ -0,0 +1,267 @@
+"""
+Per-phase frame timing.
+"""
+import csv
+import json
+from array import array
+from contextlib import nullcontext
+from time import perf_counter
+
+from little_doors.headless import create_label
+
+# Phases of a frame, in the order they usually run. Depth sorting runs while drawing, so draw times include
+# sort times.
+PHASES = ('input', 'update', 'index', 'sort', 'draw')
+
+# Number of frames kept when no capacity is specified. Ten seconds at 60 frames per second.
+DEFAULT_CAPACITY = 600
+
+# Frames between overlay text updates, so the label isn't laid out again every frame.
+DEFAULT_OVERLAY_REFRESH = 30
+
+_NULL_PHASE = nullcontext()
+
+_active = None
+
+
+class ProfilerError(Exception):
+    pass
+
+
+class _PhaseTimer(object):
+    """
+    Adds the time spent inside the context to a phase of the current frame. Reusable, and nesting a phase in
+    itself counts the time only once.
+    """
+    __slots__ = ('_profiler', '_index', '_depth', '_started')
+
+    def __init__(self, profiler, index):
+        self._profiler = profiler
+        self._index = index
+        self._depth = 0
+        self._started = 0.0
+
+    def __enter__(self):
+        self._depth += 1
+        if self._depth == 1:
+            self._started = self._profiler._clock()
+            self._profiler._begin_phase(self._index, self._started)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self._profiler._current[self._index] += self._profiler._clock() - self._started
+
+
+class FrameProfiler(object):
+    """
+    Records how long each phase of a frame takes, for the last few hundred frames.
+
+    Frames are kept in a ring buffer of preallocated arrays, so recording allocates nothing. A frame runs from
+    the end of the previous one until ``end_frame()``, so input handled between frames counts towards the
+    frame that follows.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, clock=perf_counter):
+        """
+        :param capacity: Number of frames kept. Older frames are overwritten.
+        :param clock: Function returning wall time in seconds.
+        """
+        self._capacity = capacity
+        self._clock = clock
+        self._timers = {name: _PhaseTimer(self, n) for n, name in enumerate(PHASES)}
+
+        # Start time and duration of each recorded frame.
+        self._starts = array('d', [0.0] * capacity)
+        self._totals = array('d', [0.0] * capacity)
+
+        # Time spent in each phase, and how far into the frame each phase was first entered, or -1 when it
+        # wasn't. Indexed by frame slot * number of phases + phase.
+        self._durations = array('d', [0.0] * (capacity * len(PHASES)))
+        self._offsets = array('d', [0.0] * (capacity * len(PHASES)))
+
+        self._cursor = 0
+        self._count = 0
+        self._frame_start = clock()
+        self._current = [0.0] * len(PHASES)
+        self._current_offsets = [-1.0] * len(PHASES)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        """
+        Number of frames recorded, up to the capacity.
+        """
+        return self._count
+
+    def activate(self):
+        """
+        Makes this the profiler that ``phase()`` records to.
+        """
+        global _active
+        _active = self
+
+    def phase(self, name):
+        """
+        Times the code inside the context as part of a phase of the current frame.
+
+        :param name: One of ``PHASES``.
+        :return: Context manager.
+        """
+        self._phase_index(name)
+        return self._timers[name]
+
+    def _phase_index(self, name):
+        if name not in self._timers:
+            raise ProfilerError("unknown phase %s, expected one of %s" % (name, ', '.join(PHASES)))
+        return PHASES.index(name)
+
+    def _begin_phase(self, index, now):
+        if self._current_offsets[index] < 0.0:
+            self._current_offsets[index] = now - self._frame_start
+
+    def end_frame(self):
+        """
+        Stores the current frame, and starts the next one.
+        """
+        now = self._clock()
+        slot = self._cursor
+        self._starts[slot] = self._frame_start
+        self._totals[slot] = now - self._frame_start
+
+        base = slot * len(PHASES)
+        for n in range(len(PHASES)):
+            self._durations[base + n] = self._current[n]
+            self._offsets[base + n] = self._current_offsets[n]
+            self._current[n] = 0.0
+            self._current_offsets[n] = -1.0
+
+        self._cursor = (slot + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+        self._frame_start = now
+
+    def _slots(self):
+        # Slots of the recorded frames, oldest first.
+        first = (self._cursor - self._count) % self._capacity
+        return [(first + n) % self._capacity for n in range(self._count)]
+
+    def frame_times(self):
+        """
+        :return: Durations of the recorded frames in seconds, oldest first.
+        """
+        return [self._totals[slot] for slot in self._slots()]
+
+    def phase_times(self, name):
+        """
+        :param name: One of ``PHASES``.
+        :return: Time spent in the phase during each recorded frame, in seconds, oldest first.
+        """
+        index = self._phase_index(name)
+        return [self._durations[slot * len(PHASES) + index] for slot in self._slots()]
+
+    def percentiles(self, name=None, percents=(50, 95, 99)):
+        """
+        :param name: One of ``PHASES``, or None for whole frames.
+        :param percents: Percentiles to compute, from 0 to 100.
+        :return: Tuple with the time in seconds at each percentile, using the nearest rank. Zeros when no
+            frames have been recorded.
+        """
+        times = sorted(self.frame_times() if name is None else self.phase_times(name))
+        if not times:
+            return tuple(0.0 for _ in percents)
+        return tuple(times[min(len(times) - 1, max(0, int(round(p / 100.0 * len(times))) - 1))] for p in percents)
+
+    def export_csv(self, filename):
+        """
+        Writes the recorded frames to a CSV file, one row per frame with times in milliseconds.
+        """
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frame', 'start', 'total') + PHASES)
+            for frame, slot in enumerate(self._slots()):
+                base = slot * len(PHASES)
+                times = [self._starts[slot], self._totals[slot]] + \
+                    [self._durations[base + n] for n in range(len(PHASES))]
+                writer.writerow([frame] + ['%.3f' % (t * 1000.0) for t in times])
+
+    def export_chrome_trace(self, filename):
+        """
+        Writes the recorded frames to a JSON file in the Chrome trace event format, which can be opened in
+        ``chrome://tracing`` or Perfetto. Each phase is one event spanning from its first use in the frame,
+        with its total time in the frame as duration.
+        """
+        events = []
+        for slot in self._slots():
+            start = self._starts[slot] * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start,
+                           'dur': self._totals[slot] * 1e6})
+            base = slot * len(PHASES)
+            for n, name in enumerate(PHASES):
+                offset = self._offsets[base + n]
+                if offset >= 0.0:
+                    events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start + offset * 1e6,
+                                   'dur': self._durations[base + n] * 1e6})
+
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self, filename):
+        """
+        Writes the recorded frames to a Chrome trace when the file name ends in ``.json``, otherwise to CSV.
+        """
+        if filename.endswith('.json'):
+            self.export_chrome_trace(filename)
+        else:
+            self.export_csv(filename)
+
+
+def phase(name):
+    """
+    Times the code inside the context as part of a phase on the active profiler, if there is one.
+
+    :param name: One of ``PHASES``.
+    :return: Context manager.
+    """
+    if _active is None:
+        return _NULL_PHASE
+    return _active.phase(name)
+
+
+class ProfilerOverlay(object):
+    """
+    Text showing the frame rate and the median and 95th percentile time of each phase.
+
+    The text is only updated every few frames, because laying out a label costs more than the phases it
+    reports on.
+    """
+
+    def __init__(self, profiler, x=0.0, y=0.0, refresh=DEFAULT_OVERLAY_REFRESH):
+        """
+        :type profiler: FrameProfiler
+        :param refresh: Number of frames between text updates.
+        """
+        self._profiler = profiler
+        self._refresh = refresh
+        self._frames = 0
+        self.visible = True
+        self.label = create_label("", x=x, y=y, multiline=True, width=320, anchor_y='top')
+
+    def text(self):
+        profiler = self._profiler
+        frame_p50, frame_p95 = profiler.percentiles(percents=(50, 95))
+        lines = ["FPS: {0:.1f}  frame {1:.2f} / {2:.2f} ms".format(1.0 / frame_p50 if frame_p50 > 0.0 else 0.0,
+                                                                    frame_p50 * 1000.0, frame_p95 * 1000.0)]
+        for name in PHASES:
+            p50, p95 = profiler.percentiles(name, percents=(50, 95))
+            lines.append("{0}: {1:.2f} / {2:.2f} ms".format(name, p50 * 1000.0, p95 * 1000.0))
+        return '\n'.join(lines)
+
+    def draw(self):
+        if not self.visible:
+            return
+        if self._frames % self._refresh == 0:
+            self.label.text = self.text()
+        self._frames += 1
+        self.label.draw()
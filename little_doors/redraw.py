@@ -0,0 +1,149 @@
+"""
+Partial redraw of the regions of the screen that changed.
+"""
+from math import floor, ceil
+from typing import List, Optional
+
+import pyglet
+
+from little_doors import headless
+from little_doors.aabb import AABB2D
+from little_doors.render import RenderTexture
+
+
+class DirtyRegions(object):
+    """
+    Rectangles of world space that changed since they were last redrawn.
+
+    Rectangles are snapped outwards to whole pixels, and overlapping rectangles are merged, so each pixel is
+    redrawn at most once. Starts out with everything dirty.
+    """
+
+    def __init__(self):
+        self._rects = []  # type: List[AABB2D]
+        self._everything = True
+
+    @property
+    def everything(self):
+        """
+        Whether the whole view has to be redrawn.
+        """
+        return self._everything
+
+    def add(self, rect):
+        """
+        Marks a rectangle as changed.
+
+        :param rect: Box-like that unpacks into (x, y, width, height).
+        """
+        if self._everything:
+            return
+        x, y, width, height = rect
+        left, bottom = floor(x), floor(y)
+        self._rects.append(AABB2D(left, bottom, ceil(x + width) - left, ceil(y + height) - bottom))
+
+    def invalidate(self):
+        """
+        Marks everything as changed.
+        """
+        self._everything = True
+        self._rects = []
+
+    def take(self) -> Optional[List[AABB2D]]:
+        """
+        Takes the changed rectangles, and marks everything as redrawn.
+
+        :return: List of non-overlapping rectangles, or None when everything has to be redrawn.
+        """
+        rects = None if self._everything else _merge(self._rects)
+        self._rects = []
+        self._everything = False
+        return rects
+
+
+def _merge(rects):
+    """
+    Replaces overlapping rectangles with their bounds until no two rectangles overlap.
+    """
+    merged = []
+    pending = list(rects)
+    while pending:
+        rect = pending.pop()
+        for n, other in enumerate(merged):
+            if _intersects(rect, other):
+                # The grown rectangle may now overlap rectangles that were already merged.
+                del merged[n]
+                left, bottom = min(rect.x, other.x), min(rect.y, other.y)
+                right = max(rect.x + rect.width, other.x + other.width)
+                top = max(rect.y + rect.height, other.y + other.height)
+                pending.append(AABB2D(left, bottom, right - left, top - bottom))
+                break
+        else:
+            merged.append(rect)
+    return merged
+
+
+def _intersects(a, b):
+    # Unlike ``AABB2D.overlap()``, rectangles that only touch don't intersect.
+    return a.x < b.x + b.width and b.x < a.x + a.width and a.y < b.y + b.height and b.y < a.y + a.height
+
+
+class PartialRedraw(object):
+    """
+    Keeps the last frame in a persistent offscreen backbuffer, and redraws only the dirty regions of it.
+
+    Each frame the backbuffer is copied to the window as a single quad. Moving the view redraws everything.
+    """
+
+    def __init__(self):
+        self.regions = DirtyRegions()
+        self._target = None  # type: RenderTexture
+        self._view = None  # type: tuple
+
+    def draw(self, view, draw_region):
+        """
+        Brings the backbuffer up to date, and draws it.
+
+        :type view: AABB2D
+        :param view: Rectangle of world space that is visible, usually from ``PixelCamera.view_aabb2d()``.
+        :param draw_region: Called with each dirty rectangle, to draw everything touching it. Drawing is
+            clipped to the rectangle.
+        """
+        left, bottom = floor(view.x), floor(view.y)
+        view = (left, bottom, ceil(view.x + view.width) - left, ceil(view.y + view.height) - bottom)
+        if view != self._view:
+            if self._view is None or view[2:] != self._view[2:]:
+                self.delete()
+                self._target = RenderTexture(view[2], view[3])
+            self._view = view
+            self.regions.invalidate()
+
+        rects = self.regions.take()
+        if rects is None:
+            rects = [AABB2D(*view)]
+
+        if headless.is_enabled():
+            for rect in rects:
+                draw_region(rect)
+            return
+
+        gl = pyglet.gl
+        with self._target.target(left, bottom, clear=False):
+            gl.glPushAttrib(gl.GL_SCISSOR_BIT)
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            gl.glClearColor(0.0, 0.0, 0.0, 1.0)
+            try:
+                for rect in rects:
+                    gl.glScissor(int(rect.x - left), int(rect.y - bottom), int(rect.width), int(rect.height))
+                    gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+                    draw_region(rect)
+            finally:
+                gl.glPopAttrib()
+
+        self._target.texture.blit(left, bottom)
+
+    def delete(self):
+        if self._target is not None:
+            self._target.delete()
+            self._target = None
+        self._view = None
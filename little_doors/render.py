@@ -0,0 +1,273 @@
+"""
+Batched rendering of depth sorted map objects.
+"""
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Sequence
+
+import pyglet
+
+from little_doors import headless
+from little_doors.headless import NullTexture
+
+
+class RenderError(Exception):
+    """
+    Error while setting up rendering resources.
+    """
+
+
+class OrderedBatchRenderer(object):
+    """
+    Draws map objects through a single ``pyglet.graphics.Batch``, in the order given by the depth sort.
+
+    Consecutive objects sharing a texture are packed into one vertex list, in draw order, under their own
+    ``OrderedGroup``. A frame is therefore one draw call per run of same-texture objects, instead of one
+    per object.
+
+    Objects need an ``image`` (texture or texture region) and an ``aabb2d`` whose position is where the
+    image is drawn. Objects without an image are skipped.
+
+    The vertex lists are only rebuilt when the draw order changes. Otherwise only the positions and images of
+    the given dynamic objects are checked and updated in place. A dynamic object whose image moved to another
+    texture no longer fits its run, so it also causes a rebuild.
+
+    In headless mode the draw order is still tracked and split into runs, but no vertex lists are created.
+    """
+
+    def __init__(self):
+        # Created on first use, because pyglet's graphics module needs a GL context.
+        self._batch = None
+        self._order = ()  # type: Tuple[object, ...]
+        self._vertex_lists = []  # type: List[pyglet.graphics.vertexdomain.VertexList]
+
+        # Where each object's quad lives, and the position and image it was written with.
+        self._slots = {}  # type: Dict[object, Tuple[pyglet.graphics.vertexdomain.VertexList, int, int, int, object]]
+        self._run_count = 0
+
+    @property
+    def run_count(self):
+        """
+        Number of same-texture runs, which is the number of draw calls per frame.
+        """
+        return self._run_count
+
+    def update(self, ordered_objects, dynamic_objects=()):
+        """
+        Brings the batch up to date with the given draw order.
+
+        :param ordered_objects: Objects in the order they are to be drawn.
+        :param dynamic_objects: Objects that may have moved since the last update.
+        """
+        order = tuple(obj for obj in ordered_objects if obj.image is not None)
+        if order != self._order:
+            self._rebuild(order)
+        else:
+            for obj in dynamic_objects:
+                if not self._update_slot(obj):
+                    self._rebuild(order)
+                    break
+
+    def draw(self):
+        if self._batch is not None:
+            self._batch.draw()
+
+    def delete(self):
+        for vertex_list in self._vertex_lists:
+            vertex_list.delete()
+        self._vertex_lists = []
+        self._slots = {}
+        self._order = ()
+        self._run_count = 0
+
+    def _rebuild(self, order):
+        self.delete()
+        self._order = order
+
+        runs = texture_runs(order)
+        self._run_count = len(runs)
+        if headless.is_enabled():
+            return
+
+        if self._batch is None:
+            self._batch = pyglet.graphics.Batch()
+
+        gl = pyglet.gl
+        for run, objects in enumerate(runs):
+            texture = objects[0].image.get_texture()
+            group = pyglet.sprite.SpriteGroup(texture, gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA,
+                                              pyglet.graphics.OrderedGroup(run))
+
+            vertices = []
+            tex_coords = []
+            for obj in objects:
+                x, y = int(obj.aabb2d.x), int(obj.aabb2d.y)
+                vertices.extend(quad(obj.image, x, y))
+                tex_coords.extend(obj.image.get_texture().tex_coords)
+
+            count = len(objects) * 4
+            vertex_list = self._batch.add(count, gl.GL_QUADS, group,
+                                          ('v2i/dynamic', vertices),
+                                          ('t3f/dynamic', tex_coords),
+                                          ('c4B/static', (255,) * (count * 4)))
+            self._vertex_lists.append(vertex_list)
+
+            for offset, obj in enumerate(objects):
+                self._slots[obj] = (vertex_list, offset, int(obj.aabb2d.x), int(obj.aabb2d.y), obj.image)
+
+    def _update_slot(self, obj):
+        """
+        Writes an object's position and image into its quad, if either changed since they were last written.
+
+        :return: False if the object's image is now on another texture, and the runs need to be rebuilt.
+        """
+        slot = self._slots.get(obj, None)
+        if slot is None:
+            return True
+
+        vertex_list, offset, old_x, old_y, old_image = slot
+        x, y = int(obj.aabb2d.x), int(obj.aabb2d.y)
+        image = obj.image
+        if image is not old_image:
+            texture = image.get_texture()
+            if texture.id != old_image.get_texture().id:
+                return False
+            vertex_list.tex_coords[offset * 12:offset * 12 + 12] = texture.tex_coords
+        elif x == old_x and y == old_y:
+            return True
+
+        vertex_list.vertices[offset * 8:offset * 8 + 8] = quad(image, x, y)
+        self._slots[obj] = (vertex_list, offset, x, y, image)
+        return True
+
+
+def texture_runs(ordered_objects) -> List[Sequence[object]]:
+    """
+    Splits a sequence of objects into runs of consecutive objects that share a texture.
+
+    :param ordered_objects: Objects with an ``image`` attribute.
+    :return: List of runs, each a non-empty list of objects.
+    """
+    runs = []
+    current_id = None
+    for obj in ordered_objects:
+        texture_id = obj.image.get_texture().id
+        if not runs or texture_id != current_id:
+            runs.append([])
+            current_id = texture_id
+        runs[-1].append(obj)
+    return runs
+
+
+def quad(image, x, y):
+    """
+    :return: Corners of the quad an image is drawn to at the given position, counter-clockwise from the bottom
+        left, as a flat tuple of x and y coordinates.
+    """
+    x1 = x - image.anchor_x
+    y1 = y - image.anchor_y
+    x2 = x1 + image.width
+    y2 = y1 + image.height
+    return x1, y1, x2, y1, x2, y2, x1, y2
+
+
+class RenderTexture(object):
+    """
+    Offscreen texture that can be drawn into, backed by a framebuffer object.
+    """
+
+    def __init__(self, width, height):
+        """
+        :param width: Width of the texture in pixels.
+        :param height: Height of the texture in pixels.
+        """
+        self._width = width
+        self._height = height
+
+        # Created on first use, because they need a GL context.
+        self._texture = None  # type: pyglet.image.Texture
+        self._framebuffer = None
+
+    @property
+    def texture(self):
+        if self._texture is None:
+            self._create()
+        return self._texture
+
+    def _create(self):
+        if headless.is_enabled():
+            self._texture = NullTexture(self._width, self._height)
+            return
+
+        gl = pyglet.gl
+        # Sized up to a power of two, so the texture may be larger than requested.
+        self._texture = pyglet.image.Texture.create(self._width, self._height, gl.GL_RGBA,
+                                                    min_filter=gl.GL_NEAREST, mag_filter=gl.GL_NEAREST)
+
+        framebuffer = gl.GLuint()
+        gl.glGenFramebuffers(1, framebuffer)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, framebuffer)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, self._texture.target,
+                                  self._texture.id, 0)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+        self._framebuffer = framebuffer
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            self.delete()
+            raise RenderError("framebuffer is incomplete, status 0x%x" % status)
+
+    @contextmanager
+    def target(self, x, y, clear=True, scale=1.0):
+        """
+        Redirects drawing into the texture, until the context exits.
+
+        :param x: World space x coordinate of the texture's left edge.
+        :param y: World space y coordinate of the texture's bottom edge.
+        :param clear: Clear the texture to transparent first.
+        :param scale: Size of a texel in world space pixels. Larger scales fit more of the world into the
+            texture, at a lower resolution.
+        """
+        texture = self.texture
+        if headless.is_enabled():
+            yield self
+            return
+
+        gl = pyglet.gl
+        # Targets can be nested, so restore whichever framebuffer was bound before.
+        previous = gl.GLint()
+        gl.glGetIntegerv(gl.GL_FRAMEBUFFER_BINDING, previous)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._framebuffer)
+        # A target can be entered while drawing is clipped, like during a partial redraw, so turn clipping
+        # off for the texture and restore it afterwards.
+        gl.glPushAttrib(gl.GL_VIEWPORT_BIT | gl.GL_COLOR_BUFFER_BIT | gl.GL_SCISSOR_BIT | gl.GL_ENABLE_BIT)
+        gl.glDisable(gl.GL_SCISSOR_TEST)
+        gl.glViewport(0, 0, texture.width, texture.height)
+
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.glOrtho(x, x + texture.width * scale, y, y + texture.height * scale, 1, -1)
+
+        if clear:
+            gl.glClearColor(0.0, 0.0, 0.0, 0.0)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        try:
+            yield self
+        finally:
+            gl.glMatrixMode(gl.GL_PROJECTION)
+            gl.glPopMatrix()
+            gl.glMatrixMode(gl.GL_MODELVIEW)
+            gl.glPopMatrix()
+            gl.glPopAttrib()
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, previous.value)
+
+    def delete(self):
+        if self._framebuffer is not None:
+            pyglet.gl.glDeleteFramebuffers(1, self._framebuffer)
+            self._framebuffer = None
+        if self._texture is not None:
+            self._texture.delete()
+            self._texture = None
@@ -0,0 +1,183 @@
+"""
+Recording of input events and frame ticks, and deterministic replay of them.
+"""
+import struct
+from collections import namedtuple
+
+import pyglet
+
+MAGIC = b'LDRP'
+VERSION = 1
+
+# Kinds of recorded events.
+TICK = 0
+KEY_PRESS = 1
+KEY_RELEASE = 2
+MOUSE_PRESS = 3
+MOUSE_RELEASE = 4
+MOUSE_MOTION = 5
+RESIZE = 6
+
+# File layout, little endian. The header holds everything besides input that decides how the game
+# simulates: timestep, maximum steps per frame, and window size.
+_HEADER = struct.Struct('<4sHdHHH')
+
+# Each event is its kind and time since recording started, followed by its arguments.
+_EVENT = struct.Struct('<Bd')
+_ARGS = {
+    TICK: struct.Struct('<d'),
+    KEY_PRESS: struct.Struct('<IH'),
+    KEY_RELEASE: struct.Struct('<IH'),
+    MOUSE_PRESS: struct.Struct('<iiHH'),
+    MOUSE_RELEASE: struct.Struct('<iiHH'),
+    MOUSE_MOTION: struct.Struct('<iiii'),
+    RESIZE: struct.Struct('<HH'),
+}
+
+# Game method each kind of event is replayed through.
+_HANDLERS = {
+    KEY_PRESS: 'on_key_press',
+    KEY_RELEASE: 'on_key_release',
+    MOUSE_PRESS: 'on_mouse_press',
+    MOUSE_RELEASE: 'on_mouse_release',
+    MOUSE_MOTION: 'on_mouse_motion',
+    RESIZE: 'on_resize',
+}
+
+InputEvent = namedtuple('InputEvent', ('kind', 'time', 'args'))
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Recording(object):
+    """
+    Input events and frame ticks of a session, in the order the game received them.
+    """
+
+    def __init__(self, step, max_steps, window_size, events=None):
+        """
+        :param step: The game's simulation step in seconds.
+        :param max_steps: The game's maximum number of simulation steps per frame.
+        :param window_size: Width and height of the window when recording started.
+        :param events: List of ``InputEvent``.
+        """
+        self.step = step
+        self.max_steps = max_steps
+        self.window_size = window_size
+        self.events = events if events is not None else []
+
+    @property
+    def frames(self):
+        return sum(1 for event in self.events if event.kind == TICK)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.step, self.max_steps, *self.window_size))
+            for kind, time, args in self.events:
+                f.write(_EVENT.pack(kind, time))
+                f.write(_ARGS[kind].pack(*args))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        :raises ReplayError: When the file isn't a recording this version can read.
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if len(data) < _HEADER.size:
+            raise ReplayError("%s is not a recording" % filename)
+        magic, version, step, max_steps, width, height = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("%s is not a recording" % filename)
+        if version != VERSION:
+            raise ReplayError("recording %s has version %d, expected %d" % (filename, version, VERSION))
+
+        events = []
+        offset = _HEADER.size
+        try:
+            while offset < len(data):
+                kind, time = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                args = _ARGS[kind]
+                events.append(InputEvent(kind, time, args.unpack_from(data, offset)))
+                offset += args.size
+        except (struct.error, KeyError):
+            raise ReplayError("recording %s is corrupt at byte %d" % (filename, offset))
+
+        return cls(step, max_steps, (width, height), events)
+
+
+class InputRecorder(object):
+    """
+    Records the input events and frame ticks a game receives.
+    """
+
+    def __init__(self, game, window_size):
+        """
+        :type game: Game
+        :param window_size: Width and height of the window when recording starts.
+        """
+        self._clock = game.clock
+        self._start = game.clock()
+        timestep = game.timestep
+        self._recording = Recording(timestep.step, timestep.max_steps, window_size)
+
+    @property
+    def recording(self):
+        return self._recording
+
+    def record(self, kind, *args):
+        self._recording.events.append(InputEvent(kind, self._clock() - self._start, args))
+
+    def save(self, filename):
+        self._recording.save(filename)
+
+
+class ReplayPlayer(object):
+    """
+    Feeds a recording to a game, one frame at a time.
+
+    The game has to use the recording's timestep and maximum steps, and start out in the same scene and
+    window size, for the replay to end up in the same state as the session did.
+    """
+
+    def __init__(self, game, recording):
+        """
+        :type game: Game
+        :type recording: Recording
+        """
+        self._game = game
+        self._events = recording.events
+        self._cursor = 0
+
+    @property
+    def finished(self):
+        return self._cursor >= len(self._events)
+
+    def step(self, tick=None):
+        """
+        Replays the input events up to and including the next frame tick.
+
+        :param tick: Called with the recorded frame time to run the frame. Defaults to the game's update.
+        :return: Whether there was a frame to replay.
+        """
+        tick = tick or self._game.on_update
+        while self._cursor < len(self._events):
+            kind, _time, args = self._events[self._cursor]
+            self._cursor += 1
+            if kind == TICK:
+                tick(*args)
+                return True
+            getattr(self._game, _HANDLERS[kind])(*args)
+        return False
+
+    def on_update(self, dt):
+        """
+        Replays the next frame in place of a live update, ignoring the live frame time. Unschedules itself from
+        the pyglet clock once the recording is finished.
+        """
+        if not self.step():
+            pyglet.clock.unschedule(self.on_update)
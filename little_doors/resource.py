@@ -0,0 +1,163 @@
+"""
+Process-wide cache of decoded image resources.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import pyglet
+
+# Number of unreferenced images kept decoded before the least recently released are evicted.
+DEFAULT_CAPACITY = 32
+
+
+class ResourceError(Exception):
+    """
+    Error while acquiring or releasing a resource.
+    """
+
+
+class ImageResource(object):
+    """
+    A reference counted image, identified by the hash of its file content.
+
+    The file is read when the resource is acquired, but only decoded the first time ``image`` is accessed.
+    """
+    __slots__ = ('path', 'digest', 'refs', '_data', '_image', '_lock')
+
+    def __init__(self, path, digest, data):
+        self.path = path
+        self.digest = digest
+        self.refs = 0
+        self._data = data
+        self._image = None
+        self._lock = threading.Lock()
+
+    @property
+    def decoded(self):
+        return self._image is not None
+
+    @property
+    def image(self):
+        """
+        The decoded image. Safe to access from worker threads, since it does not touch GL state.
+
+        :rtype: pyglet.image.AbstractImage
+        """
+        with self._lock:
+            if self._image is None:
+                self._image = pyglet.image.load(self.path, file=io.BytesIO(self._data))
+                # The encoded bytes are not needed once decoded.
+                self._data = None
+            return self._image
+
+
+class ResourceCache(object):
+    """
+    Shares decoded images between everything that loads them.
+
+    Resources are keyed by normalized path, and by content hash, so the same image stored under different
+    paths is only decoded once. Every ``acquire()`` must be paired with a ``release()``. Resources that are no
+    longer referenced stay cached until more than ``capacity`` of them have piled up, after which the least
+    recently released are evicted.
+
+    The cache is safe to use from streaming loader worker threads.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        :param capacity: Number of unreferenced resources to keep.
+        """
+        self._capacity = capacity
+        self._lock = threading.RLock()
+
+        # Content hash of each path read so far. Kept after eviction, so re-acquiring only reads the file again.
+        self._digests = {}  # type: Dict[str, str]
+
+        self._resources = {}  # type: Dict[str, ImageResource]
+
+        # Digests of unreferenced resources, from least to most recently released.
+        self._unused = OrderedDict()  # type: Dict[str, None]
+
+    def __len__(self):
+        return len(self._resources)
+
+    def acquire(self, path):
+        """
+        Takes a reference to the image at the given path, reading the file if it is not cached.
+
+        :param path: Path to the image file.
+        :return: The shared resource.
+        """
+        path = os.path.normpath(path)
+        with self._lock:
+            digest = self._digests.get(path, None)
+            resource = self._resources.get(digest, None) if digest is not None else None
+
+            if resource is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha1(data).hexdigest()
+                self._digests[path] = digest
+
+                # Another path may have the same content.
+                resource = self._resources.get(digest, None)
+                if resource is None:
+                    resource = ImageResource(path, digest, data)
+                    self._resources[digest] = resource
+
+            resource.refs += 1
+            self._unused.pop(digest, None)
+            return resource
+
+    def release(self, resource):
+        """
+        Gives up a reference taken with ``acquire()``.
+
+        :type resource: ImageResource
+        """
+        with self._lock:
+            if resource.refs <= 0 or self._resources.get(resource.digest, None) is not resource:
+                raise ResourceError("resource %s is not acquired" % resource.path)
+
+            resource.refs -= 1
+            if resource.refs == 0:
+                self._unused[resource.digest] = None
+                self._evict()
+
+    def load(self, path):
+        """
+        Decodes an image through the cache, for callers that copy the image and don't keep it. The reference
+        is released straight away, so the image stays cached until it is evicted.
+
+        :param path: Path to the image file.
+        :return: The decoded image.
+        """
+        resource = self.acquire(path)
+        try:
+            return resource.image
+        finally:
+            self.release(resource)
+
+    def _evict(self):
+        while len(self._unused) > self._capacity:
+            digest, _ = self._unused.popitem(last=False)
+            del self._resources[digest]
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    The process-wide resource cache.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResourceCache()
+        return _default_cache
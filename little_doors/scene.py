@@ -32,7 +32,14 @@ class Scene(ABC):
     def on_key_release(self, symbol, modifiers):
         pass
 
-    def on_draw(self, context):
+    def on_resize(self, width, height):
+        pass
+
+    def on_draw(self, context, alpha=1.0):
+        """
+        :param alpha: How far, as a fraction of a simulation step, the frame is past the last update. Used to
+            interpolate between the last two simulation steps.
+        """
         pass
 
 
@@ -1,15 +1,15 @@
 from collections import defaultdict
-from functools import reduce
 
-import pyglet
-from pyglet import gl
 from pyglet.window import key
 
-from little_doors import data, vec
+from little_doors import data, vec, profiler
 from little_doors.aabb import AABB2D
 from little_doors.camera import PixelCamera
-from little_doors.grid import GridIndex2D, IndexGroup2D
+from little_doors.context import Context
+from little_doors.grid import GridIndex2D
 from little_doors.player import Player
+from little_doors.profiler import FrameProfiler, ProfilerOverlay
+from little_doors.redraw import PartialRedraw
 from little_doors.scene import Scene
 from little_doors.tilemap import TileMap
 
@@ -26,21 +26,21 @@ class DimetricScene(Scene):
         # Input map
         self.inputs = defaultdict(lambda: False)
 
-        # Tile map
-        self.tilemap = TileMap((8, 8))
-        self.tiles = []
-
         # Player
-        self.player = Player(pos3d=(0.0, 0.0, 0.0))
+        ctx = Context.current()
+        self.player = Player(pos3d=(0.0, 0.0, 0.0), loader=ctx.game.loader if ctx else None)
 
-        # Bounding box indexes
-        self.static_grid = GridIndex2D(position=(-1024, -1024), dimensions=(64, 64), cell_size=(32.0, 32.0))
+        # Bounding box index of the objects. The tile map finds its own tiles.
         self.dynamic_grid = GridIndex2D(position=(-1024, -1024), dimensions=(64, 64), cell_size=(32.0, 32.0))
 
-        # FPS Counter
-        self.fps_cursor = 0
-        self.delta_times = [0.0] * 60
-        self.fps_counter = pyglet.text.Label("FPS: 0", x=-100.0, y=120.0)
+        # Tile map, which draws its tiles from a pre-rendered layer.
+        self.tilemap = TileMap((8, 8), prerender=True)
+
+        # Redraws only what changed, when the game asks for it.
+        self.partial_redraw = PartialRedraw() if ctx and ctx.game.partial_redraw else None
+
+        # Frame rate and phase times, toggled with F3.
+        self.profiler_overlay = ProfilerOverlay(ctx.game.profiler if ctx else FrameProfiler(), x=-100.0, y=230.0)
 
     def start(self, context):
         self.camera.set_position(-160.0, -64.0)
@@ -57,13 +57,6 @@ class DimetricScene(Scene):
             0, 0, 0, 0, 0, 0, 0, 0,
         ])
 
-        # Index bounding boxes that are not expected to change.
-        for x, y in self.tilemap:
-            tile = self.tilemap.get_tile(x, y)
-            if tile is not None:
-                if tile.aabb2d is not None:
-                    self.static_grid.insert(tile.aabb2d)
-
         self.tilemap.add_object(self.player)
         self.dynamic_grid.insert(self.player.aabb2d)
 
@@ -76,13 +69,15 @@ class DimetricScene(Scene):
         query = AABB2D(x, y, 1.0, 1.0)
         print("Query", query)
 
-        for aabb2d in self.static_grid.find(query):
-            print(aabb2d)
+        for tile in self.tilemap.find_tiles(query):
+            print(tile.aabb2d)
 
         print("==============")
         print("")
 
     def on_key_press(self, symbol, modifiers):
+        if symbol == key.F3:
+            self.profiler_overlay.visible = not self.profiler_overlay.visible
         if symbol in self.inputs:
             self.inputs[symbol] = True
 
@@ -91,12 +86,6 @@ class DimetricScene(Scene):
             self.inputs[symbol] = False
 
     def on_update(self, dt):
-        self.delta_times[self.fps_cursor] = dt
-        self.fps_cursor += 1
-        self.fps_cursor = self.fps_cursor % len(self.delta_times)
-        avg_delta_time = reduce(lambda d, agg: agg + d, self.delta_times, 0.0) / len(self.delta_times)
-        self.fps_counter.text = "FPS: {0:.2f}".format(1.0 / avg_delta_time if avg_delta_time > 0.0 else 0.0)
-
         x, y, z = 0.0, 0.0, 0.0
 
         # Left
@@ -130,14 +119,24 @@ class DimetricScene(Scene):
         self.player.dir = vec.normalize(x, y, z)
         self.player.update(dt)
 
-        self.dynamic_grid.recalculate()
+        with profiler.phase('index'):
+            self.dynamic_grid.recalculate()
+
+    def on_resize(self, width, height):
+        self.camera.resize(width, height)
 
-    def on_draw(self, context):
+    def on_draw(self, context, alpha=1.0):
+        self.player.interpolate(alpha)
         self.camera.push_state()
 
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
-        self.tilemap.draw(IndexGroup2D(self.static_grid, self.dynamic_grid))
+        spatial_index = self.dynamic_grid
+        if self.partial_redraw is not None:
+            self.tilemap.collect_damage(self.partial_redraw.regions)
+            self.partial_redraw.draw(self.camera.view_aabb2d(),
+                                     lambda rect: self.tilemap.draw_region(spatial_index, rect))
+        else:
+            self.tilemap.draw(spatial_index, view=self.camera.view_aabb2d(margin=32.0))
 
-        self.fps_counter.draw()
+        self.profiler_overlay.draw()
 
         self.camera.pop_state()
@@ -43,7 +43,10 @@ class StartScene(Scene):
         x, y = self.camera.window_to_world(x, y)
         self.menu.on_mouse_motion(x, y, dx, dy)
 
-    def on_draw(self, ctx):
+    def on_resize(self, width, height):
+        self.camera.resize(width, height)
+
+    def on_draw(self, ctx, alpha=1.0):
         self.camera.push_state()
         self.camera.clear()
         self.menu.on_draw()
@@ -0,0 +1,147 @@
+"""
+Headless simulation of the game, driven by a deterministic clock.
+"""
+import importlib
+
+from little_doors import headless
+from little_doors.camera import DEFAULT_WINDOW_SIZE
+from little_doors.context import Context
+from little_doors.headless import NullWindow
+from little_doors.replay import ReplayPlayer
+from little_doors.timestep import DEFAULT_STEP
+
+# Scenes a simulation can start in by name, as module and class name. Imported on use, because scenes import
+# pyglet modules that may only be imported once headless mode is enabled.
+SCENES = {
+    'start': ('little_doors.scenes.start', 'StartScene'),
+    'play': ('little_doors.scenes.play', 'PlayScene'),
+    'dimetric': ('little_doors.scenes.dimetric', 'DimetricScene'),
+}
+
+
+class SimulationError(Exception):
+    pass
+
+
+class SimulatedClock(object):
+    """
+    Time that only moves when advanced. Called like ``time.perf_counter()``.
+    """
+
+    def __init__(self, start=0.0):
+        self._time = start
+
+    def __call__(self):
+        return self._time
+
+    def advance(self, dt):
+        self._time += dt
+
+
+class Simulation(object):
+    """
+    Runs the game without a window or GL context, as fast as the CPU allows.
+
+    Every frame advances the simulated clock by the same frame time, and finishes every pending load before
+    updating, so runs that start the same way give the same results no matter how fast the machine is.
+
+    Creating a simulation enables headless mode for the rest of the process.
+    """
+
+    def __init__(self, frame_time=DEFAULT_STEP, window_size=DEFAULT_WINDOW_SIZE, **game_options):
+        """
+        :param frame_time: Simulated time in seconds between frames.
+        :param window_size: Size of the null window scenes see, which sets the size of their camera views.
+        :param game_options: Passed on to ``Game``.
+        """
+        headless.enable()
+        from little_doors.game import Game
+
+        self._frame_time = frame_time
+        self._clock = SimulatedClock()
+        self._game = Game(clock=self._clock, **game_options)
+        self._window = NullWindow(*window_size)
+        self._context = Context(self._game, self._window)
+        self._frames = 0
+
+    @classmethod
+    def for_recording(cls, recording, **game_options):
+        """
+        Creates a simulation with the timestep and window size a recording was made with, to replay it.
+
+        :type recording: Recording
+        """
+        return cls(window_size=recording.window_size, step=recording.step, max_steps=recording.max_steps,
+                   **game_options)
+
+    @property
+    def game(self):
+        return self._game
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def frames(self):
+        """
+        Number of frames run so far.
+        """
+        return self._frames
+
+    def start(self, scene='start'):
+        """
+        Pushes the first scene.
+
+        :param scene: Name of a scene in ``SCENES``, or a function that creates the scene.
+        """
+        if isinstance(scene, str):
+            if scene not in SCENES:
+                raise SimulationError("unknown scene %s, expected one of %s" % (scene, ', '.join(sorted(SCENES))))
+            module, name = SCENES[scene]
+            scene = getattr(importlib.import_module(module), name)
+
+        with self._context:
+            self._game.scenes.push(scene())
+
+    def run(self, frames, before_frame=None):
+        """
+        Updates and draws the game for a number of frames.
+
+        :param before_frame: Called with the frame number before each frame, to script input.
+        """
+        with self._context:
+            for _ in range(frames):
+                if before_frame is not None:
+                    before_frame(self._frames)
+                self._frame(self._frame_time)
+
+    def play(self, recording):
+        """
+        Replays the input and frame times of a recording, as fast as possible.
+
+        :type recording: Recording
+        """
+        timestep = self._game.timestep
+        if (timestep.step, timestep.max_steps) != (recording.step, recording.max_steps):
+            raise SimulationError("recording was made with a different timestep, see for_recording()")
+
+        player = ReplayPlayer(self._game, recording)
+        with self._context:
+            while player.step(self._frame):
+                pass
+
+    def _frame(self, dt):
+        # Finish loads before the update that may use them, instead of within a time budget.
+        self._game.loader.flush()
+        self._clock.advance(dt)
+        self._game.on_update(dt)
+        self._game.on_draw()
+        self._frames += 1
+
+    def shutdown(self):
+        self._game.loader.shutdown()
@@ -0,0 +1,244 @@
+"""
+Background loading of map data and images.
+
+Work is split in two halves. The load half runs on a worker thread and does the slow decoding, while the
+finish half runs on the main thread, where it is safe to create GL objects like textures and sprites.
+Finished loads are queued, and the queue is drained once per frame within a time budget.
+"""
+import logging
+import queue
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+import os
+
+from little_doors import headless
+from little_doors.headless import load_null_image
+from little_doors.resource import default_cache
+
+# Time in seconds spent finishing loads per frame when no budget is specified.
+DEFAULT_BUDGET = 0.004
+
+logger = logging.getLogger(__name__)
+
+
+class LoadState(Enum):
+    PENDING = 0
+    FINISHING = 1
+    DONE = 2
+    FAILED = 3
+
+
+class LoadTask(object):
+    """
+    Handle to a load submitted to a ``StreamingLoader``.
+    """
+    __slots__ = ('state', 'result', 'error', '_finish', '_on_error', '_steps')
+
+    def __init__(self, finish, on_error=None):
+        self.state = LoadState.PENDING
+        self.result = None
+        self.error = None
+        self._finish = finish
+        self._on_error = on_error
+        self._steps = None
+
+    def _fail(self, error):
+        self.state = LoadState.FAILED
+        self.error = error
+        logger.error("load failed: %s", error, exc_info=error)
+        if self._on_error is not None:
+            self._on_error(error)
+
+    @property
+    def done(self):
+        return self.state in (LoadState.DONE, LoadState.FAILED)
+
+
+class StreamingLoader(object):
+    """
+    Loads resources on a thread pool and hands the results back to the main thread.
+
+    The finish callback of a load may return a generator, in which case the finishing work is spread over
+    multiple frames. Each step of the generator is one unit of work, and ``drain()`` stops stepping once
+    the frame budget is spent.
+    """
+
+    def __init__(self, max_workers=2, budget=DEFAULT_BUDGET):
+        """
+        :param max_workers: Number of worker threads.
+        :param budget: Default time in seconds that ``drain()`` may spend per call.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._budget = budget
+
+        # Loads that finished on a worker and wait for the main thread.
+        self._finished = queue.Queue()
+
+        # Load that ran out of budget part way through a generator finish.
+        self._current = None
+
+        self._submitted = 0
+        self._completed = 0
+
+    @property
+    def pending(self):
+        """
+        Number of loads that have not completed yet.
+        """
+        return self._submitted - self._completed
+
+    @property
+    def progress(self):
+        """
+        Fraction of submitted loads that have completed, between 0.0 and 1.0.
+        """
+        if self._submitted == 0:
+            return 1.0
+        return self._completed / self._submitted
+
+    def submit(self, load, finish=None, *args, on_error=None):
+        """
+        Schedules a load.
+
+        Loads that raise, on the worker or while finishing, are logged and marked as failed.
+
+        :param load: Called on a worker thread with the given arguments. Must not touch GL state.
+        :param finish: Optional callable, called on the main thread with the result of ``load``.
+        :param on_error: Optional callable, called on the main thread with the exception when the load fails.
+        :return: Task handle.
+        """
+        task = LoadTask(finish, on_error)
+        self._submitted += 1
+
+        future = self._executor.submit(load, *args)
+        future.add_done_callback(lambda f: self._finished.put((task, f)))
+
+        return task
+
+    def drain(self, budget=None):
+        """
+        Finishes queued loads on the calling thread until the time budget is spent.
+
+        :param budget: Time in seconds, overriding the loader's default budget.
+        :return: Number of loads that completed.
+        """
+        budget = self._budget if budget is None else budget
+        deadline = time.perf_counter() + budget
+        count = 0
+
+        while time.perf_counter() < deadline:
+            task = self._current
+            if task is None:
+                try:
+                    task, future = self._finished.get_nowait()
+                except queue.Empty:
+                    break
+                self._start(task, future)
+
+            if task.state == LoadState.FINISHING:
+                self._step(task, deadline)
+
+            if task.done:
+                self._current = None
+                self._completed += 1
+                count += 1
+            else:
+                self._current = task
+
+        return count
+
+    @staticmethod
+    def _start(task, future):
+        error = future.exception()
+        if error is not None:
+            task._fail(error)
+            return
+
+        task.result = future.result()
+        if task._finish is None:
+            task.state = LoadState.DONE
+            return
+
+        try:
+            ret = task._finish(task.result)
+        except Exception as err:
+            task._fail(err)
+            return
+
+        if isinstance(ret, types.GeneratorType):
+            task._steps = ret
+            task.state = LoadState.FINISHING
+        else:
+            task.state = LoadState.DONE
+
+    @staticmethod
+    def _step(task, deadline):
+        try:
+            while time.perf_counter() < deadline:
+                next(task._steps)
+        except StopIteration:
+            task.state = LoadState.DONE
+        except Exception as err:
+            task._fail(err)
+
+    def flush(self):
+        """
+        Blocks until every submitted load has completed. Intended for loading screens and tests.
+        """
+        while self.pending:
+            if not self.drain(budget=float('inf')):
+                time.sleep(0.001)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def load_image(loader, filename, on_loaded, atlas=None):
+    """
+    Decodes an image on a worker thread, then uploads it to a texture on the main thread.
+
+    :type loader: StreamingLoader
+    :param filename: Path to the image file.
+    :param on_loaded: Called on the main thread with the texture.
+    :type atlas: Atlas
+    :param atlas: Optional atlas to pack the image into, under its normalized file path, instead of
+        uploading it to its own texture.
+    :return: Task handle.
+    """
+    if headless.is_enabled():
+        # Only the image size is read, but still finish on the main thread like any other load.
+        if atlas is not None:
+            name = os.path.normpath(filename)
+            return loader.submit(load_null_image, lambda image: on_loaded(atlas.add(name, image)), filename)
+        return loader.submit(load_null_image, on_loaded, filename)
+
+    if atlas is not None:
+        name = os.path.normpath(filename)
+        if name in atlas:
+            # Already packed, but still finish on the main thread like any other load.
+            return loader.submit(atlas.get, on_loaded, name)
+        cache = atlas.cache
+
+        def _pack(resource):
+            try:
+                on_loaded(atlas.add_resource(name, resource))
+            finally:
+                cache.release(resource)
+
+        return loader.submit(_acquire_decoded, _pack, cache, filename)
+
+    return loader.submit(default_cache().load, lambda image: on_loaded(image.get_texture()), filename)
+
+
+def _acquire_decoded(cache, filename):
+    resource = cache.acquire(filename)
+    try:
+        # Touch the image so it is decoded here on the worker thread.
+        resource.image
+    except Exception:
+        cache.release(resource)
+        raise
+    return resource
@@ -0,0 +1,191 @@
+"""
+Storage for stacked terrain.
+"""
+from array import array
+from typing import Dict, Generator, Tuple, Optional, List
+
+
+class ColumnStorage(object):
+    """
+    Stores tile indexes in a 3-dimensional grid of columns, where 0 is an empty cell.
+
+    The ground level (z = 0) is stored densely, two bytes per column, because most maps fill most of it. The
+    levels above are stored per column as runs of ``(tile_index, count)`` pairs, starting at z = 1, with
+    trailing air trimmed. Columns that are empty above the ground take no storage at all, so memory is
+    proportional to content and not to ``width * height * depth``.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: Tuple that contains the width and height of the map.
+        """
+        self._size = size
+        self._ground = array('H', bytes(size[0] * size[1] * 2))
+
+        # Runs of the levels above the ground, keyed by data index.
+        self._stacks = {}  # type: Dict[int, array]
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def ground(self):
+        """
+        Tile indexes of the ground level, in row-major order.
+        """
+        return self._ground
+
+    @property
+    def depth(self):
+        """
+        Number of levels up to and including the highest non-empty cell.
+        """
+        top = 1 if any(self._ground) else 0
+        for runs in self._stacks.values():
+            top = max(top, 1 + sum(runs[1::2]))
+        return top
+
+    def load_ground(self, cells):
+        """
+        Replaces the ground level.
+
+        :type cells: array
+        :param cells: Array of unsigned 16-bit tile indexes.
+        """
+        if len(cells) != len(self._ground):
+            raise ValueError("ground level must have %s cells" % len(self._ground))
+        self._ground = cells
+
+    def get(self, x, y, z=0) -> int:
+        """
+        :return: Tile index of the cell, 0 when the cell is empty.
+        """
+        data_index = x + y * self._size[0]
+        if z == 0:
+            return self._ground[data_index]
+        if z < 0:
+            return 0
+
+        runs = self._stacks.get(data_index, None)
+        if runs is None:
+            return 0
+
+        level = 1
+        for n in range(0, len(runs), 2):
+            level += runs[n + 1]
+            if z < level:
+                return runs[n]
+        return 0
+
+    def set(self, x, y, z, tile_index):
+        """
+        Sets the cell to the given tile index.
+        """
+        data_index = x + y * self._size[0]
+        if z == 0:
+            self._ground[data_index] = tile_index
+            return
+        if z < 0:
+            raise ValueError("level cannot be negative")
+
+        column = self._expand(data_index)
+        if z - 1 < len(column):
+            column[z - 1] = tile_index
+        elif tile_index:
+            column.extend([0] * (z - 1 - len(column)))
+            column.append(tile_index)
+        else:
+            return
+
+        runs = _encode(column)
+        if runs:
+            self._stacks[data_index] = runs
+        else:
+            self._stacks.pop(data_index, None)
+
+    def column(self, x, y) -> List[int]:
+        """
+        :return: Tile indexes of the column from the ground up to its highest non-empty cell.
+        """
+        data_index = x + y * self._size[0]
+        column = [self._ground[data_index]] + self._expand(data_index)
+        if len(column) == 1 and not column[0]:
+            return []
+        return column
+
+    def top(self, x, y) -> Optional[Tuple[int, int]]:
+        """
+        Finds the highest non-empty cell of a column.
+
+        :return: Tuple of level and tile index, or None when the column is empty.
+        """
+        data_index = x + y * self._size[0]
+        runs = self._stacks.get(data_index, None)
+        if runs is not None:
+            # Trailing air is trimmed, so the last run is solid.
+            return sum(runs[1::2]), runs[-2]
+
+        tile_index = self._ground[data_index]
+        if tile_index:
+            return 0, tile_index
+        return None
+
+    def layer(self, z) -> Generator[Tuple[int, int, int], None, None]:
+        """
+        Iterates the non-empty cells of a single level.
+
+        :return: Generator yielding tuples of x, y and tile index.
+        """
+        width = self._size[0]
+        if z == 0:
+            for data_index, tile_index in enumerate(self._ground):
+                if tile_index:
+                    yield data_index % width, data_index // width, tile_index
+            return
+
+        for data_index in sorted(self._stacks.keys()):
+            tile_index = self.get(data_index % width, data_index // width, z)
+            if tile_index:
+                yield data_index % width, data_index // width, tile_index
+
+    def cells(self) -> Generator[Tuple[int, int, int, int], None, None]:
+        """
+        Iterates every non-empty cell, level by level from the ground up.
+
+        :return: Generator yielding tuples of x, y, z and tile index.
+        """
+        for z in range(self.depth):
+            for x, y, tile_index in self.layer(z):
+                yield x, y, z, tile_index
+
+    def _expand(self, data_index) -> List[int]:
+        """
+        Decodes the runs above the ground into a list of tile indexes, starting at z = 1.
+        """
+        runs = self._stacks.get(data_index, None)
+        if runs is None:
+            return []
+
+        column = []
+        for n in range(0, len(runs), 2):
+            column.extend([runs[n]] * runs[n + 1])
+        return column
+
+
+def _encode(column) -> array:
+    """
+    Encodes a list of tile indexes to runs, trimming trailing air.
+    """
+    end = len(column)
+    while end and not column[end - 1]:
+        end -= 1
+
+    runs = array('H')
+    for tile_index in column[:end]:
+        if runs and runs[-2] == tile_index and runs[-1] < 0xFFFF:
+            runs[-1] += 1
+        else:
+            runs.append(tile_index)
+            runs.append(1)
+    return runs
@@ -1,4 +1,5 @@
 from little_doors.aabb import AABB3D, AABB2D
+from little_doors.headless import create_sprite
 
 # Size of tile along each axis when no size is specified.
 DEFAULT_DIMENSION = 1.0
@@ -6,10 +7,11 @@ DEFAULT_TILE_SIZE = 32.0
 
 
 class Tile(object):
-    __slots__ = ('index', 'name', 'resource_filename', 'sprite', 'image', '_aabb3d', 'aabb2d', 'anchor', 'depth')
+    __slots__ = ('index', 'name', 'resource_filename', 'sprite', 'image', '_aabb3d', 'aabb2d', 'anchor', 'depth',
+                 'opaque')
 
     def __init__(self, index, name='Tile', resource_filename='', dimension=None, tile_size=None,
-                 anchor=(0.0, 0.0), depth=0.0):
+                 anchor=(0.0, 0.0), depth=0.0, opaque=True):
         self.index = index
         self.name = name
         self.resource_filename = resource_filename
@@ -22,10 +24,77 @@ class Tile(object):
         self.anchor = anchor
         self.depth = depth
 
+        # Whether the image covers the whole projected cube, without see-through pixels.
+        self.opaque = opaque
+
     @property
     def aabb3d(self):
         return self._aabb3d
 
+    @property
+    def occludes(self):
+        """
+        Whether the tile is a solid block filling exactly one cell, and hides whatever it covers.
+        """
+        return self.opaque and self._aabb3d.dimensions == (1.0, 1.0, 1.0)
+
+    @property
+    def size(self):
+        return self.aabb3d.dimensions
+
+    def delete(self):
+        if self.sprite:
+            self.sprite.delete()
+
+    def draw(self):
+        """
+        Draws the tile on its own. Tile maps draw tiles in batches, so the sprite is only created
+        when this is called.
+        """
+        if self.sprite is None and self.image is not None:
+            self.sprite = create_sprite(self.image, *self.aabb2d.pos)
+        if self.sprite:
+            self.sprite.draw()
+
+
+class TileInstance(object):
+    """
+    A tile placed in a map cell.
+
+    Everything that is the same for every placement of a tile, like its image and dimensions, is shared
+    with the prototype ``Tile`` from the tile set. The instance only owns its bounding boxes, which are
+    positioned in the map, and the sprite used when the tile is drawn on its own.
+    """
+    __slots__ = ('tile', 'aabb3d', 'aabb2d', 'sprite', '__weakref__')
+
+    def __init__(self, tile, pos3d, pos2d):
+        """
+        :type tile: Tile
+        :param tile: Prototype from the tile set.
+        :param pos3d: Position of the cell in 3D cartesian space.
+        :param pos2d: Position of the tile's image in 2D world space.
+        """
+        self.tile = tile
+        self.aabb3d = AABB3D(*(pos3d + tile.size))
+        self.aabb2d = AABB2D(pos2d[0], pos2d[1], tile.aabb2d.width, tile.aabb2d.height)
+        self.sprite = None
+
+    @property
+    def index(self):
+        return self.tile.index
+
+    @property
+    def name(self):
+        return self.tile.name
+
+    @property
+    def image(self):
+        return self.tile.image
+
+    @property
+    def anchor(self):
+        return self.tile.anchor
+
     @property
     def size(self):
         return self.aabb3d.dimensions
@@ -33,7 +102,14 @@ class Tile(object):
     def delete(self):
         if self.sprite:
             self.sprite.delete()
+            self.sprite = None
 
     def draw(self):
+        """
+        Draws the tile on its own. Tile maps draw tiles in batches, so the sprite is only created
+        when this is called.
+        """
+        if self.sprite is None and self.image is not None:
+            self.sprite = create_sprite(self.image, *self.aabb2d.pos)
         if self.sprite:
             self.sprite.draw()
@@ -1,16 +1,29 @@
 import itertools
-from copy import deepcopy
+import mmap
+import sys
+import weakref
+from array import array
+from contextlib import contextmanager
 from enum import Enum
-from typing import Optional, List, Tuple, Sequence
+from math import ceil, floor
+from typing import Optional, List, Tuple, Sequence, Dict, Set, Generator, TYPE_CHECKING
 
-import pyglet
 from typing_extensions import Protocol
 
 from little_doors.iso import topological_sort
-from little_doors.aabb import AABB3D, AABB2D, Spatial2D, Spatial3D
+from little_doors.aabb import AABB2D, Spatial2D, Spatial3D
 from little_doors.drawable import Drawable
+from little_doors.event import EventMixin
+from little_doors.grid import IndexGroup2D, SpatialIndex2D
 from little_doors.iso import cart_to_iso
-from little_doors.tile import Tile
+from little_doors import profiler
+from little_doors.layer import StaticLayer, overlay_order
+from little_doors.render import OrderedBatchRenderer
+from little_doors.terrain import ColumnStorage
+from little_doors.tile import Tile, TileInstance
+
+if TYPE_CHECKING:
+    from pyglet.image import AbstractImage
 
 
 class DrawableKind(Enum):
@@ -38,31 +51,113 @@ class MapObject(Drawable, Spatial3D, Spatial2D, Protocol):
     - Have a presence in 2-dimensional world space.
     - Have a presence in 3-dimensional space.
     - Can be drawn to a render target.
+    - Expose the image drawn at the position of their 2D bounding box, or None when there is
+      nothing to draw yet.
     """
-    pass
+    image: 'AbstractImage'
 
 
-class TileMap(object):
+class TileMap(EventMixin, object):
     """
     2-Dimensional tile map.
+
+    Emits ``cells_changed`` with a list of ``(x, y, z)`` cell coordinates after cells have been edited. Edits
+    made inside ``edit()`` are reported together when the outermost edit is committed. Replacing the whole
+    ground level with ``load_tile_data()`` emits ``terrain_loaded`` instead, without arguments. Before either,
+    ``tiles_released`` is emitted with the list of tile instances the edit replaced.
     """
 
-    def __init__(self, size):
+    def __init__(self, size, origin=(0, 0), prerender=False):
         """
-        :param size: Tuple that contains the width and height of the map.
+        :param size: Tuple that contains the width and height of the map. Maps have no fixed depth; levels
+            are stored as they are filled.
+        :param origin: Cell coordinates of the map's first cell in the world. Used when the
+            map is one chunk of a larger map.
+        :param prerender: Render the tiles once into an offscreen texture, and draw that instead of sorting
+            and drawing every tile each frame. The texture is rendered again after the map is edited. The
+            map has to fit in a single texture, so large maps should be split into chunks.
         """
-        length = size[0] * size[1]
+        super().__init__()
+        self.register_event_types('cells_changed', 'terrain_loaded', 'tiles_released')
 
         self._size = size
+        self._origin = origin
         self._tile_size_2d = (32.0, 32.0)
-        # self._data = [0] * length
-        self._tiles = [None] * length  # type: List[Optional[Tile]]
+
+        # Height in pixels of one level of terrain in 2D space.
+        self._level_height = 16.0
+
+        # Tile index of each cell, where 0 is an empty cell. This is the only per-cell storage; everything
+        # else about a tile is shared with its prototype in the tile set.
+        self._terrain = ColumnStorage(size)
+
+        # Tile instances, keyed by data index and level, created when a cell's tile is requested. Only held
+        # weakly, so instances live as long as something uses them, like the renderer's current draw order,
+        # and the map itself only stores tile indexes per cell.
+        self._tiles = weakref.WeakValueDictionary()  # type: Dict[Tuple[int, int], TileInstance]
+
+        # Finds tiles from the columns under a query, so tiles don't have to be kept in a spatial index.
+        self._tile_index = TileIndex(self)
+        self._sort_tile_index = TileIndex(self, created_only=True)
+
+        # Extent of the tile set's images around their anchors, as the lowest and highest horizontal and
+        # vertical offsets from the anchor of any image edge.
+        self._reach = None  # type: Optional[Tuple[float, float, float, float]]
+
+        # Anchor and size of each tile set image, keyed by tile index, for searching tiles without their instances.
+        self._extents = {}  # type: Dict[int, Tuple[float, float, float, float]]
+
+        # Highest level a tile was ever set on. Never lowered, so tile searches can rely on it without
+        # scanning the terrain.
+        self._max_level = 0
+
         self._tile_set = dict()
         self._objects = []  # type: List[object]
-        self._sprites = [None] * length  # type: List[Optional[pyglet.sprite.Sprite]]
-        self._aabb3d = [None] * length  # type: List[Optional[AABB3D]]
-        self._aabb2d = [None] * length  # type: List[Optional[AABB2D]]
         self._draw_order = []  # type: List[Tuple[int, int, int]]
+        self._renderer = OrderedBatchRenderer()
+        self._region_renderer = OrderedBatchRenderer()
+        self._layer = StaticLayer() if prerender else None
+
+        # Objects keyed by their 2D bounding box, to resolve spatial index queries.
+        self._by_aabb2d = {}  # type: Dict[AABB2D, MapObject]
+
+        # Cells edited during the current edit transaction, or None when there is no transaction.
+        self._dirty = None  # type: Optional[Set[Tuple[int, int, int]]]
+        self._edit_depth = 0
+
+        # Tile instances replaced during the current edit transaction, released on commit.
+        self._stale = []  # type: List[TileInstance]
+
+        # Whether the ground level was replaced during the current edit transaction.
+        self._reloaded = False
+
+        # Whether each cell's tile is completely covered by the tiles in front of and above it, one byte per
+        # cell of each level, indexed like the terrain: 0 when not known yet, otherwise one of _VISIBLE or
+        # _HIDDEN. Filled in as cells are drawn or queried, so only the cells in view are ever tested, and
+        # forgotten around edited cells.
+        self._hidden = {}  # type: Dict[int, bytearray]
+
+        # Screen rectangles changed since damage was last collected, or None until it is first collected.
+        self._damage = None  # type: Optional[List[AABB2D]]
+        self._damage_all = False
+
+        # Bounding box and image each object had when damage was last collected.
+        self._object_states = {}  # type: Dict[object, Tuple[float, float, float, float, object]]
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @property
+    def depth(self):
+        """
+        Number of levels up to and including the highest non-empty cell.
+        """
+        return self._terrain.depth
 
     @property
     def tile_size_2d(self):
@@ -71,71 +166,309 @@ class TileMap(object):
         """
         return 32.0, 32.0
 
+    @property
+    def tile_index(self):
+        """
+        Spatial index of the map's tiles, which finds them from the columns under the query.
+
+        :rtype: TileIndex
+        """
+        return self._tile_index
+
     def load_tile_set(self, tile_set):
         self._tile_set.update(tile_set)
+        self._extents = {index: tuple(tile.anchor) + (tile.aabb2d.width, tile.aabb2d.height)
+                         for index, tile in self._tile_set.items()}
+        prototypes = self._tile_set.values()
+        self._reach = (min(tile.anchor[0] - tile.aabb2d.width for tile in prototypes),
+                       max(tile.anchor[0] for tile in prototypes),
+                       min(tile.anchor[1] - tile.aabb2d.height for tile in prototypes),
+                       max(tile.anchor[1] for tile in prototypes)) if prototypes else None
 
     def load_tile_data(self, data):
-        if len(data) != self._size[0] * self._size[1]:
+        """
+        Replaces the tile data of every cell on the ground level in bulk.
+
+        Data can be any sequence of tile indexes, or an object supporting the buffer protocol like ``array``,
+        ``memoryview`` or a NumPy array. Buffers of bytes are read as little-endian unsigned 16-bit integers,
+        which is the layout of a raw layer file.
+
+        :param data: Tile indexes in row-major order.
+        """
+        cells = _to_cells(data)
+        if len(cells) != self._size[0] * self._size[1]:
             raise TerrainError("data length does not fit in terrain")
 
-        for y in range(self._size[1]):
-            for x in range(self._size[0]):
-                tile_index = data[x + y * self._size[0]]
-                self.set_cell(x, y, tile_index)
+        unknown = set(cells).difference(self._tile_set)
+        unknown.discard(0)
+        if unknown:
+            raise TileSetError("tile set does not contain tile for index %s" % min(unknown))
+
+        with self.edit():
+            for key in [key for key in list(self._tiles.keys()) if key[1] == 0]:
+                self._release(key)
+            self._terrain.load_ground(cells)
+            self._reloaded = True
 
-    def set_cell(self, x, y, tile_index):
+    def load_file(self, path, offset=0):
+        """
+        Loads tile data from a raw layer file, of little-endian unsigned 16-bit tile indexes in row-major order.
+
+        The file is memory-mapped, so only the map's layer is read even when the file is larger.
+
+        :param path: Path to the file.
+        :param offset: Position in bytes where the layer starts.
+        """
+        length = self._size[0] * self._size[1] * 2
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                self.load_tile_data(view[offset:offset + length])
+            finally:
+                view.release()
+
+    def set_cell(self, x, y, tile_index, z=0):
         """
         Sets the cell at the given position to the tile given via the tile index.
 
         :type x: int
         :type y: int
         :type tile_index: int
+        :type z: int
+        :param z: Level of the cell, where 0 is the ground.
+        """
+        if tile_index and tile_index not in self._tile_set:
+            raise TileSetError("tile set does not contain tile for index %s" % tile_index)
+
+        key = (x + y * self._size[0], z)
+        if self._damage is not None and key not in self._tiles:
+            # The replaced tile has no instance to release, so damage where it was drawn from its prototype.
+            old_index = self._terrain.get(x, y, z)
+            if old_index:
+                prototype = self._tile_set[old_index]
+                left, bottom = self._pos2d(x, y, z, prototype)
+                self._damage.append(AABB2D(left, bottom, prototype.aabb2d.width, prototype.aabb2d.height))
+        self._release(key)
+        self._terrain.set(x, y, z, tile_index)
+        if tile_index and z > self._max_level:
+            self._max_level = z
+
+        if self._dirty is not None:
+            self._dirty.add((x, y, z))
+        else:
+            self._commit({(x, y, z)})
+
+    def set_cells(self, cells):
+        """
+        Sets many cells in a single edit transaction.
+
+        :param cells: Iterable of ``(x, y, tile_index)`` or ``(x, y, tile_index, z)`` tuples.
+        """
+        with self.edit():
+            for cell in cells:
+                self.set_cell(*cell)
+
+    def fill_rect(self, x, y, width, height, tile_index, z=0):
+        """
+        Sets every cell in a rectangle on one level to the same tile, in a single edit transaction.
+        """
+        with self.edit():
+            for cy in range(y, y + height):
+                for cx in range(x, x + width):
+                    self.set_cell(cx, cy, tile_index, z)
+
+    @contextmanager
+    def edit(self):
+        """
+        Groups edits into a transaction.
+
+        Inside the transaction cells are only written to storage. Releasing replaced tiles, tracking damage and
+        notifying ``cells_changed`` handlers is deferred until the outermost transaction exits, and then done in
+        one pass.
         """
-        data_index = x + y * self._size[0]  # type: int
-        # self._data[data_index] = tile_index
-        #
-        # if self._sprites[data_index]:
-        #     self._sprites[data_index].delete()
-        #     self._sprites[data_index] = None
+        if self._dirty is None:
+            self._dirty = set()
+        self._edit_depth += 1
+        try:
+            yield self
+        finally:
+            self._edit_depth -= 1
+            if not self._edit_depth:
+                dirty, self._dirty = self._dirty, None
+                self._commit(dirty)
+
+    def _commit(self, cells):
+        stale, self._stale = self._stale, []
+        for tile in stale:
+            if self._damage is not None:
+                self._damage.append(tile.aabb2d)
+            tile.delete()
+
+        reloaded, self._reloaded = self._reloaded, False
+        if self._layer is not None and (reloaded or cells):
+            self._layer.invalidate()
+        if reloaded:
+            self._hidden.clear()
+        else:
+            self._forget_occlusion(cells)
+        if reloaded:
+            # The ground level was replaced as a whole, so there is no point tracking its cells one by one.
+            cells = {cell for cell in cells if cell[2] != 0}
+
+        if self._damage is not None:
+            self._damage_all = self._damage_all or reloaded
+            for x, y, z in cells:
+                tile = self.get_tile(x, y, z)
+                if tile is not None:
+                    self._damage.append(tile.aabb2d)
+
+        if stale:
+            self.trigger('tiles_released', stale)
+        if reloaded:
+            self.trigger('terrain_loaded')
+        if cells:
+            self.trigger('cells_changed', sorted(cells))
+
+    def _release(self, key):
+        tile = self._tiles.pop(key, None)
+        if tile is not None:
+            self._stale.append(tile)
+
+    def _pos2d(self, x, y, z, tile_prototype):
+        """
+        :return: Position of a tile's image in 2D world space, when placed in the given cell.
+        """
+        tile_w, tile_h = self._tile_size_2d
+        ox, oy = self._origin
+        i, j, k = cart_to_iso(ox + x, oy + y, z)
+        ax, ay = tile_prototype.anchor
+        return i * tile_w - ax, j * tile_h + k * self._level_height - ay
 
-        # Release resources
-        if self._tiles[data_index]:
-            self._tiles[data_index].delete()
-            self._tiles[data_index] = None
+    def _materialize(self, x, y, z, tile_index):
+        """
+        Creates the tile instance for the given cell.
+        """
+        tile_prototype = self._tile_set[tile_index]  # type: Tile
+        pos2d = self._pos2d(x, y, z, tile_prototype)
+
+        ox, oy = self._origin
+        tile = TileInstance(tile_prototype, (float(ox + x), float(oy + y), float(z)), pos2d)
+        self._tiles[(x + y * self._size[0], z)] = tile
+        return tile
+
+    def _tile_at(self, x, y, z, tile_index, create=True):
+        tile = self._tiles.get((x + y * self._size[0], z), None)
+        if tile is None and tile_index and create:
+            tile = self._materialize(x, y, z, tile_index)
+        return tile
+
+    def _occludes(self, x, y, z):
+        if not (0 <= x < self._size[0] and 0 <= y < self._size[1]) or z < 0:
+            # Cells outside the map are unknown, so assume they are empty.
+            return False
+        tile_index = self._terrain.get(x, y, z)
+        return bool(tile_index) and self._tile_set[tile_index].occludes
+
+    def _is_occluded(self, x, y, z):
+        """
+        Tests whether a cell's tile is covered on all of its visible faces.
 
-        # Only create sprite when not zero
-        if tile_index:
-            tile_prototype = self._tile_set.get(tile_index, None)  # type: Optional[Tile]
-            if not tile_prototype:
-                raise TileSetError("tile set does not contain tile for index %s" % tile_index)
+        The visible faces of a block are the top and the two faces towards the viewer, along negative x and y.
+        In dimetric projection the ``hex_bounds`` footprint of a block covers the projection of all of its
+        faces, so when the neighbours sharing those faces are solid blocks, which are drawn later in depth
+        order, their footprints cover the whole footprint of the block.
+        """
+        return self._occludes(x, y, z) and self._occludes(x - 1, y, z) and self._occludes(x, y - 1, z) \
+            and self._occludes(x, y, z + 1)
+
+    def _forget_occlusion(self, cells):
+        width, height = self._size
+        for x, y, z in cells:
+            # An edited cell can change whether it is covered, and whether the cells it covers are.
+            for cx, cy, cz in ((x, y, z), (x + 1, y, z), (x, y + 1, z), (x, y, z - 1)):
+                level = self._hidden.get(cz, None)
+                if level is not None and cx < width and cy < height:
+                    level[cx + cy * width] = 0
+
+    def is_hidden(self, x, y, z=0):
+        """
+        :return: True when the cell's tile is completely covered by other tiles, and doesn't need drawing.
+        """
+        level = self._hidden.get(z, None)
+        if level is None:
+            level = self._hidden[z] = bytearray(self._size[0] * self._size[1])
+        data_index = x + y * self._size[0]
+        state = level[data_index]
+        if not state:
+            state = level[data_index] = _HIDDEN if self._is_occluded(x, y, z) else _VISIBLE
+        return state == _HIDDEN
+
+    def visible_tiles(self):
+        """
+        Iterates the tiles that are not completely covered by other tiles, level by level.
+        """
+        return (self._tile_at(x, y, z, tile_index) for x, y, z, tile_index in self._terrain.cells()
+                if not self.is_hidden(x, y, z))
 
-            tile_w, tile_h = self._tile_size_2d
-            i, j, _k = cart_to_iso(x, y, 0)
-            ax, ay = tile_prototype.anchor
-            tile_x, tile_y = i * tile_w - ax, j * tile_h - ay
+    def get_tile_index(self, x, y, z=0):
+        """
+        :return: Tile index of the cell, 0 when the cell is empty.
+        """
+        return self._terrain.get(x, y, z)
 
-            tile = deepcopy(tile_prototype)
-            tile.sprite = pyglet.sprite.Sprite(tile.image, tile_x, tile_y)
-            tile.aabb3d.pos = float(x), float(y), 0.0
-            tile.aabb2d.pos = tile_x, tile_y
-            self._tiles[data_index] = tile
-            # self._sprites[data_index] = pyglet.sprite.Sprite(tile.image, tile_x, tile_y)
+    def get_tile(self, x, y, z=0):
+        """
+        :return: The tile instance in the cell, or None when the cell is empty.
+        """
+        return self._tile_at(x, y, z, self._terrain.get(x, y, z))
 
-            # Currently only supports a single level, so everything is on z-level 0
-            # self._aabb3d[data_index] = AABB3D(float(x), float(y), 0.0, tile.size[0], tile.size[1], tile.size[2])
-            # self._aabb2d[data_index] = AABB2D(tile_x, tile_y, tile_w, tile_h)
+    def get_top_tile(self, x, y):
+        """
+        Finds the tile on the surface of a column.
 
-    def get_tile(self, x, y):
-        return self._tiles[x + y * self._size[0]]
+        :return: The highest tile instance in the column, or None when the column is empty.
+        """
+        top = self._terrain.top(x, y)
+        if top is None:
+            return None
+        z, tile_index = top
+        return self._tile_at(x, y, z, tile_index)
 
-    def get_sprite(self, x, y):
-        return self._sprites[x + y * self._size[0]]
+    def get_sprite(self, x, y, z=0):
+        tile = self.get_tile(x, y, z)
+        return tile.sprite if tile is not None else None
 
-    def get_cell_aabb3d(self, x, y):
-        return self._aabb3d[x + y * self._size[0]]
+    def get_cell_aabb3d(self, x, y, z=0):
+        tile = self.get_tile(x, y, z)
+        return tile.aabb3d if tile is not None else None
 
-    def get_cell_aabb2d(self, x, y):
-        return self._aabb2d[x + y * self._size[0]]
+    def get_cell_aabb2d(self, x, y, z=0):
+        tile = self.get_tile(x, y, z)
+        return tile.aabb2d if tile is not None else None
+
+    def layer(self, z):
+        """
+        Iterates the tiles on a single level, skipping empty cells.
+        """
+        return (self._tile_at(x, y, z, tile_index) for x, y, tile_index in self._terrain.layer(z))
+
+    def tiles(self):
+        """
+        Iterates the tiles that are currently set in the map, level by level, skipping empty cells.
+        """
+        return (self._tile_at(x, y, z, tile_index) for x, y, z, tile_index in self._terrain.cells())
+
+    def delete(self):
+        """
+        Releases the resources held by every tile in the map.
+        """
+        self._renderer.delete()
+        self._region_renderer.delete()
+        if self._layer is not None:
+            self._layer.delete()
+        for tile in list(self._tiles.values()):
+            tile.delete()
+        self._tiles.clear()
 
     def add_object(self, obj):
         """
@@ -145,12 +478,125 @@ class TileMap(object):
         :param obj:
         """
         self._objects.append(obj)
+        self._by_aabb2d[obj.aabb2d] = obj
+
+    def find_tiles(self, query, created_only=False) -> Generator[TileInstance, None, None]:
+        """
+        Finds the tiles whose 2D bounding box overlaps a rectangle of world space.
+
+        Only the columns that can hold such tiles are visited, so the cost depends on the size of the query and
+        not on the size of the map.
+
+        :type query: AABB2D
+        :param created_only: When True, tiles that have no instance at the moment are skipped instead of created.
+        :return: Generator yielding tile instances.
+        """
+        for x, y, z, tile_index in self._find_cells(query):
+            tile = self._tile_at(x, y, z, tile_index, not created_only)
+            if tile is not None:
+                yield tile
+
+    def _find_cells(self, query) -> Generator[Tuple[int, int, int, int], None, None]:
+        """
+        :return: Generator yielding the position and tile index of each cell whose tile overlaps the query.
+        """
+        if self._reach is None:
+            return
+        tile_w, tile_h = self._tile_size_2d
+        min_dx, max_dx, min_dy, max_dy = self._reach
+        ox, oy = self._origin
+        map_w, map_h = self._size
+        qx, qy, qw, qh = query
+
+        # Projected positions (i, j) of the cells whose tiles can reach into the query. Higher levels are drawn
+        # further up, so cells further down can reach into the query too.
+        i0, i1 = (qx + min_dx) / tile_w, (qx + qw + max_dx) / tile_w
+        j0 = (qy + min_dy - self._max_level * self._level_height) / tile_h
+        j1 = (qy + qh + max_dy) / tile_h
+
+        extents, terrain, ground = self._extents, self._terrain, self._terrain.ground
+        level_height, stacked = self._level_height, self._max_level > 0
+        right, top = qx + qw, qy + qh
+        # Scale of cart_to_iso() in pixels, applied inline because this runs for every column searched.
+        half_w, quarter_h = tile_w * 0.5, tile_h * 0.25
+
+        # Cells projected into that range form a diamond in cartesian space, where x = i + 2j and y = 2j - i.
+        for wx in range(max(ox, ceil(i0 + 2.0 * j0)), min(ox + map_w - 1, floor(i1 + 2.0 * j1)) + 1):
+            y_min = max(oy, ceil(max(wx - 2.0 * i1, 4.0 * j0 - wx)))
+            y_max = min(oy + map_h - 1, floor(min(wx - 2.0 * i0, 4.0 * j1 - wx)))
+            x = wx - ox
+            for wy in range(y_min, y_max + 1):
+                y = wy - oy
+                data_index = x + y * map_w
+                if stacked:
+                    column = terrain.column(x, y)
+                else:
+                    tile_index = ground[data_index]
+                    column = (tile_index,) if tile_index else ()
+                px, py = (wx - wy) * half_w, (wx + wy) * quarter_h
+                for z, tile_index in enumerate(column):
+                    if not tile_index:
+                        continue
+                    ax, ay, width, height = extents[tile_index]
+                    left, bottom = px - ax, py + z * level_height - ay
+                    if left <= right and qx <= left + width and bottom <= top and qy <= bottom + height:
+                        yield x, y, z, tile_index
+
+    def find(self, spatial_index, query):
+        """
+        Finds this map's tiles overlapping a rectangle, and the objects the spatial index finds near it.
+
+        Bounding boxes in the index that don't belong to this map are ignored.
+
+        :type spatial_index: SpatialIndex2D
+        :param spatial_index: Index containing the bounding boxes of the map's objects, or None.
+        :param query: Bounding box to query with.
+        :return: Set of tiles and objects.
+        """
+        return set(self.find_tiles(query)).union(self._find_objects(spatial_index, query))
+
+    def _find_objects(self, spatial_index, query):
+        if spatial_index is None:
+            return ()
+        lookup = self._by_aabb2d
+        return (lookup[k] for _i, _j, k in spatial_index.find(query) if k in lookup)
+
+    def _tiles_near(self, objects):
+        """
+        :return: Tiles overlapping any of the objects, keyed by their 2D bounding box.
+        """
+        return {tile.aabb2d: tile for obj in objects for tile in self.find_tiles(obj.aabb2d)}
+
+    def _sort_index(self, spatial_index):
+        """
+        :return: Index of the map's tiles for depth sorting, combined with the given index of objects when there
+            is one.
+        """
+        if spatial_index is None:
+            return self._sort_tile_index
+        return IndexGroup2D(self._sort_tile_index, spatial_index)
+
+    def draw_order(self, spatial_index, view=None) -> Sequence[MapObject]:
+        """
+        Sorts the map's tiles and objects in the order they are drawn, back to front. Tiles that are completely
+        covered by other tiles are left out.
+
+        :type spatial_index: SpatialIndex2D
+        :param spatial_index: Index containing the bounding boxes of the map's objects, or None. The map finds
+            its own tiles.
+        :type view: AABB2D
+        :param view: Optional rectangle of world space. When given, only tiles and objects near it are sorted.
+        :return: Tiles and objects in draw order.
+        """
+        index = self._sort_index(spatial_index)
+        if view is not None:
+            # Hidden cells are skipped before their tiles are created.
+            tiles = (self._tile_at(x, y, z, tile_index) for x, y, z, tile_index in self._find_cells(view)
+                     if not self.is_hidden(x, y, z))
+            return topological_sort(itertools.chain(tiles, self._find_objects(spatial_index, view)), index)
 
-    def _build_draw_order(self, spatial_index) -> Sequence[MapObject]:
-        tiles = map(lambda c: self.get_tile(c[0], c[1]), (coord for coord in self))
-        tiles = filter(lambda tile: tile is not None, tiles)
         objects = (obj for obj in self._objects)
-        return topological_sort(itertools.chain(tiles, objects), spatial_index)
+        return topological_sort(itertools.chain(self.visible_tiles(), objects), index)
 
     def sort(self, key_func):
         """
@@ -161,12 +607,213 @@ class TileMap(object):
         """
         pass
 
-    def draw(self, spatial_index):
-        ordered_objects = self._build_draw_order(spatial_index)
-        for obj in ordered_objects:
-            obj.draw()
+    def draw(self, spatial_index, view=None):
+        """
+        Draws the map's tiles and objects in depth order. Tiles that are completely covered by other tiles are
+        skipped.
+
+        :type spatial_index: SpatialIndex2D
+        :param spatial_index: Index containing the bounding boxes of the map's objects, or None.
+        :type view: AABB2D
+        :param view: Optional visible rectangle of world space, usually from ``PixelCamera.view_aabb2d()``.
+            When given, only tiles and objects near the view are sorted and drawn. A pre-rendered map only
+            overlays the objects near the view, and skips its layer when the layer is outside of it.
+        """
+        if self._layer is not None:
+            self.draw_layer(spatial_index, view)
+            with profiler.phase('sort'):
+                ordered_objects = self.overlay(spatial_index, view)
+        else:
+            with profiler.phase('sort'):
+                ordered_objects = self.draw_order(spatial_index, view)
+        self._renderer.update(ordered_objects, self._objects)
+        self._renderer.draw()
+
+    def collect_damage(self, regions):
+        """
+        Adds the screen rectangles that changed since the last call to the given dirty regions: the old and new
+        rectangles of objects that moved or changed image, and the rectangles of edited tiles.
+
+        Edits are only tracked after the first call, which marks everything as changed.
+
+        :type regions: DirtyRegions
+        """
+        if self._damage is None or self._damage_all:
+            regions.invalidate()
+        else:
+            for rect in self._damage:
+                regions.add(rect)
+        self._damage = []
+        self._damage_all = False
+
+        for obj in self._objects:
+            state = (obj.aabb2d.x, obj.aabb2d.y, obj.aabb2d.width, obj.aabb2d.height, obj.image)
+            previous = self._object_states.get(obj, None)
+            if previous != state:
+                if previous is not None:
+                    regions.add(previous[:4])
+                regions.add(state[:4])
+                self._object_states[obj] = state
+
+    def draw_region(self, spatial_index, rect):
+        """
+        Draws the tiles and objects touching a rectangle, in depth order. Used for partial redraws, where
+        drawing is clipped to the rectangle.
+
+        :type spatial_index: SpatialIndex2D
+        :type rect: AABB2D
+        :param rect: Rectangle of world space.
+        """
+        if self._layer is not None:
+            self.draw_layer(spatial_index, rect)
+            with profiler.phase('sort'):
+                ordered_objects = self.overlay(spatial_index, rect)
+        else:
+            with profiler.phase('sort'):
+                ordered_objects = self.draw_order(spatial_index, rect)
+        self._region_renderer.update(ordered_objects)
+        self._region_renderer.draw()
+
+    def overlay(self, spatial_index, view=None) -> Sequence[MapObject]:
+        """
+        Sorts what is drawn over the pre-rendered tiles: the objects, and the tiles that cover them.
+
+        :type spatial_index: SpatialIndex2D
+        :param spatial_index: Index containing the bounding boxes of the map's objects, or None.
+        :type view: AABB2D
+        :param view: Optional rectangle of world space. When given, only the objects overlapping it are sorted.
+        :return: Objects and covering tiles in draw order.
+        """
+        objects = self._objects
+        if view is not None:
+            objects = [obj for obj in objects if obj.aabb2d.overlap(view)]
+        return overlay_order(objects, self._sort_index(spatial_index), self._tiles_near(objects))
+
+    def draw_layer(self, spatial_index, view=None):
+        """
+        Draws the pre-rendered tiles, rendering them first if the map changed. Objects are not drawn.
+
+        :type spatial_index: SpatialIndex2D
+        :param spatial_index: Index of other bounding boxes the tiles are sorted against, or None.
+        :type view: AABB2D
+        :param view: Optional visible rectangle of world space. The layer isn't drawn when it is outside of it.
+        """
+        if self._layer is None:
+            raise TerrainError("tile map is not pre-rendered")
+        if not self._layer.valid:
+            with profiler.phase('sort'):
+                ordered_tiles = topological_sort(self.visible_tiles(), self._sort_index(spatial_index))
+            self._layer.render(ordered_tiles)
+        bounds = self._layer.bounds
+        if view is None or (bounds is not None and bounds.overlap(view)):
+            self._layer.draw()
 
     def __iter__(self):
         for y in range(self._size[1]):
             for x in range(self._size[0]):
                 yield x, y
+
+
+class TileIndex(SpatialIndex2D):
+    """
+    Spatial index of a tile map's tiles, computed from the map's columns instead of stored per tile.
+    """
+
+    def __init__(self, tilemap, created_only=False):
+        """
+        :type tilemap: TileMap
+        :param created_only: Whether to only find tiles that have an instance at the moment. Enough for depth
+            sorting, which only compares the tiles it was given, and doesn't create tiles only to discard them.
+        """
+        # Weak, because the map holds on to its index.
+        self._tilemap = weakref.ref(tilemap)
+        self._created_only = created_only
+
+    def find(self, query) -> Generator[Tuple[int, int, AABB2D], None, None]:
+        """
+        :type query: AABB2D
+        :return: Generator yielding the cell coordinates and 2D bounding box of each tile overlapping the query.
+        """
+        # Searches the map's cells directly rather than through ``find_tiles()``, as depth sorting nests these
+        # searches deeply, and each generator left open on the way counts towards the next garbage collection.
+        tilemap = self._tilemap()
+        ox, oy = tilemap.origin
+        for x, y, z, tile_index in tilemap._find_cells(query):
+            tile = tilemap._tile_at(x, y, z, tile_index, not self._created_only)
+            if tile is not None:
+                yield ox + x, oy + y, tile.aabb2d
+
+
+# Occlusion states of a cell, once tested.
+_VISIBLE = 1
+_HIDDEN = 2
+
+# Largest tile index the map can store.
+MAX_TILE_INDEX = 0xFFFF
+
+# Integer typecodes of ``array``, by whether they are signed.
+_TYPECODES = {True: 'bhilq', False: 'BHILQ'}
+
+
+def _to_cells(data) -> array:
+    """
+    Converts tile data to a new array of unsigned 16-bit tile indexes.
+
+    :raises TerrainError: When the data isn't integers, or holds values that aren't valid tile indexes.
+    """
+    if isinstance(data, array) and data.typecode == 'H':
+        return array('H', data)
+
+    try:
+        view = memoryview(data)
+    except TypeError:
+        # Plain sequence
+        try:
+            return array('H', data)
+        except OverflowError:
+            raise TerrainError("tile indexes must be between 0 and %d" % MAX_TILE_INDEX)
+        except TypeError as err:
+            raise TerrainError("tile data must be integers: %s" % err)
+
+    with view:
+        raw = view.cast('B') if view.c_contiguous else memoryview(view.tobytes())
+        with raw:
+            return _buffer_to_cells(raw, view.format, view.itemsize)
+
+
+def _buffer_to_cells(raw, fmt, itemsize):
+    """
+    :param raw: Bytes of the buffer, in row-major order.
+    :param fmt: ``struct`` format of a single item, with an optional byte order prefix.
+    :param itemsize: Size of an item in bytes.
+    """
+    # Buffer formats may carry a byte order, like NumPy arrays with an explicit one, or ctypes arrays.
+    order, code = (fmt[0], fmt[1:]) if fmt[0] in '@=<>!' else ('@', fmt)
+    if code in ('B', 'b', 'c'):
+        # Raw bytes are stored little-endian.
+        code, itemsize, order = 'H', 2, '<'
+    if order == '<':
+        swap = sys.byteorder == 'big'
+    elif order in '>!':
+        swap = sys.byteorder == 'little'
+    else:
+        swap = False
+
+    if len(code) != 1 or code not in 'bBhHiIlLqQnN':
+        raise TerrainError("tile data must be integers, not buffer format %s" % fmt)
+    if len(raw) % itemsize:
+        raise TerrainError("tile data of %d bytes is not a whole number of %d-byte values" % (len(raw), itemsize))
+
+    typecode = next((t for t in _TYPECODES[code.islower()] if array(t).itemsize == itemsize), None)
+    if typecode is None:
+        raise TerrainError("tile data must be integers, not buffer format %s" % fmt)
+    values = array(typecode)
+    values.frombytes(raw)
+    if swap:
+        values.byteswap()
+    if typecode == 'H':
+        return values
+
+    if values and (min(values) < 0 or max(values) > MAX_TILE_INDEX):
+        raise TerrainError("tile indexes must be between 0 and %d" % MAX_TILE_INDEX)
+    return array('H', values)
@@ -0,0 +1,71 @@
+"""
+Fixed timestep for the simulation, decoupled from the frame rate.
+"""
+
+# Duration in seconds of one simulation step when none is specified.
+DEFAULT_STEP = 1.0 / 60.0
+
+# Most simulation steps run for a single frame. Time beyond that is dropped, so a slow frame can't make the
+# next frame even slower trying to catch up.
+DEFAULT_MAX_STEPS = 5
+
+
+class FixedTimestep(object):
+    """
+    Accumulates frame time, and splits it into whole simulation steps of equal duration.
+
+    Time left over that doesn't make a whole step is carried into the next frame. How far the simulation is
+    into that partial step is exposed as ``alpha``, for rendering to interpolate between the last two steps.
+    """
+
+    def __init__(self, step=DEFAULT_STEP, max_steps=DEFAULT_MAX_STEPS):
+        """
+        :param step: Duration of one simulation step, in seconds.
+        :param max_steps: Maximum number of steps run per frame.
+        """
+        self._step = step
+        self._max_steps = max_steps
+        self._accumulator = 0.0
+        self._dropped = 0.0
+
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def max_steps(self):
+        return self._max_steps
+
+    @property
+    def alpha(self):
+        """
+        Fraction of a step the accumulated time is past the last step, between 0 and 1.
+        """
+        return self._accumulator / self._step
+
+    @property
+    def dropped(self):
+        """
+        Total time in seconds discarded because frames took too long to catch up with.
+        """
+        return self._dropped
+
+    def advance(self, dt):
+        """
+        Adds frame time to the accumulator.
+
+        :param dt: Time in seconds since the last frame.
+        :return: Number of simulation steps to run.
+        """
+        self._accumulator += dt
+
+        steps = min(int(self._accumulator // self._step), self._max_steps)
+        self._accumulator -= steps * self._step
+
+        if self._accumulator >= self._step:
+            # Fell behind by more than the maximum, so keep only the partial step.
+            excess = self._accumulator - self._accumulator % self._step
+            self._dropped += excess
+            self._accumulator -= excess
+
+        return steps
@@ -1,52 +1,110 @@
+import os
+import sys
+
 import pyglet
 
+from little_doors.atlas import default_atlas
 from little_doors.context import Context
 from little_doors.game import Game
+from little_doors.replay import InputRecorder, Recording, ReplayPlayer
+
+
+def option(name):
+    """
+    :return: Value of a ``--name=value`` command line option, or None.
+    """
+    for arg in sys.argv:
+        if arg.startswith('--%s=' % name):
+            return arg[len(name) + 3:]
+    return None
+
+
+# Replays use the timestep and window size they were recorded with, and ignore live input and resizes.
+replay = Recording.load(option('replay')) if option('replay') else None
+if replay is not None:
+    game = Game(partial_redraw='--partial-redraw' in sys.argv, step=replay.step, max_steps=replay.max_steps)
+    window_size = replay.window_size
+else:
+    game = Game(partial_redraw='--partial-redraw' in sys.argv)
+    window_size = (640, 480)
 
-game = Game()
 window = pyglet.window.Window(
     caption="Little Doors",
-    width=640,
-    height=480,
+    width=window_size[0],
+    height=window_size[1],
 )
+input_target = game if replay is None else None
+
+if option('record'):
+    game.record(InputRecorder(game, window_size))
 
 
 @window.event
 def on_key_press(symbol, modifiers):
-    game.on_key_press(symbol, modifiers)
+    if input_target:
+        input_target.on_key_press(symbol, modifiers)
 
 
 @window.event
 def on_key_release(symbol, modifiers):
-    game.on_key_release(symbol, modifiers)
+    if input_target:
+        input_target.on_key_release(symbol, modifiers)
 
 
 @window.event
 def on_mouse_motion(x, y, dx, dy):
-    game.on_mouse_motion(x, y, dx, dy)
+    if input_target:
+        input_target.on_mouse_motion(x, y, dx, dy)
 
 
 @window.event
 def on_mouse_press(x, y, button, modifiers):
-    game.on_mouse_press(x, y, button, modifiers)
+    if input_target:
+        input_target.on_mouse_press(x, y, button, modifiers)
 
 
 @window.event
 def on_mouse_release(x, y, button, modifiers):
-    game.on_mouse_release(x, y, button, modifiers)
+    if input_target:
+        input_target.on_mouse_release(x, y, button, modifiers)
+
+
+@window.event
+def on_resize(width, height):
+    if input_target:
+        input_target.on_resize(width, height)
 
 
 @window.event
 def on_draw():
-    window.clear()
+    # A partial redraw copies the whole frame from its backbuffer over the window, so clearing it first is wasted.
+    if not game.partial_redraw:
+        window.clear()
     game.on_draw()
 
 
 if __name__ == "__main__":
+    # Pixel art stays crisp when scaled by the camera.
+    pyglet.image.Texture.default_min_filter = pyglet.gl.GL_NEAREST
+    pyglet.image.Texture.default_mag_filter = pyglet.gl.GL_NEAREST
+
     with Context(game, window) as _ctx:
+        # Use the atlas from `manage.py assets build --atlas atlas` when there is one.
+        if os.path.exists('./resources/atlas.json'):
+            default_atlas().load_packed('./resources/atlas.json')
+
         game.start()
-        pyglet.clock.schedule_interval(game.on_update, 1.0 / 60.0)
+        # Update every frame. The game splits frame time into fixed simulation steps itself.
+        update = game.on_update if replay is None else ReplayPlayer(game, replay).on_update
+        pyglet.clock.schedule(update)
         pyglet.app.run()
 
         # Explicitly unschedule update to avoid weak ref exception
-        pyglet.clock.unschedule(game.on_update)
+        pyglet.clock.unschedule(update)
+
+        # Keep the frame times of the end of the session, as CSV or as a Chrome trace when the name ends in .json.
+        if option('profile-out'):
+            game.profiler.export(option('profile-out'))
+
+        if option('record'):
+            game.recorder.save(option('record'))
@@ -1,21 +1,33 @@
 import os
+import time
 from shutil import copyfile
 
 import click
 
+from bench import harness
+from little_doors.hotpaths import profile_scene, hot_functions, format_summary, DEFAULT_INTERVAL
+from little_doors.pipeline import build_assets, PipelineError
+from little_doors.replay import Recording, ReplayError
+from little_doors.simulation import Simulation, SCENES
+
 
 @click.group()
 def cli():
     pass
 
 
-@cli.command()
+@cli.group(invoke_without_command=True)
 @click.option('--art-dir', default='./art', help="Relative path to art assets")
 @click.option('--resource-dir', default='./resources', help="Relative path to target resources directory")
-def assets(art_dir, resource_dir):
+@click.pass_context
+def assets(ctx, art_dir, resource_dir):
     """
     Copies assets into the resources directory so they can be shipped.
     """
+    ctx.obj = {'art_dir': art_dir, 'resource_dir': resource_dir}
+    if ctx.invoked_subcommand is not None:
+        return
+
     extensions = ['png']
     print("Searching %s for files with extensions: %s " % (art_dir, extensions))
 
@@ -36,5 +48,185 @@ def assets(art_dir, resource_dir):
                     copyfile(src, dst)
 
 
+@assets.command()
+@click.option('--workers', default=None, type=int, help="Number of worker threads")
+@click.option('--aseprite', default=None, help="Path to the Aseprite executable, if not in PATH")
+@click.option('--atlas', default=None, help="Name of a pre-packed atlas to write to the resources directory")
+@click.option('--force', is_flag=True, help="Rebuild everything, ignoring the manifest")
+@click.pass_context
+def build(ctx, workers, aseprite, atlas, force):
+    """
+    Exports and copies only the assets that changed since the last build.
+    """
+    try:
+        result = build_assets(ctx.obj['art_dir'], ctx.obj['resource_dir'], workers=workers, aseprite=aseprite,
+                              atlas=atlas, force=force)
+    except PipelineError as err:
+        raise click.ClickException(str(err))
+
+    if result.failed:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument('scene', type=click.Choice(sorted(SCENES)))
+@click.option('--frames', default=600, help="Number of frames to run")
+@click.option('--frame-time', default=1.0 / 60.0, help="Simulated seconds per frame")
+@click.option('--partial-redraw', is_flag=True, help="Run the scene's partial redraw path")
+@click.option('--profile-out', default=None, help="Write frame phase times to a CSV file, or a Chrome trace if .json")
+def simulate(scene, frames, frame_time, partial_redraw, profile_out):
+    """
+    Runs a scene without a window, as fast as possible.
+    """
+    sim = Simulation(frame_time=frame_time, partial_redraw=partial_redraw)
+    try:
+        sim.start(scene)
+        started = time.perf_counter()
+        sim.run(frames)
+        elapsed = time.perf_counter() - started
+    finally:
+        sim.shutdown()
+
+    simulated = sim.clock()
+    print("Simulated %d frames, %.2f s in %.2f s (%.1fx real time)"
+          % (sim.frames, simulated, elapsed, simulated / elapsed if elapsed > 0.0 else float('inf')))
+
+    if profile_out:
+        sim.game.profiler.export(profile_out)
+        print("Wrote frame profile to %s" % profile_out)
+
+
+@cli.command()
+@click.argument('scene', type=click.Choice(sorted(SCENES)))
+@click.option('--frames', default=600, help="Number of frames to run")
+@click.option('--output', default=None, help="Path of the profile, without extension. Defaults to profile-<scene>")
+@click.option('--cprofile', is_flag=True, help="Profile with cProfile, counting calls, instead of sampling stacks")
+@click.option('--interval', default=DEFAULT_INTERVAL, help="Seconds between stack samples")
+def profile(scene, frames, output, cprofile, interval):
+    """
+    Profiles a scene headless, with the player walking around.
+
+    Samples are written as collapsed stacks, for flamegraph.pl or speedscope. cProfile output is written as
+    pstats data, for snakeviz or pstats.
+    """
+    filename, times = profile_scene(scene, frames, output or 'profile-%s' % scene, deterministic=cprofile,
+                                    interval=interval)
+    print(format_summary(hot_functions(times)))
+    print("Wrote profile to %s" % filename)
+
+
+@cli.command()
+@click.argument('recording', type=click.Path(exists=True, dir_okay=False))
+@click.option('--scene', default='start', type=click.Choice(sorted(SCENES)), help="Scene the recording starts in")
+@click.option('--profile-out', default=None, help="Write frame phase times to a CSV file, or a Chrome trace if .json")
+def replay(recording, scene, profile_out):
+    """
+    Replays a recording from `main.py --record=FILE` without a window, as fast as possible.
+    """
+    try:
+        recording = Recording.load(recording)
+    except ReplayError as err:
+        raise click.ClickException(str(err))
+
+    sim = Simulation.for_recording(recording)
+    try:
+        sim.start(scene)
+        started = time.perf_counter()
+        sim.play(recording)
+        elapsed = time.perf_counter() - started
+    finally:
+        sim.shutdown()
+
+    print("Replayed %d frames, %.2f s in %.2f s" % (sim.frames, sim.clock(), elapsed))
+
+    if profile_out:
+        sim.game.profiler.export(profile_out)
+        print("Wrote frame profile to %s" % profile_out)
+
+
+@cli.group()
+def bench():
+    """
+    Benchmarks of the hot paths, in bench/.
+    """
+
+
+@bench.command('run')
+@click.option('--filter', 'name_filter', default=None, help="Only run benchmarks whose name contains this text")
+@click.option('--output', default='bench-results.json', help="Path of the JSON results file")
+@click.option('--repeat', default=harness.DEFAULT_REPEAT, help="Number of timed runs per benchmark")
+@click.option('--min-time', default=harness.DEFAULT_MIN_TIME, help="Minimum seconds per timed run")
+@click.pass_context
+def bench_run(ctx, name_filter, output, repeat, min_time):
+    """
+    Runs the benchmarks, and writes the results as JSON. Fails if any benchmark exceeds its time limit.
+    """
+    def _log(name, result):
+        print("%-60s %12s %12s" % (name, harness.format_time(result['best']), harness.format_time(result['median'])))
+
+    print("%-60s %12s %12s" % ('benchmark', 'best', 'median'))
+    benchmarks = harness.discover()
+    results = harness.run(benchmarks, name_filter=name_filter, repeat=repeat, min_time=min_time, log=_log)
+    harness.save(results, output)
+    print("Wrote results to %s" % output)
+
+    violations = harness.check_limits(benchmarks, results)
+    for v in violations:
+        print("LIMIT EXCEEDED %s: %s is %s, limit %s" % (v.name, v.metric, harness.format_time(v.value),
+                                                        harness.format_time(v.limit)))
+    if violations:
+        ctx.exit(1)
+
+
+@bench.command('memory')
+@click.option('--filter', 'name_filter', default=None, help="Only run benchmarks whose name contains this text")
+@click.option('--output', default='bench-memory.json', help="Path of the JSON results file")
+@click.pass_context
+def bench_memory(ctx, name_filter, output):
+    """
+    Measures memory per object and allocations per frame, and fails if any exceeds its limit.
+    """
+    def _log(name, result):
+        metrics = ', '.join('%s %.2f' % (metric, value) for metric, value in sorted(result.items())
+                            if metric not in ('params', 'units', 'bytes'))
+        print("%-44s %s" % (name, metrics))
+
+    results, violations = harness.run_memory(harness.discover_memory(), name_filter=name_filter, log=_log)
+    harness.save(results, output)
+    print("Wrote results to %s" % output)
+
+    for v in violations:
+        print("LIMIT EXCEEDED %s: %s is %.2f, limit %.2f" % (v.name, v.metric, v.value, v.limit))
+    if violations:
+        ctx.exit(1)
+
+
+@bench.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', default=harness.DEFAULT_THRESHOLD,
+              help="Slowdown, as a fraction of the baseline, that counts as a regression")
+@click.pass_context
+def bench_compare(ctx, baseline, current, threshold):
+    """
+    Compares benchmark results against a baseline, and fails if any benchmark regressed.
+    """
+    try:
+        comparisons = harness.compare(harness.load(baseline), harness.load(current), threshold)
+    except harness.BenchmarkError as err:
+        raise click.ClickException(str(err))
+
+    print("%-60s %12s %12s %8s" % ('benchmark', 'baseline', 'current', 'ratio'))
+    for c in comparisons:
+        print("%-60s %12s %12s %7.2fx%s" % (c.name, harness.format_time(c.baseline), harness.format_time(c.current),
+                                           c.ratio, '  REGRESSION' if c.regression else ''))
+
+    regressions = [c for c in comparisons if c.regression]
+    if regressions:
+        print("%d of %d benchmarks regressed by more than %d%%" % (len(regressions), len(comparisons),
+                                                                  threshold * 100))
+        ctx.exit(1)
+
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,99 @@
+from bench.bench_memory import memory_frame
+from bench.bench_tilemap import LARGE_LOAD_LIMITS, tilemap_load_large
+from bench.harness import Benchmark, MemoryBenchmark, cases, check_limits, compare, measure_size, run, \
+    run_memory
+from little_doors import headless
+
+
+def _results(**times):
+    return {'version': 1, 'results': {name: {'best': best} for name, best in times.items()}}
+
+
+def test_cases_expand_parameters():
+    """
+    Should run a benchmark once for every combination of its parameters, named after them.
+    """
+    # assume
+    bench = Benchmark('grid_find', lambda count, density: None, {'count': [10, 100], 'density': [1.0]})
+
+    # act
+    names = [name for name, _setup, _params in cases([bench])]
+
+    # assert
+    assert names == ['grid_find[count=10,density=1.0]', 'grid_find[count=100,density=1.0]']
+
+
+def test_compare_flags_regressions():
+    """
+    Should flag cases that got slower than the threshold allows, and skip cases missing from either result.
+    """
+    # assume
+    baseline = _results(sort=1.0, find=1.0, removed=1.0)
+    current = _results(sort=1.05, find=1.5, added=1.0)
+
+    # act
+    comparisons = compare(baseline, current, threshold=0.1)
+
+    # assert
+    assert [(c.name, c.regression) for c in comparisons] == [('find', True), ('sort', False)]
+
+
+def test_run_memory_reports_limits_exceeded():
+    """
+    Should measure the bytes per unit of what a size benchmark builds, and report metrics over their limit.
+    """
+    # assume
+    bench = MemoryBenchmark('lists', lambda: lambda: ([[n] for n in range(1000)], 1000), {}, measure_size,
+                            {'bytes_per_unit': 1, 'units': 1000})
+
+    # act
+    results, violations = run_memory([bench])
+
+    # assert
+    assert results['results']['lists']['bytes_per_unit'] > 1
+    assert [(v.name, v.metric) for v in violations] == [('lists', 'bytes_per_unit')]
+
+
+def test_check_limits_flags_slow_cases():
+    """
+    Should report the cases whose time exceeds their benchmark's limit, and ignore benchmarks without limits.
+    """
+    # assume
+    limited = Benchmark('load', lambda size: None, {'size': [16, 1024]}, lambda size: {'best': size * 1e-4})
+    unlimited = Benchmark('sort', lambda: None, {})
+    results = _results(**{'load[size=16]': 0.01, 'load[size=1024]': 0.05, 'sort': 10.0})
+
+    # act
+    violations = check_limits([limited, unlimited], results)
+
+    # assert
+    assert [(v.name, v.metric) for v in violations] == [('load[size=16]', 'best')]
+
+
+def test_large_map_load_within_limit():
+    """
+    Should bulk load a large map within the time limit of its benchmark.
+    """
+    # assume
+    bench = Benchmark('tilemap_load_large', tilemap_load_large, {}, LARGE_LOAD_LIMITS)
+
+    # act
+    results = run([bench], repeat=3, min_time=0.0)
+
+    # assert
+    assert check_limits([bench], results) == []
+
+
+def test_memory_frame_restores_headless_mode():
+    """
+    Should only run frames headless while they run, and leave the mode as it was before.
+    """
+    # assume
+    frame = memory_frame(16)
+    assert not headless.is_enabled()
+
+    # act
+    frame()
+
+    # assert
+    assert not headless.is_enabled()
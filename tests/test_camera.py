@@ -0,0 +1,22 @@
+from pytest import approx
+
+from little_doors.camera import PixelCamera
+
+
+def test_bounds_follow_changes():
+    """
+    Should recompute the bounds and projection when the camera moves, zooms or is resized.
+    """
+    # assume
+    camera = PixelCamera(window_size=(640, 480), size_factor=0.5)
+    camera.set_position(-160.0, -64.0)
+
+    # act
+    camera.resize(800, 600)
+    camera.set_size_factor(1.0)
+
+    # assert
+    assert camera.bounds == (-160.0, -64.0, 640.0, 536.0)
+    m = camera.projection
+    assert (m[0] * camera.left + m[12], m[5] * camera.top + m[13]) == approx((-1.0, 1.0))
+    assert camera.world_to_window(*camera.window_to_world(12.0, 34.0)) == (12.0, 34.0)
@@ -0,0 +1,162 @@
+from little_doors.chunk import ArrayChunkSource, ChunkedTileMap
+from little_doors.aabb import AABB2D
+from little_doors.grid import GridIndex2D
+from little_doors.streaming import StreamingLoader
+from little_doors.tile import Tile
+
+
+def test_read_chunk_edge():
+    """
+    Should pad chunks that extend past the edge of the map with empty cells.
+    """
+    # assume
+    source = ArrayChunkSource((3, 3), list(range(1, 10)), chunk_size=(2, 2))
+
+    # act
+    chunk = source.read_chunk(1, 1)
+
+    # assert
+    assert chunk == [9, 0, 0, 0]
+
+
+def test_update_view_loads_chunks():
+    """
+    Should load the chunks that cover the view.
+    """
+    # assume
+    tilemap = ChunkedTileMap((64, 64), ArrayChunkSource((64, 64), [0] * 64 * 64, chunk_size=(8, 8)),
+                             chunk_size=(8, 8))
+
+    # act
+    tilemap.update_view(0.0, 0.0, 64.0, 64.0, margin=0)
+
+    # assert
+    assert (0, 0) in tilemap.loaded_chunks
+    assert set(tilemap.loaded_chunks) == tilemap.chunks_in_view(0.0, 0.0, 64.0, 64.0, margin=0)
+
+
+def test_update_view_evicts_least_recently_used():
+    """
+    Should evict chunks that left the view once the capacity is exceeded.
+    """
+    # assume
+    tilemap = ChunkedTileMap((256, 256), ArrayChunkSource((256, 256), [0] * 256 * 256, chunk_size=(8, 8)),
+                             chunk_size=(8, 8), capacity=1)
+    tilemap.update_view(0.0, 0.0, 32.0, 32.0, margin=0)
+    first = set(tilemap.loaded_chunks)
+
+    # act
+    tilemap.update_view(0.0, 1024.0, 32.0, 1056.0, margin=0)
+
+    # assert
+    visible = tilemap.chunks_in_view(0.0, 1024.0, 32.0, 1056.0, margin=0)
+    assert visible.issubset(tilemap.loaded_chunks)
+    assert len(tilemap.loaded_chunks) <= max(1, len(visible))
+    assert not first.issubset(tilemap.loaded_chunks)
+
+
+def test_zoomed_out_view_uses_impostors():
+    """
+    Should stop keeping chunks loaded for the view once their impostors are baked.
+    """
+    # assume
+    grid = GridIndex2D(position=(-2048.0, -2048.0), dimensions=(128, 128), cell_size=(32.0, 32.0))
+    tilemap = ChunkedTileMap((64, 64), ArrayChunkSource((64, 64), [0] * 64 * 64, chunk_size=(8, 8)),
+                             chunk_size=(8, 8), capacity=0)
+    tilemap.update_view(0.0, 0.0, 256.0, 256.0, margin=0, size_factor=4.0)
+    assert tilemap.loaded_chunks
+    tilemap.draw(grid, size_factor=4.0)
+
+    # act
+    tilemap.update_view(0.0, 0.0, 256.0, 256.0, margin=0, size_factor=4.0)
+
+    # assert
+    assert tilemap.loaded_chunks == []
+
+
+def test_edited_chunk_updates_index():
+    """
+    Should remove the tiles an edit replaces from the view query, and add the tiles that replace them.
+    """
+    # assume
+    grid = GridIndex2D(position=(-512.0, -512.0), dimensions=(32, 32), cell_size=(32.0, 32.0))
+    tilemap = ChunkedTileMap((8, 8), ArrayChunkSource((8, 8), [1] * 64, chunk_size=(4, 4)), chunk_size=(4, 4),
+                             spatial_index=grid)
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2)})
+    tilemap.update_view(0.0, 0.0, 64.0, 64.0, margin=0)
+    chunk = tilemap.get_chunk(0, 0)
+    deleted, replaced = chunk.get_tile(1, 1), chunk.get_tile(2, 2)
+    view = AABB2D(-256.0, -256.0, 512.0, 512.0)
+
+    # act
+    with chunk.edit():
+        chunk.set_cell(1, 1, 0)
+        chunk.set_cell(2, 2, 2)
+
+    # assert
+    found = tilemap.find(grid, view)
+    assert deleted not in found
+    assert replaced not in found
+    assert chunk.get_tile(2, 2) in found
+
+
+def test_failed_chunk_load_is_retried(caplog):
+    """
+    Should log a chunk that failed to load, and request it again on the next view update.
+    """
+    # assume
+    class FailingSource(object):
+        reads = 0
+
+        def read_chunk(self, cx, cy):
+            FailingSource.reads += 1
+            raise IOError("chunk (%s, %s) is unreadable" % (cx, cy))
+
+    loader = StreamingLoader(max_workers=1)
+    tilemap = ChunkedTileMap((8, 8), FailingSource(), chunk_size=(8, 8), loader=loader)
+    tilemap.update_view(0.0, 0.0, 32.0, 32.0, margin=0)
+    loader.flush()
+
+    # act
+    tilemap.update_view(0.0, 0.0, 32.0, 32.0, margin=0)
+    loader.flush()
+
+    # assert
+    assert FailingSource.reads == 2
+    assert tilemap.loaded_chunks == []
+    assert "unreadable" in caplog.text
+    loader.shutdown()
+
+
+def test_delete_cancels_pending_chunk_builds():
+    """
+    Should remove the tiles a streamed chunk has indexed so far when the map is deleted, and stop its build.
+    """
+    # assume
+    class ManualLoader(object):
+        def __init__(self):
+            self.tasks = []
+
+        def submit(self, load, finish, *args, on_error=None):
+            self.tasks.append(finish(load(*args)))
+
+    grid = GridIndex2D(position=(-512.0, -512.0), dimensions=(32, 32), cell_size=(32.0, 32.0))
+    loader = ManualLoader()
+    tilemap = ChunkedTileMap((4, 4), ArrayChunkSource((4, 4), [1] * 16, chunk_size=(4, 4)), chunk_size=(4, 4),
+                             spatial_index=grid, loader=loader)
+    tilemap.load_tile_set({1: Tile(1)})
+    tilemap.update_view(0.0, 0.0, 32.0, 32.0, margin=0)
+    build = loader.tasks[0]
+    next(build)
+    next(build)
+    view = AABB2D(-256.0, -256.0, 512.0, 512.0)
+    assert len(tilemap.find(grid, view)) == 8
+
+    # act
+    tilemap.delete()
+    remaining = list(build)
+
+    # assert
+    assert remaining == []
+    assert not tilemap.find(grid, view)
+    assert tilemap.loaded_chunks == []
@@ -0,0 +1,21 @@
+from little_doors.hotpaths import FunctionTime, hot_functions
+
+
+def test_hot_functions_by_module():
+    """
+    Should keep only functions in the hot modules, slowest first, up to the limit per module.
+    """
+    # assume
+    times = [
+        FunctionTime('grid.py', 'find', 267, 10, 0.001, 0.004),
+        FunctionTime('grid.py', 'recalculate', 222, 1, 0.003, 0.005),
+        FunctionTime('grid.py', 'insert', 150, 1, 0.002, 0.002),
+        FunctionTime('camera.py', 'push_state', 149, 1, 0.010, 0.010),
+    ]
+
+    # act
+    hot = hot_functions(times, modules=('grid.py', 'iso.py'), limit=2)
+
+    # assert
+    assert [t.name for t in hot['grid.py']] == ['recalculate', 'insert']
+    assert hot['iso.py'] == []
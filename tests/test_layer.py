@@ -0,0 +1,31 @@
+from little_doors.aabb import AABB3D, AABB2D
+from little_doors.grid import GridIndex2D
+from little_doors.iso import cart_to_iso
+from little_doors.layer import overlay_order
+
+
+class Box(object):
+
+    def __init__(self, x, y, size=1.0):
+        i, j, _k = cart_to_iso(x, y, 0)
+        self.aabb3d = AABB3D(float(x), float(y), 0.0, size, size, size)
+        self.aabb2d = AABB2D(i * 32.0 - 16.0, j * 32.0 - 8.0, 32.0 * size, 32.0 * size)
+
+
+def test_overlay_order_includes_covering_tiles():
+    """
+    Should draw the tiles in front of an object after it, and leave the tiles behind it in the layer.
+    """
+    # assume
+    grid = GridIndex2D(position=(-512.0, -512.0), dimensions=(32, 32), cell_size=(32.0, 32.0))
+    front, back = Box(1, 2), Box(3, 2)
+    obj = Box(2.25, 2.25, size=0.5)
+    for box in (front, back, obj):
+        grid.insert(box.aabb2d)
+    lookup = {box.aabb2d: box for box in (front, back)}
+
+    # act
+    ordered = list(overlay_order([obj], grid, lookup))
+
+    # assert
+    assert ordered == [obj, front]
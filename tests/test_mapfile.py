@@ -0,0 +1,71 @@
+from pytest import raises
+
+from little_doors.mapfile import write_map, MapReader, MapFileError
+from little_doors.tile import Tile
+
+
+def _write_sample(path):
+    data = [(x * y) % 3 for y in range(5) for x in range(7)]
+    tile_set = {
+        1: Tile(1, "template-1-1-1", resource_filename='./resources/art/tile-template.png', anchor=(16.0, 8.0),
+                depth=1.0, dimension=(1.0, 1.0, 1.0), tile_size=(32.0, 32.0)),
+        2: Tile(2, "template-2-1-1", resource_filename='./resources/art/tile-template-2-1-1.png', anchor=(16.0, 8.0),
+                depth=1.0, dimension=(2.0, 1.0, 1.0), tile_size=(48.0, 40.0), opaque=False),
+    }
+    write_map(path, (7, 5), data, tile_set, chunk_size=(4, 4))
+    return data
+
+
+def test_round_trip(tmp_path):
+    """
+    Should read back the layer and tile set that was written.
+    """
+    # assume
+    path = str(tmp_path / 'level.ldmap')
+    data = _write_sample(path)
+
+    # act
+    with MapReader(path) as reader:
+        layer = reader.read_layer()
+        tile_set = reader.create_tile_set()
+        size, chunk_count = reader.size, reader.chunk_count
+
+    # assert
+    assert list(layer) == data
+    assert size == (7, 5)
+    assert chunk_count == (2, 2)
+    assert tile_set[2].name == "template-2-1-1"
+    assert tile_set[2].size == (2.0, 1.0, 1.0)
+    assert tile_set[2].anchor == (16.0, 8.0)
+    assert tile_set[1].opaque
+    assert not tile_set[2].opaque
+
+
+def test_read_chunk(tmp_path):
+    """
+    Should read a single chunk, padded with empty cells at the edge of the map.
+    """
+    # assume
+    path = str(tmp_path / 'level.ldmap')
+    data = _write_sample(path)
+
+    # act
+    with MapReader(path) as reader:
+        chunk = reader.read_chunk(1, 1)
+
+    # assert
+    assert list(chunk[0:3]) == data[4 + 4 * 7:7 + 4 * 7]
+    assert list(chunk[3:]) == [0] * 13
+
+
+def test_not_a_map_file(tmp_path):
+    """
+    Should raise when the file is not a map file.
+    """
+    # assume
+    path = tmp_path / 'level.ldmap'
+    path.write_bytes(b'PNG' + bytes(64))
+
+    # act, assert
+    with raises(MapFileError):
+        MapReader(str(path))
@@ -0,0 +1,56 @@
+import json
+import os
+
+from little_doors.pipeline import build_assets, pack_atlas, _write_png
+
+
+def _log(_line):
+    pass
+
+
+def test_build_skips_unchanged_sources(tmp_path):
+    """
+    Should only copy sources that changed since the previous build.
+    """
+    # assume
+    art_dir, resource_dir = str(tmp_path / 'art'), str(tmp_path / 'resources')
+    os.makedirs(art_dir)
+    for name in ('a.png', 'b.png'):
+        _write_png(os.path.join(art_dir, name), 1, 1, b'\xff\x00\x00\xff')
+    build_assets(art_dir, resource_dir, aseprite=None, log=_log)
+    _write_png(os.path.join(art_dir, 'b.png'), 1, 1, b'\x00\xff\x00\xff')
+
+    # act
+    result = build_assets(art_dir, resource_dir, log=_log)
+
+    # assert
+    assert result.built == [os.path.join(art_dir, 'b.png')]
+    assert result.skipped == [os.path.join(art_dir, 'a.png')]
+    with open(os.path.join(resource_dir, 'art', 'b.png'), 'rb') as f:
+        assert f.read() == open(os.path.join(art_dir, 'b.png'), 'rb').read()
+
+
+def test_pack_atlas_places_images_without_overlap(tmp_path):
+    """
+    Should pack every image into one page, with regions that don't overlap.
+    """
+    # assume
+    images = []
+    for n, size in enumerate([(4, 8), (6, 2), (3, 3)]):
+        path = str(tmp_path / ('%s.png' % n))
+        _write_png(path, size[0], size[1], b'\xff' * (size[0] * size[1] * 4))
+        images.append(path)
+
+    # act
+    outputs = pack_atlas(images, str(tmp_path / 'atlas'), page_size=(16, 16))
+
+    # assert
+    with open(outputs[-1]) as f:
+        regions = list(json.load(f)['regions'].values())
+    assert len(outputs) == 2
+    assert all(r['page'] == 0 for r in regions)
+    for a in regions:
+        for b in regions:
+            if a is not b:
+                assert (a['x'] + a['width'] <= b['x'] or b['x'] + b['width'] <= a['x'] or
+                        a['y'] + a['height'] <= b['y'] or b['y'] + b['height'] <= a['y'])
@@ -0,0 +1,38 @@
+from pytest import approx
+
+from little_doors.profiler import FrameProfiler
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_ring_buffer_keeps_latest_frames():
+    """
+    Should record the time spent in each phase per frame, overwriting the oldest frames when full.
+    """
+    # assume
+    clock = FakeClock()
+    profiler = FrameProfiler(capacity=3, clock=clock)
+
+    # act
+    for n in range(5):
+        with profiler.phase('update'):
+            clock.time += 0.001 * n
+        with profiler.phase('draw'):
+            with profiler.phase('sort'):
+                clock.time += 0.002
+            clock.time += 0.001
+        profiler.end_frame()
+
+    # assert
+    assert len(profiler) == 3
+    assert profiler.phase_times('update') == approx([0.002, 0.003, 0.004])
+    assert profiler.phase_times('draw') == approx([0.003] * 3)
+    assert profiler.phase_times('sort') == approx([0.002] * 3)
+    assert profiler.percentiles(percents=(50, 100)) == approx((0.006, 0.007))
@@ -0,0 +1,22 @@
+from little_doors.aabb import AABB2D
+from little_doors.redraw import DirtyRegions
+
+
+def test_take_merges_overlapping_rects():
+    """
+    Should merge overlapping rectangles, including ones that only overlap after an earlier merge.
+    """
+    # assume
+    regions = DirtyRegions()
+    regions.take()
+    regions.add(AABB2D(0.0, 0.0, 10.0, 10.0))
+    regions.add(AABB2D(5.5, 5.5, 10.0, 10.0))
+    regions.add(AABB2D(14.0, 0.0, 4.0, 4.0))
+    regions.add(AABB2D(100.0, 100.0, 1.0, 1.0))
+
+    # act
+    rects = regions.take()
+
+    # assert
+    assert sorted(tuple(r) for r in rects) == [(0, 0, 18, 16), (100, 100, 1, 1)]
+    assert regions.take() == []
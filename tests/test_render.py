@@ -0,0 +1,101 @@
+from little_doors import headless
+from little_doors.aabb import AABB2D
+from little_doors.render import texture_runs, quad, OrderedBatchRenderer
+
+
+class FakeTexture(object):
+
+    def __init__(self, texture_id, tex_coords=(0.0,) * 12):
+        self.id = texture_id
+        self.tex_coords = tex_coords
+        self.width = 16
+        self.height = 16
+        self.anchor_x = 0
+        self.anchor_y = 0
+
+    def get_texture(self):
+        return self
+
+
+class Obj(object):
+
+    def __init__(self, texture_id):
+        self.image = FakeTexture(texture_id)
+        self.aabb2d = AABB2D(0.0, 0.0, 16.0, 16.0)
+
+
+class FakeVertexList(object):
+
+    def __init__(self, objects):
+        self.vertices = [v for obj in objects for v in quad(obj.image, 0, 0)]
+        self.tex_coords = [c for obj in objects for c in obj.image.tex_coords]
+
+    def delete(self):
+        pass
+
+
+def _written_renderer(objects):
+    """
+    Creates a renderer in the state that writing the objects into one vertex list leaves it in, which needs no
+    GL context.
+    """
+    renderer = OrderedBatchRenderer()
+    vertex_list = FakeVertexList(objects)
+    renderer._order = tuple(objects)
+    renderer._vertex_lists = [vertex_list]
+    renderer._slots = {obj: (vertex_list, offset, 0, 0, obj.image) for offset, obj in enumerate(objects)}
+    renderer._run_count = 1
+    return renderer
+
+
+def test_texture_runs():
+    """
+    Should group consecutive objects sharing a texture, without changing their order.
+    """
+    # assume
+    objects = [Obj(1), Obj(1), Obj(2), Obj(1), Obj(1), Obj(1)]
+
+    # act
+    runs = texture_runs(objects)
+
+    # assert
+    assert [len(run) for run in runs] == [2, 1, 3]
+    assert [obj for run in runs for obj in run] == objects
+
+
+def test_changed_image_updates_tex_coords():
+    """
+    Should write the texture coordinates of a dynamic object's new image, without the draw order changing.
+    """
+    # assume
+    objects = [Obj(1), Obj(1)]
+    renderer = _written_renderer(objects)
+    vertex_list = renderer._vertex_lists[0]
+
+    # act
+    objects[1].image = FakeTexture(1, tex_coords=(1.0,) * 12)
+    renderer.update(objects, dynamic_objects=objects[1:])
+
+    # assert
+    assert renderer._vertex_lists == [vertex_list]
+    assert vertex_list.tex_coords == [0.0] * 12 + [1.0] * 12
+
+
+def test_changed_texture_rebuilds_runs():
+    """
+    Should split a run when a dynamic object's new image is on another texture.
+    """
+    # assume
+    objects = [Obj(1), Obj(1)]
+    renderer = _written_renderer(objects)
+    headless.enable()
+
+    # act
+    try:
+        objects[1].image = FakeTexture(2)
+        renderer.update(objects, dynamic_objects=objects[1:])
+    finally:
+        headless.disable()
+
+    # assert
+    assert renderer.run_count == 2
@@ -0,0 +1,48 @@
+import os
+
+from little_doors import headless
+from little_doors.replay import InputRecorder, Recording
+from little_doors.simulation import Simulation
+
+
+def test_replay_matches_recorded_session(tmpdir):
+    """
+    Should save the input and frame times of a session, and end up in the same state when replaying them.
+    """
+    # assume
+    filename = os.path.join(str(tmpdir), 'session.ldr')
+    sim = Simulation()
+    try:
+        sim.start('dimetric')
+        from pyglet.window import key
+        game = sim.game
+        recorder = InputRecorder(game, (sim.window.width, sim.window.height))
+        game.record(recorder)
+
+        def walk(frame):
+            if frame == 5:
+                game.on_key_press(key.D, 0)
+            elif frame == 20:
+                game.on_key_release(key.D, 0)
+                game.on_key_press(key.W, 0)
+
+        sim.run(30, before_frame=walk)
+        recorder.save(filename)
+        recorded = game.scenes.top.player.pos3d
+    finally:
+        sim.shutdown()
+
+    # act
+    recording = Recording.load(filename)
+    replay = Simulation.for_recording(recording)
+    try:
+        replay.start('dimetric')
+        replay.play(recording)
+        replayed = replay.game.scenes.top.player.pos3d
+    finally:
+        replay.shutdown()
+        headless.disable()
+
+    # assert
+    assert recording.frames == 30
+    assert replayed == recorded
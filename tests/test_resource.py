@@ -0,0 +1,44 @@
+from little_doors.resource import ResourceCache
+
+
+def test_acquire_shares_identical_content(tmp_path):
+    """
+    Should return the same undecoded resource for files with identical content.
+    """
+    # assume
+    cache = ResourceCache()
+    first, second = tmp_path / 'a.png', tmp_path / 'b.png'
+    first.write_bytes(b'image')
+    second.write_bytes(b'image')
+
+    # act
+    a = cache.acquire(str(first))
+    b = cache.acquire(str(tmp_path / '.' / 'b.png'))
+
+    # assert
+    assert a is b
+    assert a.refs == 2
+    assert not a.decoded
+    assert len(cache) == 1
+
+
+def test_release_evicts_least_recently_released(tmp_path):
+    """
+    Should only evict unreferenced resources, oldest first, once over capacity.
+    """
+    # assume
+    cache = ResourceCache(capacity=1)
+    resources = []
+    for n in range(3):
+        path = tmp_path / ('%s.png' % n)
+        path.write_bytes(b'image %d' % n)
+        resources.append(cache.acquire(str(path)))
+
+    # act
+    cache.release(resources[0])
+    cache.release(resources[1])
+
+    # assert
+    assert len(cache) == 2
+    assert cache.acquire(str(tmp_path / '0.png')) is not resources[0]
+    assert cache.acquire(str(tmp_path / '1.png')) is resources[1]
@@ -0,0 +1,32 @@
+from little_doors import headless
+from little_doors.simulation import Simulation
+
+
+def _walk_right(frames):
+    sim = Simulation()
+    try:
+        sim.start('dimetric')
+        from pyglet.window import key
+        scene = sim.game.scenes.top
+        scene.inputs[key.D] = True
+        sim.run(frames)
+        return scene.player.pos3d
+    finally:
+        sim.shutdown()
+        headless.disable()
+
+
+def test_simulation_is_deterministic():
+    """
+    Should run a scene without a window, and end up in the same state on every run.
+    """
+    # assume
+    frames = 30
+
+    # act
+    first = _walk_right(frames)
+    second = _walk_right(frames)
+
+    # assert
+    assert first == second
+    assert first[0] > 0.0 and first[1] < 0.0
@@ -0,0 +1,72 @@
+from little_doors.streaming import StreamingLoader, LoadState
+
+
+def test_drain_finishes_on_calling_thread():
+    """
+    Should pass the worker's result to the finish callback during drain.
+    """
+    # assume
+    loader = StreamingLoader(max_workers=1)
+    results = []
+    task = loader.submit(lambda a, b: a + b, results.append, 1, 2)
+
+    # act
+    loader.flush()
+
+    # assert
+    assert results == [3]
+    assert task.state == LoadState.DONE
+    assert loader.progress == 1.0
+    loader.shutdown()
+
+
+def test_drain_resumes_generator_finish():
+    """
+    Should spread a generator finish over multiple drains when the budget runs out.
+    """
+    # assume
+    loader = StreamingLoader(max_workers=1)
+    steps = []
+
+    def _finish(count):
+        for n in range(count):
+            steps.append(n)
+            yield
+
+    task = loader.submit(lambda: 3, _finish)
+    while not loader._finished.qsize():
+        pass
+
+    # act
+    loader.drain(budget=0.0)
+    first = list(steps)
+    loader.flush()
+
+    # assert
+    assert first == []
+    assert steps == [0, 1, 2]
+    assert task.state == LoadState.DONE
+    loader.shutdown()
+
+
+def test_failed_load():
+    """
+    Should record the error of a load that raised, and pass it to the error callback.
+    """
+    # assume
+    loader = StreamingLoader(max_workers=1)
+    errors = []
+
+    def _load():
+        raise IOError("missing")
+
+    task = loader.submit(_load, on_error=errors.append)
+
+    # act
+    loader.flush()
+
+    # assert
+    assert task.state == LoadState.FAILED
+    assert isinstance(task.error, IOError)
+    assert errors == [task.error]
+    loader.shutdown()
@@ -0,0 +1,67 @@
+from little_doors.terrain import ColumnStorage
+
+
+def test_set_and_get_levels():
+    """
+    Should store tiles above the ground as runs, and read them back per level.
+    """
+    # assume
+    storage = ColumnStorage((4, 4))
+
+    # act
+    storage.set(1, 2, 0, 1)
+    for z in range(1, 4):
+        storage.set(1, 2, z, 2)
+    storage.set(1, 2, 6, 3)
+
+    # assert
+    assert storage.column(1, 2) == [1, 2, 2, 2, 0, 0, 3]
+    assert storage.get(1, 2, 3) == 2
+    assert storage.get(1, 2, 5) == 0
+    assert storage.get(1, 2, 9) == 0
+    assert storage.get(0, 0, 3) == 0
+    assert list(storage._stacks[1 + 2 * 4]) == [2, 3, 0, 2, 3, 1]
+
+
+def test_top_and_trailing_air():
+    """
+    Should find the surface of a column, and trim air when the top is cleared.
+    """
+    # assume
+    storage = ColumnStorage((4, 4))
+    storage.set(0, 0, 0, 1)
+    storage.set(0, 0, 1, 2)
+    storage.set(0, 0, 2, 3)
+
+    # act
+    top_before = storage.top(0, 0)
+    storage.set(0, 0, 2, 0)
+    top_after = storage.top(0, 0)
+    storage.set(0, 0, 1, 0)
+
+    # assert
+    assert top_before == (2, 3)
+    assert top_after == (1, 2)
+    assert storage.top(0, 0) == (0, 1)
+    assert storage.top(3, 3) is None
+    assert not storage._stacks
+
+
+def test_layer_iteration():
+    """
+    Should iterate only the non-empty cells of each level.
+    """
+    # assume
+    storage = ColumnStorage((3, 3))
+    storage.set(0, 0, 0, 1)
+    storage.set(2, 1, 0, 1)
+    storage.set(2, 1, 1, 2)
+    storage.set(1, 2, 2, 3)
+
+    # act
+    cells = list(storage.cells())
+
+    # assert
+    assert storage.depth == 3
+    assert list(storage.layer(1)) == [(2, 1, 2)]
+    assert cells == [(0, 0, 0, 1), (2, 1, 0, 1), (2, 1, 1, 2), (1, 2, 2, 3)]
@@ -0,0 +1,313 @@
+import ctypes
+from array import array
+
+from pytest import raises
+
+from little_doors.aabb import AABB3D, AABB2D
+from little_doors.grid import GridIndex2D
+from little_doors.redraw import DirtyRegions
+from little_doors.tile import Tile
+from little_doors.tilemap import TileMap, TileSetError, TerrainError
+
+
+class MapObj(object):
+
+    def __init__(self, x, y):
+        self.image = None
+        self.aabb3d = AABB3D(0.0, 0.0, 0.0, 1.0, 1.0, 1.0)
+        self.aabb2d = AABB2D(x, y, 32.0, 32.0)
+
+    def draw(self):
+        pass
+
+
+def test_find_in_view():
+    """
+    Should only return objects that the index finds near the view.
+    """
+    # assume
+    grid = GridIndex2D(position=(-512.0, -512.0), dimensions=(32, 32), cell_size=(32.0, 32.0))
+    tilemap = TileMap((8, 8))
+    near, far = MapObj(0.0, 0.0), MapObj(320.0, 320.0)
+    stranger = AABB2D(0.0, 0.0, 32.0, 32.0)
+    for obj in (near, far):
+        tilemap.add_object(obj)
+        grid.insert(obj.aabb2d)
+    grid.insert(stranger)
+
+    # act
+    visible = tilemap.find(grid, AABB2D(-16.0, -16.0, 64.0, 64.0))
+
+    # assert
+    assert visible == {near}
+
+
+def test_tiles_share_prototype():
+    """
+    Should store cells as tile indexes, and create instances that share the tile set prototype.
+    """
+    # assume
+    prototype = Tile(1, "template", anchor=(16.0, 8.0), dimension=(2.0, 1.0, 1.0), tile_size=(48.0, 40.0))
+    tilemap = TileMap((4, 4))
+    tilemap.load_tile_set({1: prototype})
+
+    # act
+    tilemap.load_tile_data([
+        0, 0, 0, 0,
+        0, 1, 0, 0,
+        0, 0, 0, 0,
+        0, 0, 0, 1,
+    ])
+
+    # assert
+    tile1, tile2 = tilemap.get_tile(1, 1), tilemap.get_tile(3, 3)
+    assert tilemap.get_tile(0, 0) is None
+    assert tilemap.get_tile_index(1, 1) == 1
+    assert tile1.tile is prototype and tile2.tile is prototype
+    assert tile1.aabb3d.pos == (1.0, 1.0, 0.0)
+    assert tile1.aabb3d.dimensions == (2.0, 1.0, 1.0)
+    assert tile1.aabb2d.pos == (-16.0, 8.0)
+    assert tile1.aabb2d is not tile2.aabb2d
+    assert len(list(tilemap.tiles())) == 2
+
+
+def test_set_cell_unknown_tile():
+    """
+    Should raise when the tile index is not in the tile set.
+    """
+    # assume
+    tilemap = TileMap((4, 4))
+
+    # act, assert
+    with raises(TileSetError):
+        tilemap.set_cell(0, 0, 7)
+
+
+def test_load_tile_data_buffers():
+    """
+    Should load tile data from sequences, arrays, raw little-endian bytes and memory views alike.
+    """
+    # assume
+    values = [0, 1, 2, 0]
+    tilemap = TileMap((2, 2))
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2)})
+    inputs = [
+        values,
+        array('H', values),
+        array('i', values),
+        bytes([0, 0, 1, 0, 2, 0, 0, 0]),
+        memoryview(bytearray([0, 0, 1, 0, 2, 0, 0, 0])),
+        # Buffers with an explicit byte order, like NumPy arrays of dtype '<u2' or '>u2'.
+        (ctypes.c_uint16.__ctype_le__ * 4)(*values),
+        (ctypes.c_uint16.__ctype_be__ * 4)(*values),
+        (ctypes.c_int32 * 4)(*values),
+    ]
+
+    for data in inputs:
+        # act
+        tilemap.load_tile_data(data)
+
+        # assert
+        assert [tilemap.get_tile_index(x, y) for x, y in tilemap] == values, type(data).__name__
+
+
+def test_load_tile_data_invalid():
+    """
+    Should raise a terrain error for tile data that isn't a whole number of tile indexes, or is out of range.
+    """
+    # assume
+    tilemap = TileMap((2, 2))
+    tilemap.load_tile_set({1: Tile(1)})
+    inputs = [
+        bytes([0, 0, 1, 0, 1, 0, 0]),
+        [0, 1, 65536, 0],
+        [0, 1, -1, 0],
+        array('i', [0, 1, 70000, 0]),
+        array('d', [0.0, 1.0, 1.0, 0.0]),
+    ]
+
+    for data in inputs:
+        # act, assert
+        with raises(TerrainError):
+            tilemap.load_tile_data(data)
+
+
+def test_load_file(tmp_path):
+    """
+    Should load a raw layer from a file at the given offset.
+    """
+    # assume
+    path = tmp_path / 'layer.bin'
+    path.write_bytes(b'HEADER' + bytes([1, 0, 0, 0, 0, 0, 1, 0]))
+    tilemap = TileMap((2, 2))
+    tilemap.load_tile_set({1: Tile(1)})
+
+    # act
+    tilemap.load_file(str(path), offset=6)
+
+    # assert
+    assert tilemap.get_tile_index(0, 0) == 1
+    assert tilemap.get_tile_index(1, 1) == 1
+    assert len(list(tilemap.tiles())) == 2
+
+
+def test_stacked_tiles():
+    """
+    Should position tiles on upper levels above the ground, and find the top of a column.
+    """
+    # assume
+    tilemap = TileMap((4, 4))
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2)})
+    tilemap.set_cell(1, 1, 1)
+
+    # act
+    tilemap.set_cell(1, 1, 2, z=2)
+
+    # assert
+    ground, top = tilemap.get_tile(1, 1), tilemap.get_tile(1, 1, 2)
+    assert tilemap.get_tile(1, 1, 1) is None
+    assert tilemap.get_top_tile(1, 1) is top
+    assert top.aabb3d.pos == (1.0, 1.0, 2.0)
+    assert top.aabb2d.y == ground.aabb2d.y + 32.0
+    assert tilemap.depth == 3
+    assert set(tilemap.tiles()) == {ground, top}
+
+
+def test_edit_defers_index_updates():
+    """
+    Should only release replaced tiles and notify handlers when the edit transaction is committed.
+    """
+    # assume
+    tilemap = TileMap((8, 8))
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2)})
+    tilemap.load_tile_data([1] * 64)
+    old = tilemap.get_tile(2, 2)
+    notifications, released = [], []
+    tilemap.handle('cells_changed', notifications.append)
+    tilemap.handle('tiles_released', released.extend)
+
+    # act
+    with tilemap.edit():
+        tilemap.fill_rect(1, 1, 3, 2, 2)
+        tilemap.set_cells([(0, 0, 0), (0, 0, 1, 2)])
+        during = (list(notifications), list(released))
+
+    # assert
+    new = tilemap.get_tile(2, 2)
+    found = {aabb2d for _i, _j, aabb2d in tilemap.tile_index.find(new.aabb2d)}
+    assert during == ([], [])
+    assert len(notifications) == 1
+    assert len(notifications[0]) == 8
+    assert released == [old]
+    assert new.tile.index == 2
+    assert new.aabb2d in found and old.aabb2d not in found
+    assert tilemap.get_tile(0, 0) is None
+    assert tilemap.get_tile_index(0, 0, 2) == 1
+
+
+def test_find_tiles_from_columns():
+    """
+    Should find exactly the tiles overlapping the query, on every level, without an index of the tiles.
+    """
+    # assume
+    tilemap = TileMap((8, 8), origin=(4, -2))
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2, anchor=(16.0, 8.0), tile_size=(48.0, 64.0))})
+    tilemap.load_tile_data([1, 2, 0, 1] * 16)
+    tilemap.fill_rect(2, 2, 4, 3, 2, z=3)
+    tiles = list(tilemap.tiles())
+
+    for query in (AABB2D(100.0, 60.0, 1.0, 1.0), AABB2D(60.0, 30.0, 100.0, 60.0), AABB2D(20.0, 100.0, 10.0, 200.0)):
+        # act
+        found = set(tilemap.find_tiles(query))
+
+        # assert
+        assert found == {tile for tile in tiles if tile.aabb2d.overlap(query)}
+        assert found
+
+
+def test_unused_tiles_are_released():
+    """
+    Should only keep tile instances while they are used, and damage the cells of released ones when edited.
+    """
+    # assume
+    tilemap = TileMap((4, 4))
+    tilemap.load_tile_set({1: Tile(1)})
+    tilemap.load_tile_data([1] * 16)
+    aabb2d = tuple(tilemap.get_tile(1, 2).aabb2d)
+    regions = DirtyRegions()
+    tilemap.collect_damage(regions)
+    regions.take()
+
+    # act
+    held = tilemap.get_tile(0, 0)
+    tilemap.set_cell(1, 2, 0)
+    tilemap.collect_damage(regions)
+
+    # assert
+    assert len(tilemap._tiles) == 1
+    assert tilemap.get_tile(0, 0) is held
+    assert [tuple(r) for r in regions.take()] == [aabb2d]
+
+
+def test_hidden_tiles_follow_edits():
+    """
+    Should hide tiles covered on every visible face, and reveal them when a covering tile is removed.
+    """
+    # assume
+    tilemap = TileMap((3, 3))
+    tilemap.load_tile_set({1: Tile(1), 2: Tile(2, opaque=False)})
+    tilemap.load_tile_data([1] * 9)
+    tilemap.fill_rect(0, 0, 3, 3, 1, z=1)
+    assert tilemap.is_hidden(1, 1, 0)
+    assert not tilemap.is_hidden(0, 1, 0)
+    assert not tilemap.is_hidden(1, 1, 1)
+
+    # act
+    tilemap.set_cell(1, 0, 2)
+
+    # assert
+    assert not tilemap.is_hidden(1, 1, 0)
+    assert len(list(tilemap.visible_tiles())) == 15
+
+
+def test_collect_damage_tracks_moved_objects():
+    """
+    Should report the old and new rectangles of a moved object, after everything is reported once.
+    """
+    # assume
+    tilemap = TileMap((8, 8))
+    obj = MapObj(0.0, 0.0)
+    tilemap.add_object(obj)
+    regions = DirtyRegions()
+    tilemap.collect_damage(regions)
+    assert regions.take() is None
+
+    # act
+    obj.aabb2d.x = 100.0
+    tilemap.collect_damage(regions)
+
+    # assert
+    assert sorted(tuple(r) for r in regions.take()) == [(0, 0, 32, 32), (100, 0, 32, 32)]
+
+
+def test_prerendered_map_culls_overlay_to_view():
+    """
+    Should only overlay the objects in view on a pre-rendered map.
+    """
+    # assume
+    grid = GridIndex2D(position=(-512.0, -512.0), dimensions=(32, 32), cell_size=(32.0, 32.0))
+    tilemap = TileMap((4, 4), prerender=True)
+    tilemap.load_tile_set({1: Tile(1)})
+    tilemap.load_tile_data([1] * 16)
+    near, far = MapObj(0.0, 0.0), MapObj(320.0, 320.0)
+    for obj in (near, far):
+        tilemap.add_object(obj)
+        grid.insert(obj.aabb2d)
+
+    # act
+    overlay = tilemap.overlay(grid, AABB2D(-16.0, -16.0, 64.0, 64.0))
+
+    # assert
+    assert near in overlay
+    assert far not in overlay
+    assert set(tilemap.overlay(grid)) >= {near, far}
@@ -0,0 +1,34 @@
+from pytest import approx
+
+from little_doors.timestep import FixedTimestep
+
+
+def test_advance_carries_partial_steps():
+    """
+    Should run whole steps only, and carry the rest of the frame time into the next frame.
+    """
+    # assume
+    timestep = FixedTimestep(step=0.1, max_steps=5)
+
+    # act
+    steps = [timestep.advance(dt) for dt in (0.05, 0.08, 0.25)]
+
+    # assert
+    assert steps == [0, 1, 2]
+    assert timestep.alpha == approx(0.8)
+
+
+def test_advance_drops_time_beyond_max_steps():
+    """
+    Should cap the steps run for a slow frame, and drop the backlog instead of carrying it.
+    """
+    # assume
+    timestep = FixedTimestep(step=0.1, max_steps=3)
+
+    # act
+    steps = timestep.advance(1.05)
+
+    # assert
+    assert steps == 3
+    assert timestep.alpha == approx(0.5)
+    assert timestep.dropped == approx(0.7)